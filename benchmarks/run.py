@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""Benchmarks for devkit's hot paths, compared against a stored baseline.
+
+Cases, each timed over several runs (median and best, in ms):
+
+    startup/<command>       `python -m devkit <command>`, one process per run
+    daemon/<command>        the same commands through bin/devkit while a `devkit daemon` runs:
+                            what an editor or agent calling devkit in a loop pays per call
+    config/<op>/<n>         load_config (cold: parse and validate; warm: from the snapshot),
+                            save_config and a first find_service, with n configured services
+    reference/typer         typer_reference over the whole CLI, uncached
+    ux/table/<n>            ux.table rendering n service rows
+    reset/<variant>         `devkit db reset` end to end; rails, psql and pg_restore are the
+                            stubs in benchmarks/stubs, which sleep instead of working. These
+                            report devkit's own overhead: wall time minus the stubs' sleeps.
+
+Everything runs against a throwaway HOME. The results are JSON (--json, --output); each
+case is compared with the baseline (benchmarks/baseline.json unless --baseline) and the run
+fails (exit 1) when one is slower by more than --tolerance and --min-delta-ms.
+
+    python benchmarks/run.py [--quick] [--only PREFIX]... [--runs N] [--json] [--output FILE]
+                             [--baseline FILE] [--save-baseline] [--tolerance FRACTION]
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+STUBS = ROOT / "benchmarks" / "stubs"
+BASELINE_PATH = ROOT / "benchmarks" / "baseline.json"
+RESULTS_FORMAT = 1
+
+SIZES = (10, 1000, 10000)
+QUICK_SIZES = (10, 1000)
+
+STARTUP = [
+    ("help", ["help"]),
+    ("service-list", ["service", "list"]),
+    ("service-list-json", ["--format", "json", "service", "list"]),
+    ("meta-reference", ["meta", "reference"]),
+    ("db-reset-help", ["db", "reset", "--help"]),
+]
+
+# (name, `db reset` arguments after the service name); every run restores into a new
+# database, with the template cache off so each one goes through the whole restore
+RESET = [
+    ("sql", ["--backup", "{home}/backup.sql"]),
+    ("via-rails", ["--backup", "{home}/backup.sql", "--via-rails"]),
+    ("archive", ["--backup", "{home}/backup.dump", "--jobs", "2"]),
+]
+
+
+def _services(n: int, home: Path) -> List[dict]:
+    return [
+        {
+            "name": f"svc{i:05d}",
+            "app_path": str(home / "apps" / f"svc{i:05d}"),
+            "backup_path": str(home / "backups" / f"svc{i:05d}.dump"),
+            "env": "development",
+            "db": {"user": "postgres", "host": "localhost", "port": 5432},
+        }
+        for i in range(n)
+    ]
+
+
+def _write_config(home: Path, services: List[dict]) -> None:
+    import yaml
+
+    cfg = home / ".devkit" / "config.yml"
+    cfg.parent.mkdir(parents=True, exist_ok=True)
+    cfg.write_text(yaml.safe_dump({"version": 1, "services": services}, sort_keys=False))
+
+
+def _timed(
+    fn: Callable[[], object], runs: int, setup: Optional[Callable[[], object]] = None
+) -> dict:
+    samples = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "best_ms": round(min(samples) * 1000, 3),
+    }
+
+
+def _in_process(home: Path, sizes: tuple, runs: int, selected: Callable[[str], bool]) -> list:
+    """config/*, reference/* and ux/* cases; devkit is imported with HOME pointing at `home`."""
+    os.environ["HOME"] = str(home)
+    from devkit import services, ux
+
+    results = []
+
+    def case(name: str, fn, setup=None, n: Optional[int] = None) -> None:
+        if selected(name):
+            if setup:
+                setup()
+            fn()  # warm up: imports, first-call caches
+            results.append({"name": name, **_timed(fn, n or runs, setup)})
+
+    def drop_snapshot() -> None:
+        services.SNAPSHOT_PATH.unlink(missing_ok=True)
+
+    for n in sizes:
+        _write_config(home, _services(n, home))
+        drop_snapshot()
+        # the biggest configs take long enough that fewer runs still give a steady median
+        few = max(3, runs // 3) if n >= 10000 else runs
+        case(f"config/load-cold/{n}", services.load_config, setup=drop_snapshot, n=few)
+        services.load_config()  # leaves a snapshot for the warm loads
+        case(f"config/load-warm/{n}", services.load_config)
+        cfg = services.load_config()
+        case(f"config/save/{n}", functools.partial(services.save_config, cfg), n=few)
+        last = cfg.services[-1].name
+
+        def forget(cfg=cfg) -> None:
+            cfg._by_name = None  # a command loads the config, then looks up one service
+
+        case(f"config/find/{n}", functools.partial(services.find_service, cfg, last), setup=forget)
+
+    if selected("reference/typer"):
+        from devkit.cli import app
+        from devkit.introspect import typer_reference
+
+        walk = typer_reference.__wrapped__  # the uncached walk, not the per-process memo
+        walk(app)
+        results.append({"name": "reference/typer", **_timed(lambda: walk(app), runs)})
+
+    for n in sizes:
+        headers = ["name", "app", "backup", "env", "db"]
+        rows = [
+            [s["name"], s["app_path"], s["backup_path"], s["env"], "localhost:5432"]
+            for s in _services(n, home)
+        ]
+        case(f"ux/table/{n}", functools.partial(ux.table, headers, rows))
+    return results
+
+
+def _env(home: Path, latency_ms: float, rails_latency_ms: float, log: Path) -> dict:
+    env = dict(
+        os.environ,
+        HOME=str(home),
+        PATH=f"{STUBS}{os.pathsep}{os.environ.get('PATH', '')}",
+        PYTHONPATH=str(ROOT),
+        PGPASSWORD="bench",  # nothing to prompt for
+        DEVKIT_NO_DAEMON="1",  # measure this process, not a resident one
+        DEVKIT_BENCH_LATENCY_MS=str(int(latency_ms)),
+        DEVKIT_BENCH_RAILS_LATENCY_MS=str(int(rails_latency_ms)),
+        DEVKIT_BENCH_LOG=str(log),
+    )
+    env.pop("DEVKIT_SAFE", None)
+    return env
+
+
+def _devkit(argv: List[str], env: dict, launcher: Optional[List[str]] = None) -> float:
+    t0 = time.perf_counter()
+    p = subprocess.run(
+        (launcher or [sys.executable, "-m", "devkit"]) + argv,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - t0
+    if p.returncode != 0:
+        raise RuntimeError(f"devkit {' '.join(argv)}: exit {p.returncode}\n{p.stdout}{p.stderr}")
+    return wall
+
+
+def _subprocesses(home: Path, args, selected: Callable[[str], bool]) -> list:
+    """startup/* and reset/* cases: one devkit process per run, external tools stubbed."""
+    (home / "app").mkdir(parents=True, exist_ok=True)  # no database.yml: rails runner names it
+    (home / "backup.sql").write_text("CREATE TABLE t1 (id int);\n")
+    (home / "backup.dump").write_bytes(b"PGDMP\x01\x0e\x00bench")  # read through `pg_restore -l`
+    bench = {
+        **_services(1, home)[0],
+        "name": "bench",
+        "app_path": str(home / "app"),
+        "backup_path": str(home / "backup.sql"),
+    }
+    _write_config(home, [bench] + _services(9, home))
+    log = home / "stubs.log"
+    env = _env(home, args.latency_ms, args.rails_latency_ms, log)
+    results = []
+
+    def startup(prefix: str, env: dict, launcher: Optional[List[str]] = None) -> None:
+        for name, argv in STARTUP:
+            name = f"{prefix}/{name}"
+            if selected(name):
+                _devkit(argv, env, launcher)
+                walls = [_devkit(argv, env, launcher) for _ in range(args.runs)]
+                results.append(
+                    {
+                        "name": name,
+                        "runs": args.runs,
+                        "median_ms": round(statistics.median(walls) * 1000, 3),
+                        "best_ms": round(min(walls) * 1000, 3),
+                    }
+                )
+
+    startup("startup", env)
+    if any(selected(f"daemon/{name}") for name, _ in STARTUP):
+        # the wrapper with this interpreter, no launcher cache: it hands each call to the
+        # daemon from a bare interpreter (devkit/client.py)
+        served = dict(env, DEVKIT_PYTHON=sys.executable)
+        served.pop("DEVKIT_NO_DAEMON")
+        _devkit(["daemon", "start"], served)
+        try:
+            startup("daemon", served, [str(ROOT / "bin" / "devkit")])
+        finally:
+            _devkit(["daemon", "stop"], served)
+
+    for name, extra in RESET:
+        name = f"reset/{name}"
+        if not selected(name):
+            continue
+        argv = ["-y", "--format", "json", "db", "reset", "bench", "--no-cache"]
+        argv += [a.format(home=home) for a in extra]
+        _devkit(argv, env)  # warm up: config snapshot, the runner's database name
+        overheads, walls, calls = [], [], {}
+        for _ in range(args.runs):
+            log.write_text("")
+            wall = _devkit(argv, env)
+            entries = [ln.split("\t") for ln in log.read_text().splitlines() if ln]
+            slept = sum(float(ms) for _, ms in entries) / 1000
+            calls = {}
+            for tool, _ in entries:
+                calls[tool] = calls.get(tool, 0) + 1
+            walls.append(wall)
+            overheads.append(wall - slept)
+        results.append(
+            {
+                "name": name,
+                "runs": args.runs,
+                "median_ms": round(statistics.median(overheads) * 1000, 3),
+                "best_ms": round(min(overheads) * 1000, 3),
+                "wall_ms": round(statistics.median(walls) * 1000, 3),
+                "calls": calls,
+            }
+        )
+    return results
+
+
+def compare(results: list, baseline: Optional[dict], tolerance: float, min_delta_ms: float) -> list:
+    """Each result against the baseline's case of the same name (median vs. median)."""
+    before = {r["name"]: r for r in (baseline or {}).get("results", [])}
+    out = []
+    for r in results:
+        old = before.get(r["name"])
+        if old is None:
+            out.append({"name": r["name"], "status": "new"})
+            continue
+        delta = r["median_ms"] - old["median_ms"]
+        change = delta / old["median_ms"] if old["median_ms"] > 0 else 0.0
+        if change > tolerance and delta > min_delta_ms:
+            status = "regressed"
+        elif change < -tolerance and -delta > min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        out.append(
+            {
+                "name": r["name"],
+                "baseline_ms": old["median_ms"],
+                "median_ms": r["median_ms"],
+                "change": round(change, 3),
+                "status": status,
+            }
+        )
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=7, help="timed runs per case")
+    ap.add_argument("--quick", action="store_true", help="3 runs, no 10k-service configs")
+    ap.add_argument(
+        "--only",
+        action="append",
+        default=[],
+        metavar="PREFIX",
+        help="run only the cases whose name starts with PREFIX (repeatable)",
+    )
+    ap.add_argument("--latency-ms", type=float, default=20.0, help="psql/pg_restore stub delay")
+    ap.add_argument("--rails-latency-ms", type=float, default=200.0, help="rails stub delay")
+    ap.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    ap.add_argument(
+        "--save-baseline", action="store_true", help="write these results as the baseline"
+    )
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    ap.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=2.0,
+        help="slowdowns smaller than this never count as regressions",
+    )
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    ap.add_argument("--output", type=Path, help="also write the JSON results to this file")
+    args = ap.parse_args()
+    if args.quick:
+        args.runs = 3
+    sizes = QUICK_SIZES if args.quick else SIZES
+    sys.path.insert(0, str(ROOT))
+
+    def selected(name: str) -> bool:
+        return not args.only or any(name.startswith(p) for p in args.only)
+
+    if not all(os.access(STUBS / tool, os.X_OK) for tool in ("rails", "psql", "pg_restore")):
+        print(f"benchmark stubs in {STUBS} are missing or not executable", file=sys.stderr)
+        return 1
+    baseline = None
+    if not args.save_baseline and args.baseline.exists():
+        try:
+            baseline = json.loads(args.baseline.read_text())
+        except ValueError as e:
+            print(f"{args.baseline}: not a results file ({e})", file=sys.stderr)
+            return 1
+        here = (platform.python_version(), platform.platform())
+        if (baseline.get("python"), baseline.get("platform")) != here:
+            print(
+                f"note: the baseline was taken with Python {baseline.get('python')} on "
+                f"{baseline.get('platform')}; timings from other machines compare poorly",
+                file=sys.stderr,
+            )
+
+    scratch = Path(tempfile.mkdtemp(prefix="devkit-bench-"))
+    try:
+        try:
+            results = _subprocesses(scratch / "e2e", args, selected)
+            # last: it imports devkit into this process with HOME pointing at the scratch dir
+            results += _in_process(scratch / "home", sizes, args.runs, selected)
+        except RuntimeError as e:
+            print(str(e), file=sys.stderr)
+            return 1
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    from devkit import __version__
+
+    report = {
+        "format": RESULTS_FORMAT,
+        "devkit": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "latency_ms": args.latency_ms,
+        "rails_latency_ms": args.rails_latency_ms,
+        "results": results,
+    }
+    report["comparison"] = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    report["ok"] = not any(c["status"] == "regressed" for c in report["comparison"])
+
+    text = json.dumps(report, indent=2) + "\n"
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({**report, "comparison": []}, indent=2) + "\n")
+    if args.json:
+        sys.stdout.write(text)
+    else:
+        by_name = {c["name"]: c for c in report["comparison"]}
+        for r in results:
+            c = by_name[r["name"]]
+            vs = ""
+            if "baseline_ms" in c:
+                vs = f"  baseline {c['baseline_ms']:>9.3f} ms  {c['change']:+7.1%}  {c['status']}"
+            elif baseline is not None:
+                vs = "  (not in baseline)"
+            print(
+                f"{r['name']:<26} median {r['median_ms']:>9.3f} ms  "
+                f"best {r['best_ms']:>9.3f} ms{vs}"
+            )
+        if args.save_baseline:
+            print(f"baseline written to {args.baseline}")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""On-disk catalog of backup files: size, mtime, sha256, format and TOC tables.
+
+`devkit backup scan` fills it; entries are trusted while the file's size and mtime are
+unchanged, so cache keys and restore planning can look a backup up without reading it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .pgdump import read_archive
+from .postgres import BackupFormat, detect_backup_format, list_toc, toc_entry_matches
+from .store import CACHE_DIR, file_lock, read_json, write_json
+
+CATALOG_PATH = CACHE_DIR / "catalog.json"
+LOCK_PATH = CACHE_DIR / ".catalog.lock"
+CATALOG_FORMAT = 2  # 2: per-table data sizes
+
+CHUNK = 1 << 20
+
+
+@dataclass
+class BackupEntry:
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    kind: str  # custom | directory | tar | plain
+    compression: Optional[str]
+    # archives only: {"schema", "name", "data", "data_bytes"}, plus "rows" once a full
+    # restore of this backup has been validated
+    tables: Optional[List[dict]]
+    scanned: float
+
+    @property
+    def format(self) -> BackupFormat:
+        return BackupFormat(self.kind, self.compression)
+
+    @property
+    def tables_with_data(self) -> Optional[int]:
+        return None if self.tables is None else sum(t["data"] for t in self.tables)
+
+    def fresh(self, size: int, mtime_ns: int) -> bool:
+        return self.size == size and self.mtime_ns == mtime_ns
+
+
+def _key(path: Path) -> str:
+    return str(path.resolve())
+
+
+def _stat(path: Path) -> Tuple[int, int]:
+    """(size, mtime_ns); a directory backup counts all its files."""
+    if not path.is_dir():
+        st = path.stat()
+        return st.st_size, st.st_mtime_ns
+    size, mtime = 0, path.stat().st_mtime_ns
+    for f in path.rglob("*"):
+        st = f.stat()
+        size += st.st_size if f.is_file() else 0
+        mtime = max(mtime, st.st_mtime_ns)
+    return size, mtime
+
+
+def _hash_into(h, path: Path, buf: bytearray) -> None:
+    view = memoryview(buf)
+    with path.open("rb", buffering=0) as f:
+        while n := f.readinto(buf):
+            h.update(view[:n])
+
+
+def hash_backup(path: Path) -> str:
+    """sha256 of a backup file (or of a directory backup's names and contents), streamed."""
+    h, buf = hashlib.sha256(), bytearray(CHUNK)
+    if not path.is_dir():
+        _hash_into(h, path, buf)
+        return h.hexdigest()
+    for f in sorted(p for p in path.rglob("*") if p.is_file()):
+        h.update(str(f.relative_to(path)).encode() + b"\0")
+        _hash_into(h, f, buf)
+    return h.hexdigest()
+
+
+def toc_tables(lines: Iterable[str]) -> List[dict]:
+    """Tables in a `pg_restore -l` listing, flagged with whether the archive holds their data."""
+    tables: Dict[Tuple[str, str], dict] = {}
+    for ln in lines:
+        # "<id>; <tableoid> <oid> TABLE [DATA] <schema> <name...> <owner>"
+        if toc_entry_matches(ln, ("TABLE DATA",)):
+            skip, data = 4, True
+        elif toc_entry_matches(ln, ("TABLE",)):
+            skip, data = 3, False
+        else:
+            continue
+        fields = ln.split(";", 1)[-1].split()[skip:]
+        if len(fields) < 3:
+            continue
+        schema, name = fields[0], " ".join(fields[1:-1])
+        entry = tables.setdefault(
+            (schema, name), {"schema": schema, "name": name, "data": False, "data_bytes": None}
+        )
+        entry["data"] |= data
+    return list(tables.values())
+
+
+def archive_tables(path: Path, fmt: BackupFormat, env: Optional[dict] = None) -> List[dict]:
+    """Tables of an archive with their data size in the archive, where the TOC records it."""
+    try:
+        archive = read_archive(path, fmt)
+    except ValueError:
+        return toc_tables(list_toc(path, env=env, fmt=fmt))
+    tables: Dict[Tuple[str, str], dict] = {}
+    for e in archive.entries:
+        if e.desc in ("TABLE", "TABLE DATA"):
+            t = tables.setdefault(
+                (e.schema or "", e.name),
+                {"schema": e.schema or "", "name": e.name, "data": False, "data_bytes": None},
+            )
+            if e.desc == "TABLE DATA":
+                t["data"], t["data_bytes"] = True, e.data_length
+    return list(tables.values())
+
+
+def _load() -> Dict[str, dict]:
+    raw = read_json(CATALOG_PATH, {}) or {}
+    if raw.get("format") != CATALOG_FORMAT:
+        return {}
+    return raw.get("backups", {})
+
+
+def entries() -> List[BackupEntry]:
+    return [BackupEntry(**raw) for raw in _load().values()]
+
+
+def lookup(path: Path) -> Optional[BackupEntry]:
+    """The catalog entry for `path` if it still matches the file's size and mtime."""
+    raw = _load().get(_key(path))
+    if not raw:
+        return None
+    try:
+        size, mtime_ns = _stat(path)
+    except OSError:
+        return None
+    entry = BackupEntry(**raw)
+    return entry if entry.fresh(size, mtime_ns) else None
+
+
+def _save(updates: Dict[str, Optional[BackupEntry]]) -> None:
+    # merge under the lock: resets may record checksums while a scan is running
+    with file_lock(LOCK_PATH):
+        backups = _load()
+        for key, entry in updates.items():
+            if entry is None:
+                backups.pop(key, None)
+            else:
+                backups[key] = asdict(entry)
+        write_json(CATALOG_PATH, {"format": CATALOG_FORMAT, "backups": backups})
+
+
+def _scan_one(
+    path: Path,
+    old: Optional[BackupEntry],
+    force: bool,
+    with_toc: bool,
+    env: Optional[dict],
+) -> Tuple[Optional[BackupEntry], str]:
+    try:
+        size, mtime_ns = _stat(path)
+    except FileNotFoundError:
+        return None, "missing"
+    entry = old if old and old.fresh(size, mtime_ns) and not force else None
+    status = "unchanged"
+    if entry is None:
+        fmt = detect_backup_format(path)
+        entry = BackupEntry(
+            path=_key(path),
+            size=size,
+            mtime_ns=mtime_ns,
+            sha256=hash_backup(path),
+            kind=fmt.kind,
+            compression=fmt.compression,
+            tables=None,
+            scanned=time.time(),
+        )
+        status = "changed" if old else "new"
+    if with_toc and entry.tables is None and entry.format.is_archive:
+        try:
+            entry.tables = archive_tables(path, entry.format, env)
+        except Exception:
+            pass  # unreadable TOC: keep the hash, try again on the next scan
+        else:
+            status = "updated" if status == "unchanged" else status
+    return entry, status
+
+
+def scan(
+    paths: Iterable[Path],
+    env: Optional[dict] = None,
+    force: bool = False,
+    with_toc: bool = True,
+    workers: int = 4,
+) -> List[Tuple[Path, Optional[BackupEntry], str]]:
+    """Bring catalog entries for `paths` up to date; returns (path, entry, status) per path.
+
+    Only files whose size or mtime changed (or everything, with `force`) are re-hashed.
+    Status is new | changed | updated (TOC added) | unchanged | missing.
+    """
+    paths = list(dict.fromkeys(Path(p) for p in paths))
+    known = _load()
+
+    def one(path: Path) -> Tuple[Optional[BackupEntry], str]:
+        raw = known.get(_key(path))
+        return _scan_one(path, BackupEntry(**raw) if raw else None, force, with_toc, env)
+
+    if len(paths) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            results = list(pool.map(one, paths))
+    else:
+        results = [one(p) for p in paths]
+    updates = {
+        _key(p): entry
+        for p, (entry, status) in zip(paths, results, strict=True)
+        if status != "unchanged"
+    }
+    if updates:
+        _save(updates)
+    return [(p, entry, status) for p, (entry, status) in zip(paths, results, strict=True)]
+
+
+def record_rows(path: Path, rows: Dict[Tuple[str, str], int]) -> None:
+    """Remember row counts seen after a full restore of `path`, for later validations."""
+    entry = lookup(path)
+    if entry is None or entry.tables is None:
+        return
+    changed = False
+    for t in entry.tables:
+        n = rows.get((t["schema"], t["name"]))
+        if n is not None and t.get("rows") is None:
+            t["rows"], changed = n, True
+    if changed:
+        _save({_key(path): entry})
+
+
+def checksum(path: Path) -> str:
+    """sha256 of a backup from the catalog, hashing (and recording) it only when stale."""
+    entry = lookup(path)
+    if entry is None:
+        entry = scan([path], with_toc=False)[0][1]
+        if entry is None:
+            raise FileNotFoundError(path)
+    return entry.sha256
@@ -1,21 +1,34 @@
-
 import os
+import sys
+import time
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, List, Optional
+
+import click
 import typer
 import click
-from difflib import get_close_matches
 
 from .context import Context
-from .iofmt import Exit, envelope, emit
-from .ux import console, table, confirm
-from .services import load_config, save_config, find_service
-from .config_model import Service, Config
-from .rails import rails_bin, infer_db_name
-from .postgres import choose_restore_tool, validate_connection
-from .shell import run, check
-from .doctor import diagnose
-from .introspect import typer_reference
+from .iofmt import Exit, emit, envelope
+from .services import (
+    ConfigConflict,
+    find_service,
+    load_config,
+    load_shard,
+    open_service_file,
+    save_config,
+    shard_path,
+    update_config,
+)
+from .topics import root_help, topic_help
+from .ux import confirm, human_bytes, table
+
+if TYPE_CHECKING:
+    from .config_model import Config
+    from .reset import ResetOptions
+
+# Heavier modules (pydantic models, reset/restore machinery, introspection) are imported
+# inside the commands that use them, so help and listing commands start fast.
 
 class DevkitGroup(typer.core.TyperGroup):
     def get_command(self, ctx, cmd_name):
@@ -24,6 +37,8 @@ class DevkitGroup(typer.core.TyperGroup):
             B = "\033[1m"; R = "\033[0m"
             click.echo(f"{B}ERROR:{R} unknown command: {cmd_name}", err=True)
             choices = list(self.commands.keys())
+            from difflib import get_close_matches
+
             match = get_close_matches(cmd_name, choices, n=1)
             if match:
                 click.echo(f"{B}TIP:{R} Did you mean '{match[0]}'?", err=True)
@@ -34,13 +49,43 @@ class DevkitGroup(typer.core.TyperGroup):
 
 
 app = typer.Typer(no_args_is_help=False, add_help_option=False, cls=DevkitGroup)
-service_app = typer.Typer(help="Manage services (Rails apps + backups).", no_args_is_help=False, add_help_option=False, cls=DevkitGroup)
-db_app = typer.Typer(help="Database operations.", no_args_is_help=False, add_help_option=False, cls=DevkitGroup)
-meta_app = typer.Typer(help="Introspection/metadata commands for agents.", no_args_is_help=False, add_help_option=False, cls=DevkitGroup)
+service_app = typer.Typer(
+    help="Manage services (Rails apps + backups).",
+    no_args_is_help=False,
+    add_help_option=False,
+    cls=DevkitGroup,
+)
+db_app = typer.Typer(
+    help="Database operations.", no_args_is_help=False, add_help_option=False, cls=DevkitGroup
+)
+cache_app = typer.Typer(
+    help="Template database cache for fast resets.",
+    no_args_is_help=False,
+    add_help_option=False,
+    cls=DevkitGroup,
+)
+backup_app = typer.Typer(
+    help="Backup catalog.", no_args_is_help=False, add_help_option=False, cls=DevkitGroup
+)
+meta_app = typer.Typer(
+    help="Introspection/metadata commands for agents.",
+    no_args_is_help=False,
+    add_help_option=False,
+    cls=DevkitGroup,
+)
+daemon_app = typer.Typer(
+    help="Resident process that answers devkit calls without startup cost.",
+    no_args_is_help=False,
+    add_help_option=False,
+    cls=DevkitGroup,
+)
 
 app.add_typer(service_app, name="service", no_args_is_help=False, invoke_without_command=True)
 app.add_typer(db_app, name="db", no_args_is_help=False, invoke_without_command=True)
+app.add_typer(backup_app, name="backup", no_args_is_help=False, invoke_without_command=True)
 app.add_typer(meta_app, name="meta", no_args_is_help=False, invoke_without_command=True)
+app.add_typer(daemon_app, name="daemon", no_args_is_help=False, invoke_without_command=True)
+db_app.add_typer(cache_app, name="cache", no_args_is_help=False, invoke_without_command=True)
 app.add_typer(service_app, name="services", no_args_is_help=False, invoke_without_command=True)
 
 CTX = Context()
@@ -65,31 +110,7 @@ def main(
     CTX.verbose = verbose
     CTX.trace = trace
     if show_help or ctx.invoked_subcommand is None:
-        B = "\033[1m"; R = "\033[0m"
-        typer.echo("Work seamlessly with DevKit from the command line.\n")
-        typer.echo(f"{B}USAGE{R}")
-        typer.echo("  devkit <command> <subcommand> [options]\n")
-        typer.echo(f"{B}CORE COMMANDS{R}")
-        typer.echo("  service:      Manage services (Rails apps + backups)")
-        typer.echo("  db:           Database operations")
-        typer.echo("  meta:         Introspection/metadata commands for agents\n")
-        typer.echo(f"{B}ADDITIONAL COMMANDS{R}")
-        typer.echo("  completion:   Generate shell completion scripts\n")
-        typer.echo(f"{B}HELP TOPICS{R}")
-        typer.echo("  environment:  Environment variables used by devkit")
-        typer.echo("  exit-codes:   Exit codes used by devkit")
-        typer.echo("  formatting:   Formatting options for JSON output")
-        typer.echo("  reference:    A comprehensive reference of all commands\n")
-        typer.echo(f"{B}FLAGS{R}")
-        typer.echo("  --help      Show help for command")
-        typer.echo("  --version   Show devkit version\n")
-        typer.echo(f"{B}EXAMPLES{R}")
-        typer.echo("  devkit service list")
-        typer.echo("  devkit service add --name myapp --app /path --backup /file.dump")
-        typer.echo("  devkit db reset myapp --backup /file.dump\n")
-        typer.echo(f"{B}LEARN MORE{R}")
-        typer.echo("  Use 'devkit <command> --help' for more information.")
-        typer.echo("  Read the manual in docs/index.md\n")
+        typer.echo(root_help())
         raise typer.Exit(0)
 
 
@@ -115,11 +136,17 @@ def _db_group_entry(ctx: typer.Context, help: bool = typer.Option(False, "--help
     if help or ctx.invoked_subcommand is None:
         B = "\033[1m"; R = "\033[0m"
         typer.echo(f"{B}DATABASE{R}")
-        typer.echo("  reset NAME   Drop, create and restore from backup\n")
+        typer.echo("  reset NAME             Drop, create and restore from backup")
+        typer.echo("  snapshot NAME          Save the database's current state under a tag")
+        typer.echo("  restore-snapshot NAME  Put a saved state back")
+        typer.echo("  snapshots [NAME]       List snapshots")
+        typer.echo("  drop-snapshot NAME     Delete a snapshot")
+        typer.echo("  cache                  Manage the template database cache\n")
         typer.echo(f"{B}USAGE{R}")
         typer.echo("  devkit db <subcommand> [options]\n")
         typer.echo(f"{B}EXAMPLES{R}")
         typer.echo("  devkit db reset myapp --backup /file.dump")
+        typer.echo("  devkit db snapshot myapp --tag migrated")
         raise typer.Exit(0)
 
 
@@ -159,6 +186,19 @@ def service_list():
         typer.echo(table(["Name", "App Path", "Backup Path", "Env"], rows))
 
 
+def _update_config(command: str, change):
+    try:
+        return update_config(change)
+    except ConfigConflict as e:
+        payload = envelope(
+            command,
+            "error",
+            Exit.PRECONDITION,
+            errors=[{"code": "CONFIG_CONFLICT", "detail": str(e)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload)) from None
+
+
 @service_app.command("add", context_settings={"help_option_names": []})
 def service_add(
     name: Optional[str] = typer.Option(None, "--name"),
@@ -168,7 +208,12 @@ def service_add(
     db_user: str = typer.Option("postgres", "--db-user"),
     db_host: str = typer.Option("localhost", "--db-host"),
     db_port: int = typer.Option(5432, "--db-port"),
-    show_help: bool = typer.Option(False, "--help", is_flag=True, is_eager=True, help="Show help for command"),
+    shard: Optional[str] = typer.Option(
+        None, "--shard", help="Store in ~/.devkit/services.d/SHARD.yml"
+    ),
+    show_help: bool = typer.Option(
+        False, "--help", is_flag=True, is_eager=True, help="Show help for command"
+    ),
 ):
     if show_help or not (name and app_path and backup_path):
         B = "\033[1m"; R = "\033[0m"
@@ -183,18 +228,38 @@ def service_add(
         typer.echo("  --env ENV          Rails env (default: development)")
         typer.echo("  --db-user USER     DB user (default: postgres)")
         typer.echo("  --db-host HOST     DB host (default: localhost)")
-        typer.echo("  --db-port PORT     DB port (default: 5432)\n")
+        typer.echo("  --db-port PORT     DB port (default: 5432)")
+        typer.echo(
+            "  --shard NAME       Store in ~/.devkit/services.d/NAME.yml instead of config.yml\n"
+        )
         typer.echo(f"{B}EXAMPLES{R}")
         typer.echo("  devkit service add --name myapp --app /path --backup /file.dump")
+        typer.echo(
+            "  devkit service add --name billing --app /path --backup /file.dump --shard payments"
+        )
         raise typer.Exit(0)
-    cfg = load_config()
-    if find_service(cfg, name):
-        payload = envelope("service add", "error", Exit.INVALID_ARGS, errors=[{"code":"DUPLICATE","detail":f"Service {name} already exists"}])
-        raise typer.Exit(code=emit(CTX, payload))
+    from .config_model import Service
+
     s = Service(name=name, app_path=str(app_path), backup_path=str(backup_path), env=env)
     s.db.user = db_user; s.db.host = db_host; s.db.port = db_port
-    cfg.services.append(s)
-    save_config(cfg)
+    target = shard_path(shard) if shard else None
+
+    def change():
+        cfg = load_config()
+        if find_service(cfg, name):
+            payload = envelope(
+                "service add",
+                "error",
+                Exit.INVALID_ARGS,
+                errors=[{"code": "DUPLICATE", "detail": f"Service {name} already exists"}],
+            )
+            raise typer.Exit(code=emit(CTX, payload))
+        if target:
+            cfg = load_shard(target)  # rewrite only that shard
+        cfg.services.append(s)
+        save_config(cfg, target)
+
+    _update_config("service add", change)
     if CTX.format == "json":
         payload = envelope("service add", "ok", Exit.OK, {"service": s.model_dump()})
         raise typer.Exit(code=emit(CTX, payload))
@@ -221,24 +286,34 @@ def service_edit(
         typer.echo(f"{B}EXAMPLES{R}")
         typer.echo("  devkit service edit myapp --env production")
         raise typer.Exit(0)
-    cfg = load_config()
-    s = find_service(cfg, name)
-    if not s:
-        payload = envelope("service edit", "error", Exit.NOT_FOUND, errors=[{"code":"NOT_FOUND","detail":name}])
-        raise typer.Exit(code=emit(CTX, payload))
-    if app_path:
-        s.app_path = str(app_path)
-    if backup_path:
-        s.backup_path = str(backup_path)
-    if env:
-        s.env = env
-    if db_user:
-        s.db.user = db_user
-    if db_host:
-        s.db.host = db_host
-    if db_port:
-        s.db.port = db_port
-    save_config(cfg)
+
+    def change():
+        cfg, shard = open_service_file(name)
+        s = find_service(cfg, name)
+        if not s:
+            payload = envelope(
+                "service edit",
+                "error",
+                Exit.NOT_FOUND,
+                errors=[{"code": "NOT_FOUND", "detail": name}],
+            )
+            raise typer.Exit(code=emit(CTX, payload))
+        if app_path:
+            s.app_path = str(app_path)
+        if backup_path:
+            s.backup_path = str(backup_path)
+        if env:
+            s.env = env
+        if db_user:
+            s.db.user = db_user
+        if db_host:
+            s.db.host = db_host
+        if db_port:
+            s.db.port = db_port
+        save_config(cfg, shard)
+        return s
+
+    s = _update_config("service edit", change)
     if CTX.format == "json":
         payload = envelope("service edit", "ok", Exit.OK, {"service": s.model_dump()})
         raise typer.Exit(code=emit(CTX, payload))
@@ -261,16 +336,26 @@ def service_rm(
         typer.echo(f"{B}EXAMPLES{R}")
         typer.echo("  devkit service rm myapp -y")
         raise typer.Exit(0)
-    cfg = load_config()
-    s = find_service(cfg, name)
-    if not s:
+
+    def not_found():
         payload = envelope("service rm", "error", Exit.NOT_FOUND, errors=[{"code":"NOT_FOUND","detail":name}])
         raise typer.Exit(code=emit(CTX, payload))
+
+    if not find_service(load_config(), name):
+        not_found()
+    # ask before taking the lock so a pending prompt does not block other devkit processes
     proceed = yes or CTX.yes or (CTX.interactive and confirm(f"Delete service \"{name}\"?"))
     if not proceed:
         raise typer.Exit(code=Exit.OK)
-    cfg.services = [x for x in cfg.services if x.name != name]
-    save_config(cfg)
+
+    def change():
+        cfg, shard = open_service_file(name)
+        if not find_service(cfg, name):
+            not_found()  # removed by someone else meanwhile
+        cfg.services = [x for x in cfg.services if x.name != name]
+        save_config(cfg, shard)
+
+    _update_config("service rm", change)
     if CTX.format == "json":
         payload = envelope("service rm", "ok", Exit.OK, {"removed": name})
         raise typer.Exit(code=emit(CTX, payload))
@@ -278,125 +363,828 @@ def service_rm(
 
 
 # ------------------- db -------------------
+def _ask_pg_password(envp: dict, db) -> None:
+    # Ask once for Postgres password if needed and interactive
+    if "PGPASSWORD" not in envp and CTX.interactive:
+        try:
+            pwd = typer.prompt(
+                f"Postgres password for user '{db.user}' on {db.host}:{db.port}",
+                hide_input=True,
+                default="",
+                show_default=False,
+            )
+        except Exception:
+            pwd = ""
+        if pwd:
+            envp["PGPASSWORD"] = pwd
+
+
 @db_app.command("reset", context_settings={"help_option_names": []})
 def db_reset(
-    name: Optional[str] = typer.Argument(None),
+    names: Optional[List[str]] = typer.Argument(None),
+    all_: bool = typer.Option(False, "--all", help="Reset every configured service"),
     backup: Optional[Path] = typer.Option(None, "--backup"),
     env: Optional[str] = typer.Option(None, "--env"),
     db_name: Optional[str] = typer.Option(None, "--db-name"),
-    show_help: bool = typer.Option(False, "--help", is_flag=True, is_eager=True, help="Show help for command"),
+    jobs: Optional[str] = typer.Option(
+        None, "--jobs", "-j", help="Parallel pg_restore workers: N or auto"
+    ),
+    index_jobs: str = typer.Option(
+        "auto", "--index-jobs", help="Workers building indexes and constraints: N or auto"
+    ),
+    cache: bool = typer.Option(
+        True, "--cache/--no-cache", help="Clone from / refresh the template cache"
+    ),
+    fast_restore: bool = typer.Option(
+        False,
+        "--fast-restore",
+        help="Restore-friendly server settings for the reset, reverted afterwards",
+    ),
+    no_fsync: bool = typer.Option(
+        False,
+        "--no-fsync",
+        help="With --fast-restore: also turn fsync off (throwaway clusters only)",
+    ),
+    via_rails: bool = typer.Option(
+        False, "--via-rails", help="Drop/create with rails db:drop/db:create"
+    ),
+    refresh_db_name: bool = typer.Option(
+        False, "--refresh-db-name", help="Ignore the cached inferred DB name"
+    ),
+    concurrency: int = typer.Option(4, "--concurrency", help="Services reset at the same time"),
+    per_host: int = typer.Option(2, "--per-host", help="Concurrent resets per Postgres server"),
+    only_tables: Optional[List[str]] = typer.Option(
+        None,
+        "--only-tables",
+        help="Restore data only for these tables (comma-separated, wildcards ok)",
+    ),
+    exclude_table_data: Optional[List[str]] = typer.Option(
+        None, "--exclude-table-data", help="Restore these tables empty"
+    ),
+    schema_only: bool = typer.Option(
+        False, "--schema-only", help="Restore the schema without any table data"
+    ),
+    sample: Optional[float] = typer.Option(
+        None, "--sample", help="Restore a deterministic PCT% of each table's rows"
+    ),
+    progress: Optional[bool] = typer.Option(
+        None,
+        "--progress/--no-progress",
+        help="Live restore progress on stderr (default: when it is a terminal)",
+    ),
+    events: bool = typer.Option(
+        False,
+        "--events",
+        help="With --format json, stream NDJSON phase/progress events before the envelope",
+    ),
+    show_help: bool = typer.Option(
+        False, "--help", is_flag=True, is_eager=True, help="Show help for command"
+    ),
 ):
-    if show_help or (name is None and backup is None and env is None and db_name is None):
+    if show_help or (not names and not all_ and backup is None and env is None and db_name is None):
         B = "\033[1m"; R = "\033[0m"
         typer.echo(f"{B}DB RESET{R}")
         typer.echo("  Drop, create and restore the database from a backup\n")
         typer.echo(f"{B}USAGE{R}")
-        typer.echo("  devkit db reset NAME --backup FILE [--env ENV] [--db-name NAME]\n")
+        typer.echo(
+            "  devkit db reset NAME --backup FILE [--env ENV] [--db-name NAME] [--jobs N|auto]"
+        )
+        typer.echo("  devkit db reset NAME... | --all [--concurrency N] [--per-host N]\n")
+        typer.echo(f"{B}OPTIONS{R}")
+        typer.echo(
+            "  --jobs N|auto      Restore custom dumps with N parallel workers (auto: CPUs/TOC)"
+        )
+        typer.echo("  --index-jobs N|auto  Workers building indexes/constraints (default: auto)")
+        typer.echo(
+            "  --no-cache         Skip the template cache and always restore from the backup"
+        )
+        typer.echo(
+            "  --fast-restore     Raise max_wal_size, unlogged/no-autovacuum load, ANALYZE after"
+        )
+        typer.echo(
+            "  --no-fsync         With --fast-restore: fsync off too (throwaway clusters only)"
+        )
+        typer.echo("  --via-rails        Drop/create with rails db:drop/db:create instead of SQL")
+        typer.echo("  --only-tables T,.. Full schema, data only for these tables")
+        typer.echo("  --exclude-table-data T,..  Full schema, these tables restored empty")
+        typer.echo("  --schema-only      Full schema, no table data")
+        typer.echo("  --sample PCT       Deterministic PCT% of each table's rows (no foreign keys)")
+        typer.echo(
+            "  --refresh-db-name  Re-infer the DB name with rails runner instead of the cache"
+        )
+        typer.echo("  --all              Reset every configured service")
+        typer.echo("  --concurrency N    Services reset at the same time (default: 4)")
+        typer.echo("  --per-host N       Concurrent resets per Postgres server (default: 2)")
+        typer.echo(
+            "  --[no-]progress    Live bytes, MB/s and tables on stderr (default: on a terminal)"
+        )
+        typer.echo(
+            "  --events           With --format json, stream NDJSON events before the envelope\n"
+        )
         typer.echo(f"{B}EXAMPLES{R}")
         typer.echo("  devkit db reset myapp --backup /file.dump")
+        typer.echo("  devkit db reset myapp --jobs auto")
+        typer.echo("  devkit db reset myapp --only-tables users,orders")
+        typer.echo("  devkit db reset api web worker --concurrency 3")
         raise typer.Exit(0)
+    if no_fsync and not fast_restore:
+        payload = envelope(
+            "db reset",
+            "error",
+            Exit.INVALID_ARGS,
+            errors=[
+                {"code": "INVALID_ARGS", "detail": "--no-fsync only applies with --fast-restore"}
+            ],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
     if CTX.safe and not (CTX.yes):
         payload = envelope("db reset", "error", Exit.FORBIDDEN, errors=[{"code":"SAFE_MODE","detail":"Use --yes to confirm in safe mode"}])
         raise typer.Exit(code=emit(CTX, payload))
 
+    from . import reset
+    from .partial import PartialRestore, split_names
+    from .progress import fanout, ndjson_sink, text_sink
+    from .reset import ResetError, ResetOptions
+
     cfg = load_config()
+    opts = ResetOptions(
+        backup=backup,
+        env=env,
+        db_name=db_name,
+        jobs=jobs,
+        index_jobs=index_jobs,
+        cache=cache,
+        fast_restore=fast_restore,
+        fsync=not no_fsync,
+        via_rails=via_rails,
+        refresh_db_name=refresh_db_name,
+        trace=CTX.trace,
+        partial=PartialRestore(
+            only_tables=split_names(only_tables),
+            exclude_table_data=split_names(exclude_table_data),
+            schema_only=schema_only,
+            sample=sample,
+        ),
+        quiet=CTX.format == "json",  # stdout carries only events and the envelope
+    )
+    event_sink = ndjson_sink() if events and CTX.format == "json" else None
+    if all_ or (names and len(names) > 1):
+        _db_reset_many(cfg, names or [], all_, opts, concurrency, per_host, event_sink)
+        return
+
+    name = names[0] if names else None
     s = find_service(cfg, name)
     if not s:
         payload = envelope("db reset", "error", Exit.NOT_FOUND, errors=[{"code":"NOT_FOUND","detail":name}])
         raise typer.Exit(code=emit(CTX, payload))
-
-    app_path = Path(s.app_path)
-    backup_path = Path(str(backup or s.backup_path))
-    if not backup_path.exists():
-        payload = envelope("db reset", "error", Exit.PRECONDITION, errors=[{"code":"BACKUP_MISSING","detail":str(backup_path)}])
+    try:
+        target = reset.prepare(s, opts)
+    except ResetError as e:
+        payload = envelope("db reset", "error", e.exit_code, errors=[e.as_error()])
         raise typer.Exit(code=emit(CTX, payload))
 
-    env_name = env or s.env
-    dbn = db_name or s.db.name or None
-    if not dbn:
-        try:
-            dbn = infer_db_name(app_path, env_name)
-        except Exception as e:
-            payload = envelope("db reset", "error", Exit.PRECONDITION, errors=[{"code":"DB_NAME_INFER","detail":str(e)}])
-            raise typer.Exit(code=emit(CTX, payload))
+    dbn = target.db_name
     proceed = CTX.yes or (CTX.interactive and confirm(f"This will drop and recreate \"{dbn}\". Continue?"))
     if not proceed:
         raise typer.Exit(code=Exit.OK)
 
-    rails_cmd = rails_bin(app_path)
     envp = os.environ.copy()
-    envp["RAILS_ENV"] = env_name
+    _ask_pg_password(envp, s.db)
+    if progress is None:
+        progress = CTX.format != "json" and not CTX.quiet and sys.stderr.isatty()
+    sink = fanout(text_sink() if progress else None, event_sink)
+    try:
+        data = reset.execute(target, opts, cfg.cache, envp, events=sink)
+    except ResetError as e:
+        payload = envelope("db reset", "error", e.exit_code, errors=[e.as_error()])
+        raise typer.Exit(code=emit(CTX, payload)) from None
 
-    # Ask once for Postgres password if needed and interactive
-    if "PGPASSWORD" not in envp and CTX.interactive:
+    if CTX.format == "json":
+        payload = envelope("db reset", "ok", Exit.OK, data)
+        raise typer.Exit(code=emit(CTX, payload))
+    typer.echo(f"reset db • {s.name} • env={target.env_name} • db={dbn}")
+    if data["cloned_from"]:
+        typer.echo(f"database cloned from cached template {data['cloned_from']}.")
+    else:
+        typer.echo("database restored successfully.")
+    if data["fast_restore"]:
+        changed = ", ".join(
+            f"{k} {v['from']}→{v['to']}" for k, v in data["fast_restore"]["server"].items()
+        )
+        typer.echo(f"fast restore: {changed} (reverted)")
+    typer.echo(
+        " • ".join(
+            f"{st['name']} {st['duration_ms'] / 1000:.1f}s"
+            for st in data["steps"]
+            if "duration_ms" in st
+        )
+    )
+
+
+def _db_reset_many(
+    cfg: "Config",
+    names: List[str],
+    all_: bool,
+    opts: "ResetOptions",
+    concurrency: int,
+    per_host: int,
+    events=None,
+) -> None:
+    from . import reset
+    from .reset import ResetError
+
+    if opts.backup or opts.db_name:
+        payload = envelope(
+            "db reset",
+            "error",
+            Exit.INVALID_ARGS,
+            errors=[
+                {
+                    "code": "INVALID_ARGS",
+                    "detail": "--backup and --db-name apply to a single service",
+                }
+            ],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    services = list(cfg.services) if all_ else []
+    for n in names if not all_ else []:
+        s = find_service(cfg, n)
+        if not s:
+            payload = envelope(
+                "db reset", "error", Exit.NOT_FOUND, errors=[{"code": "NOT_FOUND", "detail": n}]
+            )
+            raise typer.Exit(code=emit(CTX, payload))
+        services.append(s)
+    if not services:
+        payload = envelope(
+            "db reset",
+            "error",
+            Exit.NOT_FOUND,
+            errors=[{"code": "NOT_FOUND", "detail": "no services configured"}],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+
+    # preflight every service before touching any database
+    targets, results = [], {}
+    for s in services:
         try:
-            pwd = typer.prompt(
-                f"Postgres password for user '{s.db.user}' on {s.db.host}:{s.db.port}",
-                hide_input=True,
-                default="",
-                show_default=False,
+            targets.append(reset.prepare(s, opts))
+        except ResetError as e:
+            results[s.name] = {
+                "service": s.name,
+                "status": "error",
+                "exit_code": e.exit_code,
+                "errors": [e.as_error()],
+                "duration_ms": 0,
+            }
+    if targets:
+        listing = ", ".join(t.db_name for t in targets)
+        proceed = CTX.yes or (
+            CTX.interactive
+            and confirm(
+                f"This will drop and recreate {len(targets)} databases ({listing}). Continue?"
             )
-        except Exception:
-            pwd = ""
-        if pwd:
-            envp["PGPASSWORD"] = pwd
+        )
+        if not proceed:
+            raise typer.Exit(code=Exit.OK)
 
-    # drop & create
-    try:
-        check(rails_cmd + ["db:drop"], cwd=app_path, env=envp, trace=CTX.trace)
-        check(rails_cmd + ["db:create"], cwd=app_path, env=envp, trace=CTX.trace)
-    except Exception as e:
-        payload = envelope("db reset", "error", Exit.EXTERNAL, errors=[{"code":"RAILS_CMD","detail":str(e)}])
+    # one password prompt per Postgres login
+    envs = {}
+    for t in targets:
+        key = (t.service.db.host, t.service.db.port, t.service.db.user)
+        if key not in envs:
+            envs[key] = os.environ.copy()
+            _ask_pg_password(envs[key], t.service.db)
+
+    def progress(kind: str, target, info: dict) -> None:
+        if CTX.format == "json" or CTX.quiet:
+            return
+        if kind == "start":
+            typer.echo(f"[{target.service.name}] resetting db={target.db_name}")
+        elif info["status"] == "ok":
+            secs = info["duration_ms"] / 1000
+            typer.echo(f"[{target.service.name}] ok • db={target.db_name} • {secs:.1f}s")
+        else:
+            err = info["errors"][0]
+            typer.echo(f"[{target.service.name}] error • {err['code']}: {err['detail']}", err=True)
+
+    opts.quiet = True
+    t0 = time.perf_counter()
+    for r in reset.execute_many(
+        targets,
+        opts,
+        cfg.cache,
+        envs,
+        concurrency=concurrency,
+        per_host=per_host,
+        on_event=progress,
+        events=events,
+    ):
+        results[r["service"]] = r
+    ordered = [results[s.name] for s in services]
+    failed = [r for r in ordered if r["status"] != "ok"]
+    exit_code = failed[0]["exit_code"] if failed else Exit.OK
+    data = {
+        "results": ordered,
+        "summary": {
+            "ok": len(ordered) - len(failed),
+            "failed": len(failed),
+            "duration_ms": int((time.perf_counter() - t0) * 1000),
+        },
+    }
+    if CTX.format == "json":
+        payload = envelope(
+            "db reset",
+            "error" if failed else "ok",
+            exit_code,
+            data,
+            errors=[{"code": "BATCH_FAILED", "detail": ", ".join(r["service"] for r in failed)}]
+            if failed
+            else None,
+        )
         raise typer.Exit(code=emit(CTX, payload))
+    for r in ordered:
+        if r["status"] != "ok" and r["duration_ms"] == 0:
+            err = r["errors"][0]
+            typer.echo(f"[{r['service']}] error • {err['code']}: {err['detail']}", err=True)
+    summary = data["summary"]
+    secs = summary["duration_ms"] / 1000
+    typer.echo(f"reset {summary['ok']}/{len(ordered)} databases in {secs:.1f}s")
+    raise typer.Exit(code=exit_code)
+
+
+def _snapshot_target(command: str, name: str, env: Optional[str], db_name: Optional[str]):
+    """Resolve (service, database name, env with password) or exit with an error."""
+    from .reset import ResetError, target_db_name
 
-    # restore
-    tool, flags = choose_restore_tool(backup_path)
-    args = [tool, "-U", s.db.user, "-h", s.db.host, "-p", str(s.db.port), "-d", dbn] + flags
-    if tool.endswith("psql") and "-f" not in flags:
-        # choose_restore_tool already adds -f for psql
-        pass
-    if tool.endswith("pg_restore") and "-1" not in flags:
-        flags.append("-1")
-    if tool.endswith("pg_restore"):
-        args.append(str(backup_path))
-
-    rc = run(args, env=envp, trace=CTX.trace)
-    if rc != 0:
-        payload = envelope("db reset", "error", Exit.EXTERNAL, errors=[{"code":"RESTORE_FAILED","detail":"pg_restore/psql"}])
+    s = find_service(load_config(), name)
+    if not s:
+        payload = envelope(
+            command, "error", Exit.NOT_FOUND, errors=[{"code": "NOT_FOUND", "detail": name}]
+        )
         raise typer.Exit(code=emit(CTX, payload))
+    try:
+        dbn = target_db_name(s, env or s.env, db_name)
+    except ResetError as e:
+        payload = envelope(command, "error", e.exit_code, errors=[e.as_error()])
+        raise typer.Exit(code=emit(CTX, payload)) from None
+    envp = os.environ.copy()
+    _ask_pg_password(envp, s.db)
+    return s, dbn, envp
+
+
+@db_app.command("snapshot")
+def db_snapshot(
+    name: str = typer.Argument(...),
+    tag: str = typer.Option(
+        "latest", "--tag", "-t", help="Snapshot name (replaces an existing one)"
+    ),
+    method: str = typer.Option("auto", "--method", help="auto | template | dump"),
+    jobs: int = typer.Option(
+        0, "--jobs", "-j", help="pg_dump workers for the dump method (default: up to 4)"
+    ),
+    env: Optional[str] = typer.Option(None, "--env"),
+    db_name: Optional[str] = typer.Option(None, "--db-name"),
+):
+    from dataclasses import asdict
+
+    from . import snapshots
 
-    # validate
-    vrc = validate_connection(s.db.user, s.db.host, s.db.port, dbn, trace=CTX.trace, env=envp)
-    if vrc != 0:
-        payload = envelope("db reset", "error", Exit.EXTERNAL, errors=[{"code":"VALIDATE_FAILED","detail":"psql SELECT 1"}])
+    if method not in snapshots.METHODS:
+        payload = envelope(
+            "db snapshot",
+            "error",
+            Exit.INVALID_ARGS,
+            errors=[
+                {
+                    "code": "INVALID_ARGS",
+                    "detail": f"--method must be one of {', '.join(snapshots.METHODS)}",
+                }
+            ],
+        )
         raise typer.Exit(code=emit(CTX, payload))
+    s, dbn, envp = _snapshot_target("db snapshot", name, env, db_name)
+    t0 = time.perf_counter()
+    try:
+        entry = snapshots.create(s, dbn, tag, method=method, jobs=jobs, trace=CTX.trace, env=envp)
+        evicted = snapshots.prune(
+            load_config().snapshots, keep=entry.key, trace=CTX.trace, env=envp
+        )
+    except Exception as e:
+        payload = envelope(
+            "db snapshot",
+            "error",
+            Exit.EXTERNAL,
+            errors=[{"code": "SNAPSHOT_FAILED", "detail": str(e)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload)) from None
+    data = {
+        "snapshot": asdict(entry),
+        "evicted": [e.key for e in evicted],
+        "duration_ms": int((time.perf_counter() - t0) * 1000),
+    }
+    if CTX.format == "json":
+        raise typer.Exit(code=emit(CTX, envelope("db snapshot", "ok", Exit.OK, data)))
+    how = f"{entry.method}, {human_bytes(entry.bytes)}"
+    typer.echo(f"snapshot {tag} of {dbn} saved ({how}) in {data['duration_ms'] / 1000:.1f}s")
+    for key in data["evicted"]:
+        typer.echo(f"evicted snapshot {key}")
+
 
+@db_app.command("restore-snapshot")
+def db_restore_snapshot(
+    name: str = typer.Argument(...),
+    tag: str = typer.Option("latest", "--tag", "-t"),
+    jobs: int = typer.Option(
+        0, "--jobs", "-j", help="pg_restore workers for dump snapshots (default: up to 4)"
+    ),
+    env: Optional[str] = typer.Option(None, "--env"),
+    db_name: Optional[str] = typer.Option(None, "--db-name"),
+):
+    from . import snapshots
+
+    if CTX.safe and not CTX.yes:
+        payload = envelope(
+            "db restore-snapshot",
+            "error",
+            Exit.FORBIDDEN,
+            errors=[{"code": "SAFE_MODE", "detail": "Use --yes to confirm in safe mode"}],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    s, dbn, envp = _snapshot_target("db restore-snapshot", name, env, db_name)
+    try:
+        entry = snapshots.lookup(s.name, tag, env=envp)
+    except Exception as e:
+        payload = envelope(
+            "db restore-snapshot",
+            "error",
+            Exit.EXTERNAL,
+            errors=[{"code": "SNAPSHOT_FAILED", "detail": str(e)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload)) from None
+    if not entry:
+        payload = envelope(
+            "db restore-snapshot",
+            "error",
+            Exit.NOT_FOUND,
+            errors=[{"code": "SNAPSHOT_MISSING", "detail": f"{s.name}:{tag}"}],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    proceed = CTX.yes or (
+        CTX.interactive and confirm(f'This will replace "{dbn}" with snapshot {tag}. Continue?')
+    )
+    if not proceed:
+        raise typer.Exit(code=Exit.OK)
+    t0 = time.perf_counter()
+    try:
+        snapshots.restore(entry, s.db, dbn, jobs=jobs, trace=CTX.trace, env=envp)
+    except Exception as e:
+        payload = envelope(
+            "db restore-snapshot",
+            "error",
+            Exit.EXTERNAL,
+            errors=[{"code": "SNAPSHOT_FAILED", "detail": str(e)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload)) from None
     data = {
         "service": s.name,
-        "app_path": s.app_path,
-        "backup": str(backup_path),
-        "env": env_name,
-        "db": {"name": dbn, "user": s.db.user, "host": s.db.host, "port": s.db.port},
-        "steps": [
-            {"name":"drop","status":"ok"},
-            {"name":"create","status":"ok"},
-            {"name":"restore","status":"ok","tool": tool},
-            {"name":"validate","status":"ok"},
-        ],
+        "db": dbn,
+        "tag": tag,
+        "method": entry.method,
+        "duration_ms": int((time.perf_counter() - t0) * 1000),
     }
     if CTX.format == "json":
-        payload = envelope("db reset", "ok", Exit.OK, data)
+        raise typer.Exit(code=emit(CTX, envelope("db restore-snapshot", "ok", Exit.OK, data)))
+    typer.echo(
+        f"{dbn} restored from snapshot {tag} ({entry.method}) in {data['duration_ms'] / 1000:.1f}s"
+    )
+
+
+@db_app.command("snapshots")
+def db_snapshots(name: Optional[str] = typer.Argument(None)):
+    from dataclasses import asdict
+
+    from . import snapshots
+
+    items = sorted(snapshots.entries(name), key=lambda e: (e.service, -e.created))
+    if CTX.format == "json":
+        payload = envelope("db snapshots", "ok", Exit.OK, {"snapshots": [asdict(e) for e in items]})
+        raise typer.Exit(code=emit(CTX, payload))
+    if not items:
+        typer.echo("no snapshots")
+        typer.echo("tip: save one with 'devkit db snapshot NAME --tag TAG'\n")
+        raise typer.Exit(0)
+    rows = [
+        (
+            e.service,
+            e.tag,
+            e.method,
+            human_bytes(e.bytes),
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(e.created)),
+            e.source_db,
+        )
+        for e in items
+    ]
+    typer.echo(table(["Service", "Tag", "Method", "Size", "Created", "Database"], rows))
+
+
+@db_app.command("drop-snapshot")
+def db_drop_snapshot(
+    name: str = typer.Argument(...),
+    tag: str = typer.Option("latest", "--tag", "-t"),
+    yes: bool = typer.Option(False, "--yes", "-y"),
+):
+    from . import snapshots
+
+    if CTX.safe and not (yes or CTX.yes):
+        payload = envelope(
+            "db drop-snapshot",
+            "error",
+            Exit.FORBIDDEN,
+            errors=[{"code": "SAFE_MODE", "detail": "Use --yes to confirm in safe mode"}],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    entry = snapshots.lookup(name, tag)
+    if not entry:
+        payload = envelope(
+            "db drop-snapshot",
+            "error",
+            Exit.NOT_FOUND,
+            errors=[{"code": "SNAPSHOT_MISSING", "detail": f"{name}:{tag}"}],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    proceed = yes or CTX.yes or (CTX.interactive and confirm(f"Delete snapshot {entry.key}?"))
+    if not proceed:
+        raise typer.Exit(code=Exit.OK)
+    envp = os.environ.copy()
+    _ask_pg_password(envp, entry.db)
+    try:
+        snapshots.delete(entry, trace=CTX.trace, env=envp)
+    except Exception as e:
+        payload = envelope(
+            "db drop-snapshot",
+            "error",
+            Exit.EXTERNAL,
+            errors=[{"code": "SNAPSHOT_FAILED", "detail": str(e)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload)) from None
+    if CTX.format == "json":
+        raise typer.Exit(
+            code=emit(CTX, envelope("db drop-snapshot", "ok", Exit.OK, {"removed": entry.key}))
+        )
+    typer.echo(f"snapshot {entry.key} removed")
+
+
+@cache_app.callback(invoke_without_command=True)
+def _cache_group_entry(
+    ctx: typer.Context,
+    help: bool = typer.Option(
+        False, "--help", is_flag=True, help="Show help for command", is_eager=True
+    ),
+):
+    if help or ctx.invoked_subcommand is None:
+        B = "\033[1m"
+        R = "\033[0m"
+        typer.echo(f"{B}DB CACHE{R}")
+        typer.echo("  list         List cached template databases")
+        typer.echo("  prune        Evict templates over the cache budget\n")
+        typer.echo(f"{B}USAGE{R}")
+        typer.echo("  devkit db cache <subcommand> [options]\n")
+        typer.echo(f"{B}EXAMPLES{R}")
+        typer.echo("  devkit db cache list")
+        typer.echo("  devkit db cache prune --all")
+        raise typer.Exit(0)
+
+
+@cache_app.command("list")
+def db_cache_list():
+    from dataclasses import asdict
+
+    from . import dbcache
+
+    items = sorted(dbcache.entries(), key=lambda e: e.last_used, reverse=True)
+    if CTX.format == "json":
+        payload = envelope(
+            "db cache list", "ok", Exit.OK, {"templates": [asdict(e) for e in items]}
+        )
         raise typer.Exit(code=emit(CTX, payload))
-    typer.echo(f"reset db • {s.name} • env={env_name} • db={dbn}")
-    typer.echo("database restored successfully.")
+    if not items:
+        typer.echo("no cached templates")
+        raise typer.Exit(0)
+    rows = [
+        (
+            e.template,
+            e.service,
+            human_bytes(e.bytes),
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(e.last_used)),
+            e.backup,
+        )
+        for e in items
+    ]
+    typer.echo(table(["Template", "Service", "Size", "Last Used", "Backup"], rows))
+
+
+@cache_app.command("prune", context_settings={"help_option_names": []})
+def db_cache_prune(
+    all_: bool = typer.Option(False, "--all", help="Drop every cached template"),
+    service: Optional[str] = typer.Option(
+        None, "--service", help="Only drop this service's templates"
+    ),
+):
+    from . import dbcache
+
+    cfg = load_config()
+    # one password prompt per Postgres login that holds a template to drop
+    envs = {}
+    for e in dbcache.to_prune(cfg.cache, everything=all_, service=service):
+        key = (e.host, e.port, e.user)
+        if key not in envs:
+            envs[key] = os.environ.copy()
+            _ask_pg_password(envs[key], e.db)
+    try:
+        removed = dbcache.prune(
+            cfg.cache,
+            everything=all_,
+            service=service,
+            trace=CTX.trace,
+            env=os.environ.copy(),
+            envs=envs,
+        )
+    except Exception as e:
+        payload = envelope(
+            "db cache prune",
+            "error",
+            Exit.EXTERNAL,
+            errors=[{"code": "CACHE_PRUNE", "detail": str(e)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload)) from None
+    if CTX.format == "json":
+        payload = envelope(
+            "db cache prune", "ok", Exit.OK, {"removed": [e.template for e in removed]}
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    typer.echo(f"pruned {len(removed)} template(s)")
+
+
+# ------------------- backup -------------------
+@backup_app.callback(invoke_without_command=True)
+def _backup_group_entry(
+    ctx: typer.Context,
+    help: bool = typer.Option(
+        False, "--help", is_flag=True, help="Show help for command", is_eager=True
+    ),
+):
+    if help or ctx.invoked_subcommand is None:
+        B = "\033[1m"
+        R = "\033[0m"
+        typer.echo(f"{B}BACKUPS{R}")
+        typer.echo("  scan [PATH...]   Hash and index backups into the catalog")
+        typer.echo("  list             List cataloged backups")
+        typer.echo("  inspect PATH     Show an archive's header and tables\n")
+        typer.echo(f"{B}USAGE{R}")
+        typer.echo("  devkit backup <subcommand> [options]\n")
+        typer.echo(f"{B}EXAMPLES{R}")
+        typer.echo("  devkit backup scan")
+        typer.echo("  devkit backup scan /backups/*.dump --force")
+        raise typer.Exit(0)
+
+
+def _backup_format(e) -> str:
+    return e.kind + (f"+{e.compression}" if e.compression else "")
+
+
+def _backup_row(path, e, status: str) -> tuple:
+    if e is None:
+        return (str(path), "-", "-", "-", "-", status)
+    tables = "-" if e.tables is None else f"{e.tables_with_data}/{len(e.tables)}"
+    return (str(path), _backup_format(e), human_bytes(e.size), tables, e.sha256[:12], status)
+
+
+@backup_app.command("scan")
+def backup_scan(
+    paths: Optional[List[Path]] = typer.Argument(
+        None, help="Backup files or directories (default: every service's backup)"
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Re-hash even if size and mtime are unchanged"
+    ),
+):
+    from dataclasses import asdict
+
+    from . import catalog
+
+    if not paths:
+        paths = [Path(s.backup_path) for s in load_config().services]
+    if not paths:
+        payload = envelope(
+            "backup scan",
+            "error",
+            Exit.NOT_FOUND,
+            errors=[{"code": "NOT_FOUND", "detail": "no backups to scan"}],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    t0 = time.perf_counter()
+    results = catalog.scan(paths, env=os.environ.copy(), force=force)
+    hashed = sum(status in ("new", "changed") for _, _, status in results)
+    missing = [str(p) for p, _, status in results if status == "missing"]
+    summary = {
+        "scanned": len(results),
+        "hashed": hashed,
+        "missing": len(missing),
+        "duration_ms": int((time.perf_counter() - t0) * 1000),
+    }
+    if CTX.format == "json":
+        backups = [
+            dict(asdict(e) if e else {"path": str(p)}, status=status) for p, e, status in results
+        ]
+        payload = envelope(
+            "backup scan",
+            "error" if missing else "ok",
+            Exit.NOT_FOUND if missing else Exit.OK,
+            {"backups": backups, "summary": summary},
+            errors=[{"code": "BACKUP_MISSING", "detail": ", ".join(missing)}] if missing else None,
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    rows = [_backup_row(p, e, status) for p, e, status in results]
+    typer.echo(table(["Backup", "Format", "Size", "Tables", "SHA256", "Status"], rows))
+    secs = summary["duration_ms"] / 1000
+    typer.echo(f"scanned {summary['scanned']} backup(s), hashed {hashed} in {secs:.1f}s")
+    if missing:
+        typer.echo(f"missing: {', '.join(missing)}", err=True)
+        raise typer.Exit(code=Exit.NOT_FOUND)
+
+
+@backup_app.command("list")
+def backup_list():
+    from dataclasses import asdict
+
+    from . import catalog
+
+    items = sorted(catalog.entries(), key=lambda e: e.path)
+    if CTX.format == "json":
+        payload = envelope("backup list", "ok", Exit.OK, {"backups": [asdict(e) for e in items]})
+        raise typer.Exit(code=emit(CTX, payload))
+    if not items:
+        typer.echo("no cataloged backups")
+        typer.echo("tip: build the catalog with 'devkit backup scan'\n")
+        raise typer.Exit(0)
+    rows = [
+        _backup_row(e.path, e, time.strftime("%Y-%m-%d %H:%M", time.localtime(e.scanned)))
+        for e in items
+    ]
+    typer.echo(table(["Backup", "Format", "Size", "Tables", "SHA256", "Scanned"], rows))
+
+
+@backup_app.command("inspect")
+def backup_inspect(path: Path = typer.Argument(..., help="Custom, directory or tar archive")):
+    from dataclasses import asdict
+
+    from .pgdump import read_archive
+
+    if not path.exists():
+        payload = envelope(
+            "backup inspect",
+            "error",
+            Exit.NOT_FOUND,
+            errors=[{"code": "BACKUP_MISSING", "detail": str(path)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    try:
+        archive = read_archive(path)
+    except (ValueError, OSError) as e:
+        payload = envelope(
+            "backup inspect",
+            "error",
+            Exit.INVALID_ARGS,
+            errors=[{"code": "INVALID_ARGS", "detail": str(e)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload)) from None
+    if CTX.format == "json":
+        data = asdict(archive)
+        data["entries"] = [e._asdict() for e in archive.entries]
+        raise typer.Exit(code=emit(CTX, envelope("backup inspect", "ok", Exit.OK, data)))
+    typer.echo(
+        f"{archive.format} archive {archive.version}, dumped by pg_dump {archive.dump_version} "
+        f"from {archive.dbname} (server {archive.server_version}) at {archive.created}"
+    )
+    typer.echo(
+        f"{len(archive.entries)} TOC entries, data compression: {archive.compression or 'none'}\n"
+    )
+    sizes = sorted(archive.table_data_bytes().items(), key=lambda kv: -(kv[1] or 0))
+    rows = [
+        (f"{schema}.{name}", "-" if n is None else human_bytes(n)) for (schema, name), n in sizes
+    ]
+    typer.echo(table(["Table", "Data"], rows))
 
 
 # ------------------- meta -------------------
 @meta_app.command("reference")
 def meta_reference(format: str = typer.Option(None, "--format")):
     fmt = format or CTX.format
-    ref = typer_reference(app)
-    payload = envelope("reference", "ok", Exit.OK, {"reference": ref})
+    from . import reference
+
+    payload = reference.reference_payload(reference.load(app))
+
     class _ctx: ...
     _ctx.format = fmt  # type: ignore
     raise typer.Exit(code=emit(_ctx, payload))
@@ -405,85 +1193,176 @@ def meta_reference(format: str = typer.Option(None, "--format")):
 @meta_app.command("describe")
 def meta_describe(command: Optional[str] = typer.Argument(None), format: str = typer.Option(None, "--format")):
     fmt = format or CTX.format
-    ref = typer_reference(app)
-    data = {"command": command, "reference": ref}
-    payload = envelope("describe", "ok", Exit.OK, data)
+    from . import reference
+
+    payload = reference.describe_payload(reference.load(app), command)
+
     class _ctx: ...
     _ctx.format = fmt  # type: ignore
     raise typer.Exit(code=emit(_ctx, payload))
 
 
-# ------------------- completion (simple placeholder) -------------------
-@app.command("completion")
-def completion(shell: str = typer.Argument("bash")):
-    from typer.main import get_command
-    import click
-    cli = get_command(app)
-    if shell == "bash":
-        ctx = click.Context(cli)
-        typer.echo(cli.get_help(ctx))  # Placeholder: integrate real Click completion if desired
-    else:
-        typer.echo("Completion generator placeholder. Integrate Click completion if needed.")
+# ------------------- daemon -------------------
+@daemon_app.callback(invoke_without_command=True)
+def _daemon_group_entry(
+    ctx: typer.Context,
+    help: bool = typer.Option(
+        False, "--help", is_flag=True, help="Show help for command", is_eager=True
+    ),
+):
+    if help or ctx.invoked_subcommand is None:
+        B = "\033[1m"
+        R = "\033[0m"
+        typer.echo(f"{B}DAEMON{R}")
+        typer.echo("  start        Start the daemon in the background")
+        typer.echo("  stop         Stop it (running commands finish first)")
+        typer.echo("  status       Show whether it is running")
+        typer.echo("  run          Run it in the foreground (for service managers)\n")
+        typer.echo(f"{B}USAGE{R}")
+        typer.echo("  devkit daemon <subcommand>\n")
+        typer.echo(f"{B}EXAMPLES{R}")
+        typer.echo("  devkit daemon start")
+        typer.echo("  DEVKIT_NO_DAEMON=1 devkit service list")
+        raise typer.Exit(0)
 
 
-# ------------------- help topics -------------------
-TOPICS = {
-    "environment": (
-        "Environment variables used by devkit",
-        [
-            "DEVKIT_SAFE=1  Enable safe mode; requires --yes for destructive actions",
-            "PGPASSWORD     Password for Postgres tools (psql/pg_restore)",
-            "PATH          Must include rails, psql, pg_restore when needed",
-        ],
-    ),
-    "exit-codes": (
-        "Exit codes used by devkit",
-        [
-            "0   OK",
-            f"{Exit.INVALID_ARGS}   INVALID_ARGS",
-            f"{Exit.NOT_FOUND}   NOT_FOUND",
-            f"{Exit.DEP_MISSING}   DEP_MISSING",
-            f"{Exit.PRECONDITION}   PRECONDITION",
-            f"{Exit.EXTERNAL}   EXTERNAL",
-            f"{Exit.FORBIDDEN}   FORBIDDEN",
-            f"{Exit.INTERNAL}   INTERNAL",
-        ],
-    ),
-    "formatting": (
-        "Formatting options for JSON output",
-        [
-            "Use --format json to emit a stable envelope:",
-            "{command, status, exit_code, data, errors}",
-            "Combine with --no-interactive and --yes for deterministic runs.",
-        ],
-    ),
-    "reference": (
-        "A comprehensive reference of all commands",
-        [
-            "Generate docs/commands.md with 'make docs'.",
-            "Or inspect JSON: 'devkit meta reference --format json'",
-        ],
+def _daemon_line(info: dict) -> str:
+    return (
+        f"pid {info['pid']}, up {info['uptime_s']:.0f}s, {info['requests']} request(s), "
+        f"config {info['config']}"
+    )
+
+
+@daemon_app.command("start")
+def daemon_start():
+    from . import daemon
+
+    try:
+        info, started = daemon.start()
+    except RuntimeError as e:
+        payload = envelope(
+            "daemon start",
+            "error",
+            Exit.EXTERNAL,
+            errors=[{"code": "DAEMON_FAILED", "detail": str(e)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload)) from None
+    if CTX.format == "json":
+        raise typer.Exit(
+            code=emit(CTX, envelope("daemon start", "ok", Exit.OK, {"started": started, **info}))
+        )
+    typer.echo(f"daemon {'started' if started else 'already running'} ({_daemon_line(info)})")
+
+
+@daemon_app.command("stop")
+def daemon_stop():
+    from . import daemon
+
+    info = daemon.stop()
+    if CTX.format == "json":
+        raise typer.Exit(
+            code=emit(CTX, envelope("daemon stop", "ok", Exit.OK, {"stopped": info is not None}))
+        )
+    typer.echo("daemon stopped" if info else "daemon not running")
+
+
+@daemon_app.command("status")
+def daemon_status():
+    from . import daemon
+
+    info = daemon.request("status")
+    if CTX.format == "json":
+        raise typer.Exit(
+            code=emit(
+                CTX,
+                envelope(
+                    "daemon status", "ok", Exit.OK, {"running": info is not None, **(info or {})}
+                ),
+            )
+        )
+    if info is None:
+        typer.echo("daemon not running")
+        typer.echo("tip: start it with 'devkit daemon start'\n")
+        raise typer.Exit(0)
+    typer.echo(f"daemon running ({_daemon_line(info)})")
+    typer.echo(f"socket: {info['socket']}")
+
+
+@daemon_app.command("run")
+def daemon_run():
+    from . import daemon
+
+    try:
+        daemon.serve()
+    except RuntimeError as e:
+        payload = envelope(
+            "daemon run",
+            "error",
+            Exit.PRECONDITION,
+            errors=[{"code": "DAEMON_FAILED", "detail": str(e)}],
+        )
+        raise typer.Exit(code=emit(CTX, payload)) from None
+
+
+# ------------------- completion -------------------
+@app.command("completion")
+def completion(
+    shell: str = typer.Argument("bash", help="bash | zsh | fish"),
+    refresh: bool = typer.Option(
+        False,
+        "--refresh",
+        help="Only rewrite the completion index and service names (run by the scripts when stale)",
     ),
-}
+):
+    from . import completion as comp
+
+    if not refresh and shell not in comp.SHELLS:
+        payload = envelope(
+            "completion",
+            "error",
+            Exit.INVALID_ARGS,
+            errors=[
+                {
+                    "code": "INVALID_ARGS",
+                    "detail": f"unsupported shell '{shell}' (use {', '.join(comp.SHELLS)})",
+                }
+            ],
+        )
+        raise typer.Exit(code=emit(CTX, payload))
+    # written now, so even the first TAB does not have to start devkit
+    names = comp.refresh(app)
+    if refresh:
+        if CTX.format == "json":
+            raise typer.Exit(
+                code=emit(
+                    CTX,
+                    envelope(
+                        "completion",
+                        "ok",
+                        Exit.OK,
+                        {"index": str(comp.INDEX_PATH), "services": names},
+                    ),
+                )
+            )
+        raise typer.Exit(0)
+    if CTX.format == "json":
+        raise typer.Exit(
+            code=emit(
+                CTX,
+                envelope(
+                    "completion", "ok", Exit.OK, {"shell": shell, "script": comp.script(shell)}
+                ),
+            )
+        )
+    typer.echo(comp.script(shell), nl=False)
 
 
+# ------------------- help topics -------------------
 @app.command("help")
 def help_topics(topic: Optional[str] = typer.Argument(None)):
-    B = "\033[1m"; R = "\033[0m"
-    if topic is None:
-        typer.echo(f"{B}HELP TOPICS{R}")
-        width = max(len(k) for k in TOPICS)
-        for name, (desc, _) in TOPICS.items():
-            pad = " " * (width - len(name) + 2)
-            typer.echo(f"  {name}:{pad}{desc}")
-        typer.echo("\nUse 'devkit help <topic>' for more information about a topic.")
-        raise typer.Exit(0)
-    if topic not in TOPICS:
-        typer.echo(f"{B}ERROR:{R} unknown help topic: {topic}", err=True)
-        typer.echo(f"{B}TIP:{R} Run 'devkit help' to list available topics.", err=True)
-        raise typer.Exit(2)
-    title, lines = TOPICS[topic]
-    typer.echo(f"{B}{topic.upper()}{R}")
-    typer.echo(f"  {title}\n")
-    for ln in lines:
-        typer.echo(f"  {ln}")
+    rc, out, err = topic_help(topic)
+    if out:
+        typer.echo(out)
+    if err:
+        typer.echo(err, err=True)
+    raise typer.Exit(rc)
@@ -0,0 +1,185 @@
+"""Client side of `devkit daemon`: hands one devkit call to the resident process.
+
+`bin/devkit` runs this file as a script with `python -I -S` whenever the daemon's socket
+exists, so a forwarded call costs a bare interpreter rather than devkit's startup. Keep it
+that way: it imports only modules built into the interpreter (`_socket` and `_signal`
+rather than `socket` and `signal`, `marshal` rather than `json`, no `typing`), because
+the pure-Python ones pull in `enum` and `re` and would double the client's cost. When the
+daemon does not take the call, the script execs `python -m devkit` with the same arguments.
+
+The argv, environment, cwd, umask and the stdin/stdout/stderr file descriptors go over the
+socket, so the command reads and writes the caller's own terminal or pipes; only the exit
+code travels back. Messages are marshalled dicts behind a 4-byte length; the socket lives
+in a directory only its user can enter.
+"""
+
+from __future__ import annotations
+
+import _signal
+import _socket
+import array
+import marshal
+import os
+import sys
+
+# daemon.SOCKET_PATH is derived from this
+SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".devkit", "run", "daemon.sock")
+PROTOCOL = 2
+PACKAGE = os.path.dirname(os.path.realpath(__file__))
+
+_INTERNAL = 50  # iofmt.Exit.INTERNAL
+_RELAYED = ("SIGINT", "SIGTERM", "SIGHUP", "SIGQUIT")
+
+
+# ------------------- protocol: length-prefixed marshal -------------------
+def send(sock, msg: dict, fds: tuple = ()) -> None:
+    body = marshal.dumps(msg)
+    data = len(body).to_bytes(4, "big") + body
+    if fds:
+        rights = [(_socket.SOL_SOCKET, _socket.SCM_RIGHTS, array.array("i", fds))]
+        data = data[sock.sendmsg([data], rights) :]
+    if data:
+        sock.sendall(data)
+
+
+class Reader:
+    """Messages from a socket, plus any file descriptors that came along with them."""
+
+    def __init__(self, sock) -> None:
+        self.sock, self.buf, self.fds = sock, b"", []
+
+    def message(self) -> dict | None:
+        """The next message; None at end of stream, ValueError if it is not one of ours."""
+        while len(self.buf) < 4 or len(self.buf) < 4 + int.from_bytes(self.buf[:4], "big"):
+            data, ancdata, _flags, _addr = self.sock.recvmsg(1 << 16, _socket.CMSG_SPACE(3 * 4))
+            for level, kind, payload in ancdata:
+                if level == _socket.SOL_SOCKET and kind == _socket.SCM_RIGHTS:
+                    fds = array.array("i")
+                    fds.frombytes(payload[: len(payload) - len(payload) % fds.itemsize])
+                    self.fds.extend(fds)
+            if not data:
+                return None
+            self.buf += data
+        size = int.from_bytes(self.buf[:4], "big")
+        body, self.buf = self.buf[4 : 4 + size], self.buf[4 + size :]
+        try:
+            msg = marshal.loads(body)
+        except (EOFError, TypeError) as e:
+            raise ValueError(f"bad message: {e}") from None
+        if not isinstance(msg, dict):
+            raise ValueError("bad message")
+        return msg
+
+
+def connect():
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def request(op: str, timeout: float = 5.0) -> dict | None:
+    """Send a control request (status | stop); None when no daemon answers."""
+    try:
+        sock = connect()
+    except OSError:
+        return None
+    try:
+        sock.settimeout(timeout)
+        send(sock, {"op": op, "protocol": PROTOCOL})
+        return Reader(sock).message()
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+
+
+# ------------------- forwarding -------------------
+def _command_words(argv: list[str]) -> list[str]:
+    i = 0
+    while i < len(argv) and argv[i].startswith("-"):
+        i += 2 if argv[i] == "--format" else 1
+    return argv[i:]
+
+
+def _local_only(argv: list[str]) -> bool:
+    words = _command_words(argv)
+    if words[:1] == ["daemon"]:
+        return True
+    # db commands may ask for the Postgres password, which needs our controlling terminal
+    return words[:1] == ["db"] and os.isatty(0)
+
+
+def forward(argv: list[str]) -> int | None:
+    """Run argv in the daemon; returns its exit code, or None to run it in this process."""
+    if os.environ.get("DEVKIT_NO_DAEMON") == "1" or not os.path.exists(SOCKET_PATH):
+        return None
+    if _local_only(argv):
+        return None
+    try:
+        cwd = os.getcwd()
+        sock = connect()
+    except OSError:
+        return None
+    umask = os.umask(0)
+    os.umask(umask)
+    req = {
+        "op": "run",
+        "protocol": PROTOCOL,
+        "package": PACKAGE,
+        "argv": list(argv),
+        "env": dict(os.environ),
+        "cwd": cwd,
+        "umask": umask,
+    }
+    reader = Reader(sock)
+    try:
+        send(sock, req, fds=(0, 1, 2))
+        reply = reader.message()
+    except (OSError, ValueError):
+        reply = None
+    if not reply or "pid" not in reply:
+        sock.close()
+        return None  # refused (e.g. the daemon is restarting after an upgrade)
+
+    # the command is running now: it gets our signals instead of us
+    def relay(signum, _frame):
+        try:
+            os.killpg(reply["pid"], signum)
+        except OSError:
+            pass
+
+    for name in _RELAYED:
+        _signal.signal(getattr(_signal, name), relay)
+    try:
+        while True:
+            try:
+                done = reader.message()
+                break
+            except InterruptedError:
+                continue
+            except (OSError, ValueError):
+                done = None
+                break
+    finally:
+        sock.close()
+    if not done or "exit" not in done:
+        sys.stderr.write("devkit: lost the connection to the daemon\n")
+        return _INTERNAL
+    return done["exit"]
+
+
+def main() -> None:
+    argv = sys.argv[1:]
+    rc = forward(argv)
+    if rc is None:
+        # not for the daemon after all: start devkit for real (bin/devkit set PYTHONPATH)
+        os.execv(sys.executable, [sys.executable, "-m", "devkit", *argv])
+    sys.exit(rc)
+
+
+if __name__ == "__main__":
+    main()
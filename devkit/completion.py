@@ -0,0 +1,291 @@
+"""Shell completion that does not start devkit on every TAB.
+
+`devkit completion bash|zsh|fish` prints a script that answers from three files in
+~/.devkit/cache/completion: `index` (commands, options and what their values are, taken
+from the Click tree), `services` (configured service names) and `complete.awk`, which walks
+the words before the cursor through the index. devkit itself only runs
+(`devkit completion --refresh`) when it changed since the index was written, or the config
+since the names were.
+
+Index lines are tab-separated:
+
+    #  <cli.py> <completion.py>      the sources the index was built from
+    C  <command path>  <subcommands>
+    F  <command path>  <flag options>
+    V  <command path>  <option>  <kind>     an option that takes a value
+    A  <command path>  <kind>[*]            a positional argument; * when variadic
+
+A kind is `service`, `file`, `dir`, `=choice,choice,...` or empty (anything).
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+from .store import CACHE_DIR, atomic_write
+
+COMPLETION_DIR = CACHE_DIR / "completion"
+INDEX_PATH = COMPLETION_DIR / "index"
+NAMES_PATH = COMPLETION_DIR / "services"
+AWK_PATH = COMPLETION_DIR / "complete.awk"
+
+SHELLS = ("bash", "zsh", "fish")
+
+_PACKAGE = Path(__file__).resolve().parent
+_SOURCES = (_PACKAGE / "cli.py", _PACKAGE / "completion.py")
+
+# Values of parameters whose Click type does not tell: by option, or by "<command> <argument>"
+_VALUES = {
+    "--format": "=text,json",
+    "--method": "=auto,template,dump",
+    "--service": "service",
+    "completion shell": "=" + ",".join(SHELLS),
+}
+# Positional arguments with these names take a configured service
+_SERVICE_ARGS = ("name", "names")
+
+_AWK = r"""# devkit completion (written by `devkit completion --refresh`). Walks the words before
+# the cursor through the index; prints candidates for the current word, or @files / @dirs
+# to ask the shell for path completion.
+function has(list, word,   parts, k, m) {
+    m = split(list, parts, " ")
+    for (k = 1; k <= m; k++) if (parts[k] == word) return 1
+    return 0
+}
+function offer(list, prefix,   parts, k, m) {
+    m = split(list, parts, " ")
+    for (k = 1; k <= m; k++) if (index(parts[k], cur) == 1) print prefix parts[k]
+}
+function values(kind, prefix) {
+    if (kind == "service") offer(names, prefix)
+    else if (kind == "file" || kind == "dir") print "@" kind "s"
+    else if (substr(kind, 1, 1) == "=") { gsub(",", " ", kind); offer(substr(kind, 2), prefix) }
+}
+BEGIN {
+    FS = "\t"
+    n = ENVIRON["DEVKIT_COMP_WORDS"] == "" ? 0 : split(ENVIRON["DEVKIT_COMP_WORDS"], w, "\037")
+    cur = ENVIRON["DEVKIT_COMP_CUR"]
+}
+FILENAME == ARGV[1] {
+    if ($1 == "C") subs[$2] = $3
+    else if ($1 == "F") opts[$2] = opts[$2] " " $3
+    else if ($1 == "V") { val[$2, $3] = $4; opts[$2] = opts[$2] " " $3 }
+    else if ($1 == "A") { nargs[$2]++; arg[$2, nargs[$2]] = $3 }
+    next
+}
+{ names = names " " $0 }
+END {
+    path = ""; pos = 0; pending = 0
+    for (i = 1; i <= n; i++) {
+        word = w[i]
+        if (word ~ /^-/) {
+            if ((path, word) in val) {
+                # bash splits --opt=value into --opt, =, value
+                if (i == n || (i + 1 == n && w[n] == "=")) {
+                    pending = 1; kind = val[path, word]; break
+                }
+                i += w[i + 1] == "=" ? 2 : 1
+            }
+            continue
+        }
+        if (pos == 0 && (path in subs) && has(subs[path], word)) {
+            path = path == "" ? word : path " " word
+            continue
+        }
+        pos++
+    }
+    if (pending) {
+        if (cur == "=") cur = ""
+        values(kind, "")
+        exit
+    }
+    eq = index(cur, "=")
+    if (cur ~ /^-/ && eq > 0) {
+        opt = substr(cur, 1, eq - 1)
+        if ((path, opt) in val) {
+            kind = val[path, opt]; cur = substr(cur, eq + 1); values(kind, opt "=")
+        }
+        exit
+    }
+    if (cur ~ /^-/) { offer(opts[path], ""); exit }
+    if (pos == 0 && (path in subs)) { offer(subs[path], ""); exit }
+    kind = arg[path, pos + 1]
+    last = arg[path, nargs[path]]
+    if (kind == "" && last ~ /\*$/) kind = last
+    sub(/\*$/, "", kind)
+    values(kind, "")
+}
+"""
+
+# The refresh test shared by the bash and zsh scripts
+_STALE = r"""[[ ! -r "$dir/index" || ! -e "$cli"
+        || "$cli" -nt "$dir/index" || "$comp" -nt "$dir/index"
+        || "$HOME/.devkit/config.yml" -nt "$dir/services"
+        || "$HOME/.devkit/services.d" -nt "$dir/services" ]]"""
+
+_BASH = r"""# devkit bash completion; load with: source <(devkit completion bash)
+_devkit_complete() {
+    local dir="$HOME/.devkit/cache/completion" cur="${COMP_WORDS[COMP_CWORD]}"
+    local h="" cli="" comp="" line words
+    [[ -r "$dir/index" ]] && IFS=$'\t' read -r h cli comp < "$dir/index"
+    if @STALE@; then
+        command "${COMP_WORDS[0]}" completion --refresh >/dev/null 2>&1 || return 0
+    fi
+    words="$(IFS=$'\037'; printf '%s' "${COMP_WORDS[*]:1:COMP_CWORD-1}")"
+    COMPREPLY=()
+    while IFS= read -r line; do
+        case "$line" in
+            @files|@dirs)
+                compopt -o filenames 2>/dev/null
+                [[ "$line" == @files ]] && line=-f || line=-d
+                mapfile -t -O "${#COMPREPLY[@]}" COMPREPLY < <(compgen "$line" -- "$cur") ;;
+            *) COMPREPLY+=("$line") ;;
+        esac
+    done < <(DEVKIT_COMP_WORDS="$words" DEVKIT_COMP_CUR="$cur" \
+        awk -f "$dir/complete.awk" "$dir/index" "$dir/services" 2>/dev/null)
+}
+complete -F _devkit_complete devkit
+"""
+
+_ZSH = r"""#compdef devkit
+# devkit zsh completion; load with (after compinit): source <(devkit completion zsh)
+_devkit() {
+    local dir="$HOME/.devkit/cache/completion" cur="${words[CURRENT]}" h="" cli="" comp="" line
+    local sep=$'\037'
+    local -a out cands
+    [[ -r "$dir/index" ]] && IFS=$'\t' read -r h cli comp < "$dir/index"
+    if @STALE@; then
+        command "${words[1]}" completion --refresh >/dev/null 2>&1 || return 1
+    fi
+    local before="${(pj:$sep:)words[2,CURRENT-1]}"
+    out=("${(@f)$(DEVKIT_COMP_WORDS="$before" DEVKIT_COMP_CUR="$cur" \
+        awk -f "$dir/complete.awk" "$dir/index" "$dir/services" 2>/dev/null)}")
+    for line in $out; do
+        case "$line" in
+            @files) _files ;;
+            @dirs) _files -/ ;;
+            *) cands+=("$line") ;;
+        esac
+    done
+    (( $#cands )) && compadd -Q -- $cands
+    return 0
+}
+compdef _devkit devkit
+"""
+
+_FISH = r"""# devkit fish completion; load with: devkit completion fish | source
+function __devkit_complete
+    set -l dir $HOME/.devkit/cache/completion
+    set -l h ""
+    set -l cli ""
+    set -l comp ""
+    test -r $dir/index; and read -d \t h cli comp < $dir/index
+    if not test -r $dir/index; or not test -e "$cli" \
+            ; or command test "$cli" -nt $dir/index; or command test "$comp" -nt $dir/index \
+            ; or command test $HOME/.devkit/config.yml -nt $dir/services \
+            ; or command test $HOME/.devkit/services.d -nt $dir/services
+        devkit completion --refresh >/dev/null 2>&1; or return
+    end
+    set -l tokens (commandline -opc)
+    set -e tokens[1]
+    set -lx DEVKIT_COMP_WORDS (string join \x1f -- $tokens)
+    set -lx DEVKIT_COMP_CUR (commandline -ct)
+    for line in (awk -f $dir/complete.awk $dir/index $dir/services 2>/dev/null)
+        switch $line
+            case @files
+                __fish_complete_path $DEVKIT_COMP_CUR
+            case @dirs
+                __fish_complete_directories $DEVKIT_COMP_CUR
+            case '*'
+                echo $line
+        end
+    end
+end
+complete -c devkit -f -a '(__devkit_complete)'
+"""
+
+
+def script(shell: str) -> str:
+    """The completion script for `shell` (one of SHELLS)."""
+    return {"bash": _BASH, "zsh": _ZSH, "fish": _FISH}[shell].replace("@STALE@", _STALE)
+
+
+def _kind(param, path: str) -> str:
+    import click
+
+    if isinstance(param.type, click.Choice):
+        return "=" + ",".join(str(c) for c in param.type.choices)
+    if isinstance(param.type, click.Path):
+        return "file" if param.type.file_okay else "dir"
+    if isinstance(param, click.Option):
+        return next((_VALUES[o] for o in param.opts if o in _VALUES), "")
+    if f"{path} {param.name}" in _VALUES:
+        return _VALUES[f"{path} {param.name}"]
+    if path.split(" ")[0] in ("service", "services", "db") and param.name in _SERVICE_ARGS:
+        return "service"
+    if path == "help":
+        from .topics import TOPICS
+
+        return "=" + ",".join(TOPICS)
+    return ""
+
+
+def index_lines(app) -> List[str]:
+    """The completion index of the Typer `app`, one line per fact (see the module docstring)."""
+    import click
+    from typer.main import get_command
+
+    lines = ["\t".join(["#"] + [str(p) for p in _SOURCES])]
+
+    def walk(cmd, path: str) -> None:
+        subs = getattr(cmd, "commands", None) or {}
+        if subs:
+            lines.append(f"C\t{path}\t{' '.join(sorted(subs))}")
+        flags = []
+        for p in cmd.params:
+            if isinstance(p, click.Option) and (p.is_flag or p.count):
+                flags += p.opts + p.secondary_opts
+            elif isinstance(p, click.Option):
+                lines.extend(f"V\t{path}\t{o}\t{_kind(p, path)}" for o in p.opts + p.secondary_opts)
+            elif isinstance(p, click.Argument):
+                lines.append(f"A\t{path}\t{_kind(p, path)}{'*' if p.nargs == -1 else ''}")
+        if flags:
+            lines.append(f"F\t{path}\t{' '.join(flags)}")
+        for name in sorted(subs):
+            walk(subs[name], f"{path} {name}".strip())
+
+    walk(get_command(app), "")
+    return lines
+
+
+def index_fresh() -> bool:
+    """Whether the index on disk was built from the current sources."""
+    try:
+        built = INDEX_PATH.stat().st_mtime_ns
+        with INDEX_PATH.open() as f:
+            header = f.readline().rstrip("\n").split("\t")
+    except OSError:
+        return False
+    if header[1:] != [str(p) for p in _SOURCES] or not AWK_PATH.exists():
+        return False
+    try:
+        return all(p.stat().st_mtime_ns <= built for p in _SOURCES)
+    except OSError:
+        return False
+
+
+def refresh_names() -> int:
+    """Rewrite the service name list; returns how many names it holds."""
+    from .services import service_names
+
+    names = service_names()
+    atomic_write(NAMES_PATH, "".join(f"{n}\n" for n in names), durable=False)
+    return len(names)
+
+
+def refresh(app) -> int:
+    """Rewrite the index, the awk walker and the name list; returns the number of names."""
+    atomic_write(AWK_PATH, _AWK, durable=False)
+    atomic_write(INDEX_PATH, "\n".join(index_lines(app)) + "\n", durable=False)
+    return refresh_names()
@@ -1,12 +1,39 @@
 from __future__ import annotations
-from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
+
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
+
 
 class DbConfig(BaseModel):
     user: str = "postgres"
     host: str = "localhost"
     port: int = 5432
     name: Optional[str] = None
+    # session settings for restore connections, e.g. {"maintenance_work_mem": "1GB"}
+    restore_settings: Dict[str, str] = Field(default_factory=dict)
+
+    @field_validator("restore_settings", mode="before")
+    @classmethod
+    def settings_as_text(cls, v):
+        # YAML reads `off`/`on` as booleans and sizes like 65536 as ints
+        if isinstance(v, dict):
+            return {
+                k: ("on" if x else "off") if isinstance(x, bool) else str(x) for k, x in v.items()
+            }
+        return v
+
+
+class CacheConfig(BaseModel):
+    enabled: bool = True
+    max_templates: int = 3
+    max_bytes: Optional[int] = None
+
+
+class SnapshotConfig(BaseModel):
+    max_per_service: int = 5
+    max_bytes: Optional[int] = None
+
 
 class Service(BaseModel):
     name: str
@@ -14,15 +41,32 @@ class Service(BaseModel):
     backup_path: str
     env: str = "development"
     db: DbConfig = Field(default_factory=DbConfig)
+    # services.d file this entry was loaded from; None for config.yml
+    _source: Optional[str] = PrivateAttr(default=None)
+
 
 class Config(BaseModel):
     version: int = 1
     services: List[Service] = Field(default_factory=list)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
+    snapshots: SnapshotConfig = Field(default_factory=SnapshotConfig)
+    _by_name: Optional[tuple] = PrivateAttr(default=None)
+    # stat key of each file this config was read from, for conflict detection on save
+    _loaded: Optional[Dict[str, Optional[list]]] = PrivateAttr(default=None)
 
     @field_validator("services")
     @classmethod
     def unique_names(cls, v: List[Service]):
-        names = [s.name for s in v]
-        if len(names) != len(set(names)):
-            raise ValueError("service names must be unique")
+        seen = set()
+        for s in v:
+            if s.name in seen:
+                raise ValueError(f"service names must be unique: {s.name}")
+            seen.add(s.name)
         return v
+
+    def service_map(self) -> Dict[str, Service]:
+        """Name -> service, rebuilt only when `services` is replaced or resized."""
+        key = (id(self.services), len(self.services))
+        if self._by_name is None or self._by_name[0] != key:
+            self._by_name = (key, {s.name: s for s in self.services})
+        return self._by_name[1]
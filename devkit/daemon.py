@@ -0,0 +1,375 @@
+"""Resident devkit process (`devkit daemon`).
+
+The daemon imports the Typer app once, keeps the parsed config and the command reference
+in memory, and runs every forwarded invocation in a forked child that takes over the
+caller's stdin/stdout/stderr. Callers reach it through `devkit.client`, which `bin/devkit`
+runs from a bare interpreter; when no daemon answers, the caller runs the command itself.
+"""
+
+from __future__ import annotations
+
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .client import PROTOCOL, Reader, request, send
+from .client import SOCKET_PATH as _SOCKET
+from .store import file_lock
+
+SOCKET_PATH = Path(_SOCKET)
+RUN_DIR = SOCKET_PATH.parent
+LOG_PATH = RUN_DIR / "daemon.log"
+LOCK_PATH = RUN_DIR / ".daemon.lock"
+
+# While idle, the config and devkit's own sources are checked for changes this often
+POLL_SECONDS = 1.0
+# A connected client has this long to send its request
+REQUEST_TIMEOUT = 5.0
+
+_PACKAGE = Path(__file__).resolve().parent
+
+
+# ------------------- daemon -------------------
+def _source_key() -> tuple:
+    """Identity of the devkit sources: the daemon restarts itself when they change."""
+    return tuple(sorted((p.name, p.stat().st_mtime_ns) for p in _PACKAGE.glob("*.py")))
+
+
+def _stream(fd: int, mode: str, like):
+    buffering = 1 if fd == 2 or os.isatty(fd) else -1
+    return open(
+        fd, mode, buffering=buffering, encoding=like.encoding, errors=like.errors, closefd=False
+    )
+
+
+def _exit_code(code) -> int:
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    sys.stderr.write(f"{code}\n")
+    return 1
+
+
+def _run_child(command, req: dict, fds: List[int]) -> int:
+    """In the forked child: become the client's process and run its command."""
+    for name, handler in (
+        ("SIGCHLD", signal.SIG_DFL),
+        ("SIGTERM", signal.SIG_DFL),
+        ("SIGHUP", signal.SIG_DFL),
+        ("SIGINT", signal.default_int_handler),
+    ):
+        signal.signal(getattr(signal, name), handler)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(req["cwd"])
+    os.umask(req["umask"])
+    os.environ.clear()
+    os.environ.update(req["env"])
+    sys.stdin = _stream(0, "r", sys.__stdin__)
+    sys.stdout = _stream(1, "w", sys.__stdout__)
+    sys.stderr = _stream(2, "w", sys.__stderr__)
+    sys.argv = ["devkit", *req["argv"]]
+    try:
+        command.main(args=req["argv"], prog_name="devkit")
+        code = 0
+    except SystemExit as e:
+        code = _exit_code(e.code)
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+        code = 1
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except OSError:
+            pass
+    return code
+
+
+class _Daemon:
+    def __init__(self, listener, command) -> None:
+        import selectors
+
+        from . import services
+
+        self.listener, self.command, self.services = listener, command, services
+        self.selector = selectors.DefaultSelector()
+        self.children: Dict[int, object] = {}  # pid -> client connection
+        self.inode = os.stat(SOCKET_PATH).st_ino
+        self.source = _source_key()
+        self.started, self.requests = time.time(), 0
+        self.stopping = self.restart = False
+        self.wake: Tuple[int, int] = (-1, -1)
+        self.config_ok = services.preload()
+
+    # --- requests ---
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "socket": str(SOCKET_PATH),
+            "started": self.started,
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "commands": len(self.children),
+            "config": "loaded" if self.config_ok else "invalid",
+        }
+
+    def refresh(self) -> None:
+        """Pick up config edits, and notice upgrades of devkit itself."""
+        if not self.services.preloaded():
+            self.config_ok = self.services.preload()
+        if _source_key() != self.source:
+            self.restart = True
+        try:
+            if os.stat(SOCKET_PATH).st_ino != self.inode:
+                self.stopping = True  # replaced by another daemon
+        except FileNotFoundError:
+            self.stopping = True
+
+    def accept(self) -> None:
+        conn, _ = self.listener.accept()
+        conn.settimeout(REQUEST_TIMEOUT)
+        reader = Reader(conn)
+        try:
+            req = reader.message()
+        except (OSError, ValueError):
+            req = None
+        try:
+            if req is None or req.get("protocol") != PROTOCOL:
+                send(conn, {"fallback": "protocol"})
+            elif req.get("op") == "status":
+                send(conn, self.status())
+            elif req.get("op") == "stop":
+                self.stopping = True
+                send(conn, self.status())
+            elif req.get("op") == "run":
+                self.refresh()
+                if self.restart or self.stopping:
+                    send(conn, {"fallback": "restarting"})
+                elif req.get("package") != str(_PACKAGE) or len(reader.fds) != 3:
+                    send(conn, {"fallback": "mismatch"})
+                else:
+                    self.spawn(conn, req, reader.fds)
+                    return
+        except OSError:
+            pass
+        finally:
+            for fd in reader.fds:
+                os.close(fd)
+        conn.close()
+
+    def spawn(self, conn, req: dict, fds: List[int]) -> None:
+        import selectors
+
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.setpgid(0, 0)
+                signal.set_wakeup_fd(-1)
+                self.selector.close()
+                for fd in self.wake:
+                    os.close(fd)
+                self.listener.close()
+                for other in self.children.values():
+                    other.close()
+                conn.close()
+                code = _run_child(self.command, req, fds)
+            finally:
+                os._exit(code)
+        try:
+            os.setpgid(pid, pid)  # also done by the child: whichever runs first wins
+        except OSError:
+            pass
+        self.requests += 1
+        self.children[pid] = conn
+        try:
+            send(conn, {"pid": pid})
+        except OSError:
+            pass  # the client is gone; noticed below
+        conn.setblocking(False)
+        self.selector.register(conn, selectors.EVENT_READ, pid)
+
+    def hangup(self, key) -> None:
+        """A client connection became readable: it has gone away, so its command should too."""
+        try:
+            if key.fileobj.recv(1 << 10):
+                return
+        except BlockingIOError:
+            return
+        except OSError:
+            pass
+        self.selector.unregister(key.fileobj)
+        try:
+            os.killpg(key.data, signal.SIGTERM)
+        except OSError:
+            pass
+
+    def reap(self) -> None:
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            conn = self.children.pop(pid, None)
+            if conn is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            try:
+                self.selector.unregister(conn)
+            except KeyError:
+                pass
+            try:
+                conn.setblocking(True)
+                send(conn, {"exit": 128 - code if code < 0 else code})
+            except OSError:
+                pass
+            conn.close()
+
+    # --- main loop ---
+    def serve(self) -> None:
+        import selectors
+
+        wake_r, wake_w = self.wake = os.pipe()
+        os.set_blocking(wake_r, False)
+        os.set_blocking(wake_w, False)
+        signal.set_wakeup_fd(wake_w)
+
+        def stop(_signum, _frame):
+            self.stopping = True
+
+        signal.signal(signal.SIGCHLD, lambda *_: None)
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.selector.register(self.listener, selectors.EVENT_READ, "accept")
+        self.selector.register(wake_r, selectors.EVENT_READ, "wake")
+        accepting = True
+        while accepting or self.children:
+            for key, _ in self.selector.select(POLL_SECONDS):
+                if key.data == "accept":
+                    self.accept()
+                elif key.data == "wake":
+                    try:
+                        os.read(wake_r, 512)
+                    except BlockingIOError:
+                        pass
+                else:
+                    self.hangup(key)
+            self.reap()
+            if accepting:
+                self.refresh()
+            if accepting and (self.stopping or self.restart):
+                # new clients run in-process until a fresh daemon is up; commands already
+                # running here finish first
+                accepting = False
+                self.selector.unregister(self.listener)
+                self.close()
+        signal.set_wakeup_fd(-1)
+        os.close(wake_r)
+        os.close(wake_w)
+
+    def close(self) -> None:
+        try:
+            if os.stat(SOCKET_PATH).st_ino == self.inode:
+                SOCKET_PATH.unlink()
+        except FileNotFoundError:
+            pass
+        self.listener.close()
+
+
+def _warm():
+    """Import and build everything a command needs before the first fork."""
+    from typer.main import get_command
+
+    from . import cli, reference
+
+    command = get_command(cli.app)
+    reference.load(cli.app)
+    return command
+
+
+def serve() -> None:
+    """Run the daemon in the foreground until `devkit daemon stop`, SIGTERM or SIGINT.
+
+    When devkit's sources change it finishes running commands and re-executes itself.
+    Raises RuntimeError if another daemon already serves the socket.
+    """
+    import socket
+
+    RUN_DIR.mkdir(parents=True, exist_ok=True)
+    os.chmod(RUN_DIR, 0o700)  # the socket accepts commands: keep it to this user
+    with file_lock(LOCK_PATH):
+        if request("status") is not None:
+            raise RuntimeError(f"a daemon is already running on {SOCKET_PATH}")
+        command = _warm()
+        SOCKET_PATH.unlink(missing_ok=True)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(str(SOCKET_PATH))
+        listener.listen(64)
+    daemon = _Daemon(listener, command)
+    try:
+        daemon.serve()
+    finally:
+        daemon.close()
+    if daemon.restart and not daemon.stopping:
+        os.execv(sys.executable, [sys.executable, "-m", "devkit", "daemon", "run"])
+
+
+def start(timeout: float = 10.0) -> Tuple[dict, bool]:
+    """Start a background daemon unless one is running; returns (status, started)."""
+    import subprocess
+
+    info = request("status")
+    if info is not None:
+        return info, False
+    RUN_DIR.mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(_PACKAGE.parent)] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    env.pop("DEVKIT_NO_DAEMON", None)
+    with open(LOG_PATH, "ab") as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "devkit", "daemon", "run"],
+            cwd="/",
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = request("status")
+        if info is not None:
+            return info, True
+        if proc.poll() is not None:
+            break
+        time.sleep(0.05)
+    else:
+        proc.terminate()
+    log = LOG_PATH.read_text(errors="replace").strip() if LOG_PATH.exists() else ""
+    tail = log.splitlines()[-1:]
+    raise RuntimeError("daemon did not start" + (f": {tail[0]}" if tail else ""))
+
+
+def stop(timeout: float = 10.0) -> Optional[dict]:
+    """Ask the daemon to exit; returns its last status, or None if none was running.
+
+    Commands still running in it are not interrupted; this returns once the socket is gone.
+    """
+    info = request("stop")
+    if info is None:
+        return None
+    deadline = time.monotonic() + timeout
+    while SOCKET_PATH.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return info
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import catalog
+from .config_model import CacheConfig, DbConfig, Service
+from .postgres import (
+    clone_database,
+    database_exists,
+    database_size,
+    drop_database,
+    execute,
+    quote_ident,
+    terminate_sessions,
+)
+from .store import CACHE_DIR, file_lock, read_json, write_json
+
+INDEX_PATH = CACHE_DIR / "templates.json"
+# Serialises index updates and template create/evict between concurrent resets, in this
+# process or others. flock does not nest: code holding it calls `_unindex`, not `_forget`.
+LOCK_PATH = CACHE_DIR / ".templates.lock"
+TEMPLATE_PREFIX = "devkit_tpl_"
+
+
+@dataclass
+class TemplateEntry:
+    template: str
+    service: str
+    backup: str
+    checksum: str
+    user: str
+    host: str
+    port: int
+    bytes: int
+    created: float
+    last_used: float
+
+    @property
+    def db(self) -> DbConfig:
+        return DbConfig(user=self.user, host=self.host, port=self.port)
+
+
+def _load_index() -> dict:
+    idx = read_json(INDEX_PATH, {}) or {}
+    idx.setdefault("templates", {})
+    return idx
+
+
+def _save_index(idx: dict) -> None:
+    write_json(INDEX_PATH, idx)
+
+
+def entries() -> List[TemplateEntry]:
+    return [TemplateEntry(**raw) for raw in _load_index()["templates"].values()]
+
+
+def backup_checksum(backup_path: Path) -> str:
+    """sha256 of the backup, from the backup catalog (re-hashed only when it changes)."""
+    return catalog.checksum(backup_path)
+
+
+def template_name(service: str, checksum: str) -> str:
+    slug = re.sub(r"[^a-z0-9_]", "_", service.lower())[:32]
+    return f"{TEMPLATE_PREFIX}{slug}_{checksum[:16]}"
+
+
+def _same_server(entry: TemplateEntry, db: DbConfig) -> bool:
+    return (entry.host, entry.port) == (db.host, db.port)
+
+
+def _drop_template(entry: TemplateEntry, trace: bool, env: Optional[dict]) -> None:
+    name = quote_ident(entry.template)
+    if database_exists(entry.db, entry.template, env=env):
+        execute(entry.db, f"ALTER DATABASE {name} WITH IS_TEMPLATE false;", trace=trace, env=env)
+    drop_database(entry.db, entry.template, trace=trace, env=env)
+
+
+def lookup(s: Service, checksum: str, env: Optional[dict] = None) -> Optional[TemplateEntry]:
+    """Return the cached template for (service, backup checksum) if it still exists."""
+    idx = _load_index()
+    raw = idx["templates"].get(template_name(s.name, checksum))
+    if not raw:
+        return None
+    entry = TemplateEntry(**raw)
+    if not _same_server(entry, s.db):
+        return None
+    if not database_exists(s.db, entry.template, env=env):
+        _forget(entry.template)
+        return None
+    return entry
+
+
+def clone(
+    entry: TemplateEntry,
+    db: DbConfig,
+    dbname: str,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> None:
+    """Replace `dbname` with a copy of the cached template."""
+    terminate_sessions(db, dbname, trace=trace, env=env)
+    drop_database(db, dbname, trace=trace, env=env)
+    clone_database(db, dbname, entry.template, trace=trace, env=env)
+    with file_lock(LOCK_PATH):
+        idx = _load_index()
+        if entry.template in idx["templates"]:
+            idx["templates"][entry.template]["last_used"] = time.time()
+            _save_index(idx)
+
+
+def store(
+    s: Service,
+    backup_path: Path,
+    checksum: str,
+    dbname: str,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> TemplateEntry:
+    """Snapshot a freshly restored `dbname` as the template for (service, checksum).
+
+    Templates built by this service from older contents of the same backup file are
+    dropped, since the backup changed underneath them.
+    """
+    with file_lock(LOCK_PATH):
+        return _store(s, backup_path, checksum, dbname, trace, env)
+
+
+def _store(
+    s: Service,
+    backup_path: Path,
+    checksum: str,
+    dbname: str,
+    trace: bool,
+    env: Optional[dict],
+) -> TemplateEntry:
+    backup = str(backup_path.resolve())
+    for old in entries():
+        if old.service == s.name and old.backup == backup and old.checksum != checksum:
+            _drop_template(old, trace, env)
+            _unindex(old.template)
+
+    name = template_name(s.name, checksum)
+    drop_database(s.db, name, trace=trace, env=env)
+    clone_database(s.db, name, dbname, trace=trace, env=env)
+    # Templates refuse connections so nothing blocks a later clone
+    execute(
+        s.db,
+        f"ALTER DATABASE {quote_ident(name)} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false;",
+        trace=trace,
+        env=env,
+    )
+    now = time.time()
+    entry = TemplateEntry(
+        template=name,
+        service=s.name,
+        backup=backup,
+        checksum=checksum,
+        user=s.db.user,
+        host=s.db.host,
+        port=s.db.port,
+        bytes=database_size(s.db, name, env=env),
+        created=now,
+        last_used=now,
+    )
+    idx = _load_index()
+    idx["templates"][name] = asdict(entry)
+    _save_index(idx)
+    return entry
+
+
+def _unindex(template: str) -> None:
+    idx = _load_index()
+    if idx["templates"].pop(template, None) is not None:
+        _save_index(idx)
+
+
+def _forget(template: str) -> None:
+    with file_lock(LOCK_PATH):
+        _unindex(template)
+
+
+def to_prune(
+    budget: CacheConfig,
+    everything: bool = False,
+    service: Optional[str] = None,
+    keep: Optional[str] = None,
+) -> List[TemplateEntry]:
+    """The templates `prune` would drop right now, least recently used first."""
+    current = sorted(entries(), key=lambda e: e.last_used)
+    if everything:
+        return [e for e in current if service is None or e.service == service]
+    victims: List[TemplateEntry] = []
+    count = len(current)
+    total = sum(e.bytes for e in current)
+    for e in current:
+        over_count = count > budget.max_templates
+        over_bytes = budget.max_bytes is not None and total > budget.max_bytes
+        if not (over_count or over_bytes):
+            break
+        if e.template == keep or (service is not None and e.service != service):
+            continue
+        victims.append(e)
+        count -= 1
+        total -= e.bytes
+    return victims
+
+
+def prune(
+    budget: CacheConfig,
+    everything: bool = False,
+    service: Optional[str] = None,
+    keep: Optional[str] = None,
+    trace: bool = False,
+    env: Optional[dict] = None,
+    envs: Optional[Dict[Tuple[str, int, str], dict]] = None,
+) -> List[TemplateEntry]:
+    """Drop templates, least recently used first, until the cache fits its budget.
+
+    `everything` drops regardless of budget. With `service`, only that service's templates
+    are dropped (the budget still counts every template). `envs` maps (host, port, user) to
+    the environment for that login; templates on other logins use `env`.
+    """
+    with file_lock(LOCK_PATH):
+        victims = to_prune(budget, everything, service, keep)
+        for e in victims:
+            _drop_template(e, trace, (envs or {}).get((e.host, e.port, e.user), env))
+            _unindex(e.template)
+        return victims
@@ -1,8 +1,12 @@
 from __future__ import annotations
 from .shell import which
 
+REQUIRED = ["rails", "psql", "pg_restore"]
+# without vacuumdb, `db reset --fast-restore` analyzes through psql, one table at a time
+OPTIONAL = ["vacuumdb"]
+
 
 def diagnose() -> dict:
-    bins = {b: (which(b) or None) for b in ["rails", "psql", "pg_restore"]}
-    ok = all(bins.values())
+    bins = {b: (which(b) or None) for b in REQUIRED + OPTIONAL}
+    ok = all(bins[b] for b in REQUIRED)
     return {"binaries": bins, "ok": ok}
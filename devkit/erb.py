@@ -0,0 +1,176 @@
+"""Evaluate the small, side-effect free ERB subset found in Rails `database.yml` files.
+
+Supported inside `<%= ... %>`:
+  - string literals ('..' and ".." without interpolation), integers, nil
+  - ENV["X"], ENV['X'], ENV.fetch("X"), ENV.fetch("X", default), ENV.fetch("X") { default }
+  - `a || b`, parentheses, and trailing `.to_s` / `.to_i`
+Comment tags (`<%# %>`) render as nothing. Anything else raises `ErbError` so the caller
+can fall back to booting Rails.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, List, Mapping, Optional
+
+
+class ErbError(ValueError):
+    pass
+
+
+_TAG = re.compile(r"<%(?P<kind>[=#-]?)(?P<body>.*?)-?%>", re.DOTALL)
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<int>-?\d+)
+      | (?P<op>\|\||[()\[\]{},.|])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*[?!]?)
+    )""",
+    re.VERBOSE,
+)
+
+
+def render(text: str, environ: Optional[Mapping[str, str]] = None) -> str:
+    env = os.environ if environ is None else environ
+
+    def replace(m: re.Match) -> str:
+        kind, body = m.group("kind"), m.group("body")
+        if kind == "#":
+            return ""
+        if kind == "=":
+            value = evaluate(body, env)
+            return "" if value is None else str(value)
+        if body.strip():
+            raise ErbError(f"unsupported ERB statement: {body.strip()}")
+        return ""
+
+    return _TAG.sub(replace, text)
+
+
+def evaluate(expr: str, environ: Optional[Mapping[str, str]] = None) -> Any:
+    env = os.environ if environ is None else environ
+    parser = _Parser(_tokenize(expr), env)
+    value = parser.expr()
+    if not parser.done():
+        raise ErbError(f"unsupported ERB expression: {expr.strip()}")
+    return value
+
+
+def _tokenize(expr: str) -> List[tuple]:
+    tokens, pos, text = [], 0, expr.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise ErbError(f"unsupported ERB expression: {expr.strip()}")
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+        pos = m.end()
+    return tokens
+
+
+def _unquote(lit: str) -> str:
+    body = lit[1:-1]
+    if lit[0] == "'":
+        return re.sub(r"\\([\\'])", r"\1", body)
+    if "#{" in body:
+        raise ErbError("string interpolation is not supported")
+    escapes = {"n": "\n", "t": "\t", '"': '"', "\\": "\\"}
+    return re.sub(r"\\(.)", lambda m: escapes.get(m.group(1), m.group(1)), body)
+
+
+class _Parser:
+    def __init__(self, tokens: List[tuple], env: Mapping[str, str]):
+        self.tokens = tokens
+        self.i = 0
+        self.env = env
+
+    def done(self) -> bool:
+        return self.i == len(self.tokens)
+
+    def peek(self, value: Optional[str] = None) -> bool:
+        if self.done():
+            return False
+        return value is None or self.tokens[self.i][1] == value
+
+    def take(self, value: Optional[str] = None) -> tuple:
+        if not self.peek(value):
+            raise ErbError(f"expected {value or 'token'}")
+        tok = self.tokens[self.i]
+        self.i += 1
+        return tok
+
+    def expr(self) -> Any:
+        value = self.postfix()
+        while self.peek("||"):
+            self.take("||")
+            rhs = self.postfix()
+            # Ruby truthiness: only nil/false fall through to the right-hand side
+            value = rhs if value is None else value
+        return value
+
+    def postfix(self) -> Any:
+        value = self.primary()
+        while self.peek("."):
+            self.take(".")
+            method = self.take()[1]
+            if method == "to_s":
+                value = "" if value is None else str(value)
+            elif method == "to_i":
+                value = _to_i(value)
+            else:
+                raise ErbError(f"unsupported method: {method}")
+        return value
+
+    def primary(self) -> Any:
+        kind, tok = self.take()
+        if kind == "str":
+            return _unquote(tok)
+        if kind == "int":
+            return int(tok)
+        if tok == "nil":
+            return None
+        if tok == "(":
+            value = self.expr()
+            self.take(")")
+            return value
+        if tok == "ENV":
+            return self.env_ref()
+        raise ErbError(f"unsupported ERB token: {tok}")
+
+    def env_ref(self) -> Any:
+        if self.peek("["):
+            self.take("[")
+            key = self.expr()
+            self.take("]")
+            return self.env.get(str(key))
+        self.take(".")
+        if self.take()[1] != "fetch":
+            raise ErbError("only ENV[...] and ENV.fetch(...) are supported")
+        self.take("(")
+        key = str(self.expr())
+        default, has_default = None, False
+        if self.peek(","):
+            self.take(",")
+            default, has_default = self.expr(), True
+        self.take(")")
+        if self.peek("{"):
+            self.take("{")
+            if self.peek("|"):  # { |name| ... }
+                self.take("|")
+                self.take()
+                self.take("|")
+            default, has_default = self.expr(), True
+            self.take("}")
+        if key in self.env:
+            return self.env[key]
+        if has_default:
+            return default
+        raise ErbError(f"ENV.fetch({key!r}) has no value and no default")
+
+
+def _to_i(value: Any) -> int:
+    if value is None:
+        return 0
+    m = re.match(r"\s*-?\d+", str(value))
+    return int(m.group(0)) if m else 0
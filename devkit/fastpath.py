@@ -0,0 +1,217 @@
+"""Serve the hottest read-only invocations without importing Typer, Rich or pydantic.
+
+`devkit`, `devkit --help`, `devkit help [TOPIC]`, `devkit service list` and, once the
+reference is cached, `devkit meta reference|describe` are answered here; anything else (or
+anything this module is unsure about) falls through to the full Typer app in `devkit.cli`,
+which produces the same output for these commands. A running `devkit daemon` (see
+`devkit.daemon`) gets every invocation before either of them.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from typing import List, Optional
+
+from .iofmt import Exit
+
+# Root options (see `cli.main`); flags take no value
+_FLAGS = {
+    "--yes",
+    "-y",
+    "--interactive",
+    "--no-interactive",
+    "--safe",
+    "--quiet",
+    "--verbose",
+    "--trace",
+}
+
+# Field order of `Service.model_dump()` / `DbConfig`, with the exact types we can pass through
+_SERVICE_FIELDS = (("name", str), ("app_path", str), ("backup_path", str), ("env", str))
+_DB_FIELDS = (("user", str), ("host", str), ("port", int), ("name", (str, type(None))))
+# optional DbConfig fields that default to an empty str -> str mapping
+_DB_MAPPINGS = ("restore_settings",)
+
+
+_ANSI = re.compile(r"\033\[[0-9;]*m")
+
+
+def _echo(text: str, err: bool = False) -> None:
+    # like click.echo: styles are dropped unless the stream is a terminal
+    stream = sys.stderr if err else sys.stdout
+    if not stream.isatty():
+        text = _ANSI.sub("", text)
+    stream.write(text + "\n")
+
+
+def _parse_globals(argv: List[str]) -> Optional[tuple]:
+    """Split root options from the command words; None when we should not handle argv."""
+    fmt, show_help, i = "text", False, 0
+    while i < len(argv) and argv[i].startswith("-"):
+        arg = argv[i]
+        if arg == "--format" and i + 1 < len(argv):
+            fmt, i = argv[i + 1], i + 2
+            continue
+        if arg.startswith("--format="):
+            fmt = arg.split("=", 1)[1]
+        elif arg == "--help":
+            show_help = True
+        elif arg not in _FLAGS:
+            return None
+        i += 1
+    return fmt, show_help, argv[i:]
+
+
+def _exact(value, types) -> bool:
+    return isinstance(value, types) and not isinstance(value, bool)
+
+
+def _plain_services(data) -> Optional[List[dict]]:
+    """Services as `Service.model_dump()` would return them, or None unless trivially valid.
+
+    Only complete entries with exact types are accepted, so pydantic would neither coerce
+    nor fill defaults; unknown keys are ignored, as the models do.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("services"), list):
+        return None
+    out, names = [], set()
+    for raw in data["services"]:
+        if not isinstance(raw, dict) or not isinstance(raw.get("db"), dict):
+            return None
+        if any(k not in raw or not _exact(raw[k], t) for k, t in _SERVICE_FIELDS):
+            return None
+        if any(k not in raw["db"] or not _exact(raw["db"][k], t) for k, t in _DB_FIELDS):
+            return None
+        if raw["name"] in names:
+            return None  # let the model report the duplicate
+        names.add(raw["name"])
+        svc = {k: raw[k] for k, _ in _SERVICE_FIELDS}
+        svc["db"] = {k: raw["db"][k] for k, _ in _DB_FIELDS}
+        for k in _DB_MAPPINGS:
+            value = raw["db"].get(k, {})
+            if not isinstance(value, dict) or not all(
+                type(x) is str and type(y) is str for x, y in value.items()
+            ):
+                return None
+            svc["db"][k] = dict(value)
+        out.append(svc)
+    return out
+
+
+def _service_list(fmt: str) -> Optional[int]:
+    from .services import CONFIG_PATH, SERVICES_DIR, read_snapshot
+
+    cached = read_snapshot(with_model=False)
+    if cached:
+        services = cached[0]["services"]
+    elif SERVICES_DIR.exists():
+        return None  # merging shards is load_config's job
+    else:
+        try:
+            text = CONFIG_PATH.read_text()
+        except OSError:
+            return None  # the full path creates the default config
+        import yaml
+
+        try:
+            data = yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        except yaml.YAMLError:
+            return None
+        services = _plain_services(data)
+        if services is None:
+            return None
+    if fmt == "json":
+        from .iofmt import emit, envelope
+
+        class _ctx:
+            format = "json"
+
+        return emit(_ctx, envelope("service list", "ok", Exit.OK, {"services": services}))
+    if not services:
+        _echo("no services configured")
+        _echo("tip: add one with 'devkit service add --name NAME --app PATH --backup FILE'\n")
+        return Exit.OK
+    from .ux import table
+
+    rows = [(s["name"], s["app_path"], s["backup_path"], s["env"]) for s in services]
+    _echo(table(["Name", "App Path", "Backup Path", "Env"], rows))
+    return Exit.OK
+
+
+def _meta(words: List[str], fmt: str) -> Optional[int]:
+    """`meta reference` / `meta describe [COMMAND]` from the cached reference."""
+    rest, command = words[2:], None
+    while rest:
+        if rest[0] == "--format" and len(rest) > 1:
+            fmt, rest = rest[1], rest[2:]
+        elif rest[0].startswith("--format="):
+            fmt, rest = rest[0].split("=", 1)[1], rest[1:]
+        elif words[1] == "describe" and command is None and not rest[0].startswith("-"):
+            command, rest = rest[0], rest[1:]
+        else:
+            return None
+    from .reference import cached, describe_payload, reference_payload
+
+    data = cached()
+    if data is None:
+        return None  # the full path builds and stores it
+    from .iofmt import emit
+
+    class _ctx:
+        format = fmt
+
+    if words[1] == "reference":
+        return emit(_ctx, reference_payload(data))
+    return emit(_ctx, describe_payload(data, command))
+
+
+def dispatch(argv: List[str]) -> Optional[int]:
+    """Handle argv if it is a fast-path command; returns the exit code or None."""
+    parsed = _parse_globals(argv)
+    if parsed is None:
+        return None
+    fmt, show_help, words = parsed
+    if not words:
+        from .topics import root_help
+
+        _echo(root_help())
+        return Exit.OK
+    if show_help:
+        return None
+    if words[0] == "help" and len(words) <= 2 and not any(w.startswith("-") for w in words):
+        from .topics import topic_help
+
+        rc, out, err = topic_help(words[1] if len(words) == 2 else None)
+        if out:
+            _echo(out)
+        if err:
+            _echo(err, err=True)
+        return rc
+    if words in (["service", "list"], ["services", "list"]):
+        return _service_list(fmt)
+    if words[:2] in (["meta", "reference"], ["meta", "describe"]):
+        return _meta(words, fmt)
+    if words == ["completion", "--refresh"] and fmt == "text":
+        from .completion import index_fresh, refresh_names
+
+        if not index_fresh():
+            return None  # rebuilding the index needs the Click tree
+        refresh_names()
+        return Exit.OK
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Console entry point: try a running daemon, the fast path, then the Typer app."""
+    from .client import forward
+
+    args = sys.argv[1:] if argv is None else argv
+    rc = forward(args)
+    if rc is None:
+        rc = dispatch(args)
+    if rc is not None:
+        sys.exit(rc)
+    from .cli import app
+
+    app(args=argv, prog_name="devkit")
@@ -1,9 +1,14 @@
 from __future__ import annotations
+
+from functools import lru_cache
 from typing import Any, Dict, List
 import typer
 
 # Robust Typer/Click introspection compatible with Typer >=0.12
 
+# The command tree is fixed once imported: walk it at most once per process (see also
+# devkit.reference, which keeps the result across processes)
+@lru_cache(maxsize=None)
 def typer_reference(app: typer.Typer) -> Dict[str, Any]:
     from typer.main import get_command  # returns Click command tree
 
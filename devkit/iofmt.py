@@ -47,6 +47,8 @@ def _format_error(payload: Dict[str, Any]) -> Tuple[str, List[str]]:
         msg = f"not found: {detail}"
         if cmd.startswith("service"):
             tips.append("List services with 'devkit service list'.")
+        elif cmd == "describe":
+            tips.append("List commands with 'devkit meta reference --format json'.")
     elif code == "DUPLICATE":
         msg = f"already exists: {detail}"
     elif code == "BACKUP_MISSING":
@@ -55,15 +57,62 @@ def _format_error(payload: Dict[str, Any]) -> Tuple[str, List[str]]:
     elif code == "DB_NAME_INFER":
         msg = f"could not infer database name: {detail}"
         tips.append("Provide --db-name or ensure Rails config is accessible.")
+    elif code == "DEP_MISSING":
+        msg = f"missing dependency: {detail}"
+        tips.append("Install the tool and make sure it is in PATH.")
     elif code == "SAFE_MODE":
         msg = "safe mode is enabled"
         tips.append("Re-run with --yes or unset DEVKIT_SAFE.")
     elif code == "RAILS_CMD":
         msg = f"rails command failed: {detail}"
+    elif code == "DB_CMD":
+        msg = f"database drop/create failed: {detail}"
+        tips.append("Check the service's db settings, or re-run with --via-rails.")
+    elif code == "INVALID_JOBS":
+        msg = f"invalid worker count: {detail}"
+        tips.append("Use a positive number or 'auto'.")
+    elif code == "CLONE_FAILED":
+        msg = f"cloning the cached template failed: {detail}"
+        tips.append("Re-run with --no-cache or clear the cache with 'devkit db cache prune --all'.")
+    elif code == "FAST_RESTORE":
+        msg = f"could not apply the fast-restore settings: {detail}"
+        tips.append(
+            "ALTER SYSTEM needs a superuser (or the ALTER SYSTEM privilege); "
+            "re-run without --fast-restore."
+        )
+    elif code == "ANALYZE_FAILED":
+        msg = f"ANALYZE after the restore failed: {detail}"
+    elif code == "CACHE_PRUNE":
+        msg = f"could not prune the template cache: {detail}"
+    elif code == "BATCH_FAILED":
+        msg = f"reset failed for: {detail}"
     elif code == "RESTORE_FAILED":
         msg = "restore failed using pg_restore/psql"
+        if detail and detail != "pg_restore/psql":
+            msg += f": {detail}"
+    elif code == "INVALID_ARGS":
+        msg = f"invalid arguments: {detail}"
+    elif code == "PARTIAL_UNSUPPORTED":
+        msg = f"cannot restore selectively: {detail}"
+        tips.append(
+            "Create the backup with 'pg_dump -Fc' to use --only-tables/--schema-only/--sample."
+        )
+    elif code == "CONFIG_CONFLICT":
+        msg = f"config changed while saving: {detail}"
+        tips.append("Another process kept editing the config; re-run the command.")
+    elif code == "SNAPSHOT_FAILED":
+        msg = f"snapshot failed: {detail}"
+    elif code == "SNAPSHOT_MISSING":
+        msg = f"no such snapshot: {detail}"
+        tips.append("List snapshots with 'devkit db snapshots'.")
+    elif code == "DAEMON_FAILED":
+        msg = f"daemon: {detail}"
+        tips.append("See ~/.devkit/run/daemon.log; devkit keeps working without a daemon.")
     elif code == "VALIDATE_FAILED":
         msg = f"database validation failed: {detail}"
+        tips.append(
+            "The restore looks incomplete; check the pg_restore output with --trace and retry."
+        )
 
     if cmd:
         tips.append(f"Run 'devkit {cmd} --help' for usage.")
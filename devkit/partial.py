@@ -0,0 +1,124 @@
+"""Selective restores: filter an archive's TOC and sample COPY data.
+
+`--only-tables`, `--exclude-table-data` and `--schema-only` keep the whole schema and drop
+TABLE DATA entries from a `pg_restore -l` listing, which is then restored with `-L`.
+`--sample PCT` restores pre-data, a sampled data script and post-data in three passes.
+"""
+
+from __future__ import annotations
+
+import sys
+import zlib
+from dataclasses import asdict, dataclass, field
+from fnmatch import fnmatchcase
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+from .postgres import toc_entry_matches
+
+# Rows always kept per table in sample mode, so small lookup tables come through whole
+SAMPLE_FLOOR = 1000
+
+_DATA_TYPES = ("TABLE DATA",)
+_BLOB_TYPES = ("BLOB", "BLOBS", "BLOB METADATA", "LARGE OBJECTS")
+
+
+@dataclass
+class PartialRestore:
+    only_tables: List[str] = field(default_factory=list)
+    exclude_table_data: List[str] = field(default_factory=list)
+    schema_only: bool = False
+    sample: Optional[float] = None  # percent of rows per table
+
+    @property
+    def active(self) -> bool:
+        return bool(
+            self.only_tables
+            or self.exclude_table_data
+            or self.schema_only
+            or self.sample is not None
+        )
+
+    def validate(self) -> None:
+        if self.schema_only and (self.only_tables or self.sample is not None):
+            raise ValueError("--schema-only cannot be combined with --only-tables or --sample")
+        if self.sample is not None and not 0 < self.sample <= 100:
+            raise ValueError(f"--sample must be a percentage in (0, 100]: {self.sample:g}")
+
+    def to_dict(self) -> dict:
+        return {k: v for k, v in asdict(self).items() if v}
+
+
+def split_names(values: Optional[Iterable[str]]) -> List[str]:
+    """Flatten repeated and comma-separated option values."""
+    return [n.strip() for v in values or [] for n in v.split(",") if n.strip()]
+
+
+def table_matches(schema: str, table: str, patterns: List[str]) -> bool:
+    """`name` matches in any schema, `schema.name` only there; shell wildcards allowed."""
+    for p in patterns:
+        if "." in p:
+            if fnmatchcase(f"{schema}.{table}", p):
+                return True
+        elif fnmatchcase(table, p):
+            return True
+    return False
+
+
+def _data_table(line: str) -> Optional[Tuple[str, str]]:
+    # "<id>; <tableoid> <oid> TABLE DATA <schema> <table...> <owner>"
+    if not toc_entry_matches(line, _DATA_TYPES):
+        return None
+    fields = line.split(";", 1)[-1].split()[4:]
+    return (fields[0], " ".join(fields[1:-1])) if len(fields) >= 3 else None
+
+
+def filter_toc(lines: List[str], spec: PartialRestore) -> Tuple[List[str], Dict[str, int]]:
+    """Return the TOC lines to restore and counts of what was kept/skipped."""
+    kept: List[str] = []
+    stats = {"tables_with_data": 0, "tables_without_data": 0, "fk_skipped": 0}
+    for ln in lines:
+        table = _data_table(ln)
+        if table:
+            skip = (
+                spec.schema_only
+                or (spec.only_tables and not table_matches(*table, spec.only_tables))
+                or (spec.exclude_table_data and table_matches(*table, spec.exclude_table_data))
+            )
+            stats["tables_without_data" if skip else "tables_with_data"] += 1
+            if skip:
+                continue
+        elif spec.schema_only and toc_entry_matches(ln, _BLOB_TYPES):
+            continue
+        elif spec.sample is not None and toc_entry_matches(ln, ("FK CONSTRAINT",)):
+            # independently sampled tables rarely satisfy their foreign keys
+            stats["fk_skipped"] += 1
+            continue
+        kept.append(ln)
+    return kept, stats
+
+
+def sample_copy(src: BinaryIO, dst: BinaryIO, pct: float, floor: int = SAMPLE_FLOOR) -> None:
+    """Copy a SQL script, keeping a deterministic `pct`% of each COPY block's rows.
+
+    A row is kept when the CRC32 of its first column falls under the threshold, so the
+    same dump always yields the same subset; the first `floor` rows of every table are kept.
+    """
+    threshold = int(pct / 100 * (1 << 32))
+    in_copy, n = False, 0
+    for line in src:
+        if in_copy:
+            if line == b"\\.\n":
+                in_copy = False
+            else:
+                n += 1
+                if n > floor and zlib.crc32(line.split(b"\t", 1)[0]) >= threshold:
+                    continue
+        elif line.startswith(b"COPY ") and line.rstrip().endswith(b"FROM stdin;"):
+            in_copy, n = True, 0
+        dst.write(line)
+    dst.flush()
+
+
+if __name__ == "__main__":
+    # pipeline stage: pg_restore -f - | python -m devkit.partial PCT | psql
+    sample_copy(sys.stdin.buffer, sys.stdout.buffer, float(sys.argv[1]))
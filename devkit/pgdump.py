@@ -0,0 +1,284 @@
+"""Read the header and TOC of pg_dump archives without pg_restore.
+
+Custom archives are memory-mapped and only the TOC at the front of the file is touched;
+data blocks are located from the offsets recorded in the TOC, never read. Archives
+wrapped in gzip/zstd/... are read from the decompressor until the TOC is complete.
+Directory and tar archives keep the same TOC in `toc.dat`, next to one file per data entry.
+See pg_backup_archiver.c (ReadHead/ReadToc) for the layout.
+"""
+
+from __future__ import annotations
+
+import mmap
+import subprocess
+import tarfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .postgres import BackupFormat, decompress_command, detect_backup_format
+
+MAGIC = b"PGDMP"
+
+# Archive versions we understand: 1.10 (PostgreSQL 8.4) through 1.16 (PostgreSQL 17)
+MIN_VERSION = (1, 10, 0)
+MAX_VERSION = (1, 16, 0)
+
+# format byte -> how data is located: custom archives record offsets, directory and tar
+# archives (whose toc.dat says 3, "tar") record a data file name per entry
+_FORMATS = {1: "custom", 3: "files", 5: "files"}
+_SECTIONS = {1: "none", 2: "pre-data", 3: "data", 4: "post-data"}
+_COMPRESSION = {0: None, 1: "gzip", 2: "lz4", 3: "zstd"}
+_OFFSET_SET = 2
+
+# Entries `pg_restore -l` leaves out of its listing (restored implicitly or only with -C)
+_UNLISTED = ("ENCODING", "STDSTRINGS", "SEARCHPATH", "DATABASE", "DATABASE PROPERTIES")
+
+# Stream reads of compressed archives give up once this much has been read without a full TOC
+_STREAM_LIMIT = 256 << 20
+
+
+class TocEntry(NamedTuple):
+    dump_id: int
+    desc: str  # TABLE, TABLE DATA, INDEX, FK CONSTRAINT, ...
+    section: str  # pre-data | data | post-data | none
+    schema: Optional[str]
+    name: str
+    owner: Optional[str]
+    tableoid: str
+    oid: str
+    dependencies: Tuple[int, ...]
+    data_offset: Optional[int]  # custom archives dumped to a seekable file
+    data_length: Optional[int]  # bytes of (compressed) data in the archive
+
+    def listing(self) -> str:
+        """This entry as a `pg_restore -l` line (usable in a `-L` list)."""
+        name = " ".join(self.name.split())
+        return (
+            f"{self.dump_id}; {self.tableoid} {self.oid} {self.desc} "
+            f"{self.schema or '-'} {name} {self.owner or '-'}"
+        )
+
+
+@dataclass
+class Archive:
+    version: str
+    format: str  # custom | directory | tar
+    compression: Optional[str]  # compression of the data blocks
+    created: Optional[str]
+    dbname: Optional[str]
+    server_version: Optional[str]
+    dump_version: Optional[str]
+    entries: List[TocEntry] = field(default_factory=list)
+
+    def listing(self) -> List[str]:
+        return [e.listing() for e in self.entries if e.desc not in _UNLISTED]
+
+    def table_data_bytes(self) -> Dict[Tuple[str, str], Optional[int]]:
+        return {
+            (e.schema or "", e.name): e.data_length for e in self.entries if e.desc == "TABLE DATA"
+        }
+
+
+class _Truncated(ValueError):
+    pass
+
+
+class _Cursor:
+    __slots__ = ("buf", "pos", "int_size", "off_size")
+
+    def __init__(self, buf) -> None:
+        self.buf, self.pos, self.int_size, self.off_size = buf, 0, 4, 8
+
+    def take(self, n: int) -> bytes:
+        end = self.pos + n
+        if end > len(self.buf):
+            raise _Truncated("archive ends inside its TOC")
+        out = self.buf[self.pos : end]
+        self.pos = end
+        return out
+
+    def byte(self) -> int:
+        return self.take(1)[0]
+
+    def int(self) -> int:
+        raw = self.take(1 + self.int_size)
+        value = int.from_bytes(raw[1:], "little")
+        return -value if raw[0] else value
+
+    def str(self) -> Optional[str]:
+        n = self.int()
+        return None if n < 0 else self.take(n).decode("utf-8", "replace")
+
+    def skip_str(self) -> None:
+        n = self.int()
+        if n > 0:
+            self.take(n)
+
+    def offset(self) -> Tuple[int, int]:
+        flag = self.byte()
+        return flag, int.from_bytes(self.take(self.off_size), "little")
+
+
+def _parse(buf) -> Tuple[Archive, Dict[int, object]]:
+    """Parse header + TOC; returns the archive and each entry's raw data locator."""
+    c = _Cursor(buf)
+    if c.take(5) != MAGIC:
+        raise ValueError("not a pg_dump archive")
+    version = (c.byte(), c.byte(), c.byte())
+    if not MIN_VERSION <= version <= MAX_VERSION:
+        raise ValueError(f"unsupported archive version {'.'.join(map(str, version))}")
+    c.int_size, c.off_size = c.byte(), c.byte()
+    kind = _FORMATS.get(c.byte())
+    if kind is None:
+        raise ValueError("not a pg_dump custom, directory or tar archive")
+    if version >= (1, 15, 0):
+        compression = _COMPRESSION.get(c.byte(), "unknown")
+    else:
+        compression = "gzip" if c.int() != 0 else None
+    sec, mi, hour, mday, mon, year, _isdst = (c.int() for _ in range(7))
+    try:
+        created = datetime(year + 1900, mon + 1, mday, hour, mi, sec).isoformat(sep=" ")
+    except ValueError:
+        created = None
+    archive = Archive(
+        version=".".join(map(str, version)),
+        format="custom" if kind == "custom" else "directory",
+        compression=compression,
+        created=created,
+        dbname=c.str(),
+        server_version=c.str(),
+        dump_version=c.str(),
+    )
+    locators: Dict[int, object] = {}
+    for _ in range(c.int()):
+        dump_id = c.int()
+        c.int()  # hadDumper
+        tableoid, oid = c.str() or "0", c.str() or "0"
+        tag, desc = c.str() or "", c.str() or ""
+        section = _SECTIONS.get(c.int(), "none") if version >= (1, 11, 0) else "none"
+        c.skip_str()  # defn
+        c.skip_str()  # dropStmt
+        c.skip_str()  # copyStmt
+        schema = c.str()
+        c.skip_str()  # tablespace
+        if version >= (1, 14, 0):
+            c.skip_str()  # tableam
+        if version >= (1, 16, 0):
+            c.int()  # relkind
+        owner = c.str()
+        c.skip_str()  # "false": WITH OIDS
+        deps = []
+        while (dep := c.str()) is not None:
+            deps.append(int(dep))
+        if kind == "custom":
+            flag, pos = c.offset()
+            locators[dump_id] = pos if flag == _OFFSET_SET else None
+        else:
+            locators[dump_id] = c.str()  # data file name, relative to the directory
+        archive.entries.append(
+            TocEntry(
+                dump_id, desc, section, schema, tag, owner, tableoid, oid, tuple(deps), None, None
+            )
+        )
+    return archive, locators
+
+
+def _with_offsets(archive: Archive, locators: Dict[int, object], end: Optional[int]) -> None:
+    # data blocks are written back to back in dump order: each one ends where the next starts
+    starts = sorted(p for p in locators.values() if p is not None)
+    ends = dict(zip(starts, starts[1:] + [end], strict=True)) if starts else {}
+    entries = []
+    for e in archive.entries:
+        pos = locators.get(e.dump_id)
+        if pos is not None:
+            stop = ends[pos]
+            e = e._replace(data_offset=pos, data_length=None if stop is None else stop - pos)
+        entries.append(e)
+    archive.entries = entries
+
+
+def _read_custom(path: Path) -> Archive:
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        archive, locators = _parse(buf)
+        _with_offsets(archive, locators, len(buf))
+    return archive
+
+
+def _read_directory(path: Path) -> Archive:
+    toc = path / "toc.dat"
+    with toc.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        archive, locators = _parse(buf)
+    sizes = {}
+    for dump_id, name in locators.items():
+        if not name:
+            continue
+        # the TOC says "<id>.dat"; pg_dump adds the compression suffix to the file itself
+        for suffix in ("", ".gz", ".lz4", ".zst"):
+            try:
+                sizes[dump_id] = (path / f"{name}{suffix}").stat().st_size
+                break
+            except OSError:
+                pass
+    archive.entries = [e._replace(data_length=sizes.get(e.dump_id)) for e in archive.entries]
+    return archive
+
+
+def _read_tar(path: Path) -> Archive:
+    # member headers are read by seeking past the data, so this stays cheap on large files
+    with tarfile.open(path, "r:") as tar:
+        members = {m.name: m.size for m in tar.getmembers()}
+        with tar.extractfile("toc.dat") as f:
+            archive, locators = _parse(f.read())
+    archive.format = "tar"
+    archive.entries = [
+        e._replace(data_length=members.get(locators.get(e.dump_id) or "")) for e in archive.entries
+    ]
+    return archive
+
+
+def _read_stream(path: Path, fmt: BackupFormat) -> Archive:
+    """Custom archive inside gzip/zstd/...: decompress just enough of it to parse the TOC."""
+    proc = subprocess.Popen(
+        decompress_command(fmt, path), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    buf, want = bytearray(), 1 << 20
+    try:
+        while True:
+            chunk = proc.stdout.read(want - len(buf))
+            buf += chunk
+            try:
+                archive, locators = _parse(bytes(buf))
+            except _Truncated:
+                if not chunk or len(buf) >= _STREAM_LIMIT:
+                    raise
+                want *= 2
+                continue
+            # the decompressed size is unknown without reading everything: the last block's
+            # length stays unknown
+            _with_offsets(archive, locators, None)
+            return archive
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+
+
+def read_archive(path: Path, fmt: Optional[BackupFormat] = None) -> Archive:
+    """Header and TOC of a custom (optionally compressed), directory or plain tar archive.
+
+    Raises ValueError for other formats or archive versions this reader does not know.
+    """
+    fmt = fmt or detect_backup_format(path)
+    if fmt.kind == "directory":
+        return _read_directory(path)
+    if fmt.kind == "tar" and not fmt.compression:
+        return _read_tar(path)
+    if fmt.kind == "plain":
+        raise ValueError("plain SQL backups have no TOC")
+    if fmt.kind != "custom":
+        raise ValueError(f"compressed {fmt.kind} archives are only readable by pg_restore")
+    if fmt.compression:
+        return _read_stream(path, fmt)
+    return _read_custom(path)
@@ -1,29 +1,522 @@
 from __future__ import annotations
+
+import os
+import subprocess
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Tuple
-from .shell import run, which
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from .shell import check, which
+from .store import CACHE_DIR, file_lock, read_json, write_json
+
+if TYPE_CHECKING:
+    from .config_model import DbConfig
+
+# Maintenance database used for CREATE/DROP DATABASE statements
+ADMIN_DB = "postgres"
+
+# TOC entry types pg_restore can hand to parallel workers
+PARALLEL_TOC_TYPES = ("TABLE DATA", "INDEX", "CONSTRAINT", "FK CONSTRAINT")
+POST_DATA_TOC_TYPES = ("INDEX", "CONSTRAINT", "FK CONSTRAINT")
+
+# Session settings for restore connections unless the service overrides them: a crash
+# loses at most the last few commits, and a failed restore is redone anyway
+RESTORE_SESSION_DEFAULTS = {"synchronous_commit": "off"}
+
+# Server settings for `db reset --fast-restore`: fewer, later checkpoints while loading
+FAST_RESTORE_SERVER = {"max_wal_size": "8GB", "checkpoint_timeout": "30min"}
+# ...and with --no-fsync, for throwaway clusters only: a crash can corrupt every database
+FAST_RESTORE_NO_FSYNC = {"fsync": "off", "full_page_writes": "off"}
+
+# Servers tuned by running resets: holders and the original values to put back
+FAST_RESTORE_STATE = CACHE_DIR / "fast_restore.json"
+FAST_RESTORE_LOCK = CACHE_DIR / ".fast_restore.lock"
+
+
+@dataclass(frozen=True)
+class BackupFormat:
+    kind: str  # custom | directory | tar | plain
+    compression: Optional[str] = None  # gzip | zstd | lz4 | bzip2 | xz
+
+    @property
+    def is_archive(self) -> bool:
+        return self.kind in ("custom", "directory", "tar")
+
+    @property
+    def parallel_ok(self) -> bool:
+        # pg_restore -j needs random access: a seekable custom file or a directory
+        return self.kind in ("custom", "directory") and self.compression is None
+
 
+# magic bytes -> decompressors to try, fastest first
+COMPRESSIONS = {
+    "gzip": (b"\x1f\x8b", ["pigz", "gzip"]),
+    "zstd": (b"\x28\xb5\x2f\xfd", ["zstd"]),
+    "lz4": (b"\x04\x22\x4d\x18", ["lz4"]),
+    "bzip2": (b"BZh", ["lbzip2", "pbzip2", "bzip2"]),
+    "xz": (b"\xfd7zXZ\x00", ["xz"]),
+}
 
-def choose_restore_tool(backup_path: Path) -> Tuple[str, list[str]]:
-    name = backup_path.name.lower()
-    if name.endswith(".dump") or name.endswith(".backup") or name.endswith(".custom"):
+
+def _kind_from_head(head: bytes) -> str:
+    if head.startswith(b"PGDMP"):
+        return "custom"
+    if head[257:262] == b"ustar":
+        return "tar"
+    return "plain"
+
+
+def _peek_decompressed(backup_path: Path, compression: str, size: int = 512) -> bytes:
+    if compression in ("gzip", "bzip2", "xz"):
+        import bz2
+        import gzip
+        import lzma
+
+        opener = {"gzip": gzip.open, "bzip2": bz2.open, "xz": lzma.open}[compression]
+        with opener(backup_path, "rb") as f:
+            return f.read(size)
+    # zstd/lz4 have no stdlib module; read the head of the tool's output and stop it
+    proc = subprocess.Popen(
+        decompress_command(BackupFormat("plain", compression), backup_path),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        return proc.stdout.read(size)
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def detect_backup_format(backup_path: Path) -> BackupFormat:
+    """Identify the dump format from its content (magic bytes), not its file name."""
+    if backup_path.is_dir():
+        return BackupFormat("directory")
+    with backup_path.open("rb") as f:
+        head = f.read(512)
+    for name, (magic, _) in COMPRESSIONS.items():
+        if head.startswith(magic):
+            return BackupFormat(_kind_from_head(_peek_decompressed(backup_path, name)), name)
+    return BackupFormat(_kind_from_head(head))
+
+
+def decompress_command(fmt: BackupFormat, backup_path: Optional[Path] = None) -> List[str]:
+    """Command that writes the decompressed backup (or its stdin) to stdout."""
+    _, tools = COMPRESSIONS[fmt.compression]
+    for tool in tools:
+        path = which(tool)
+        if path:
+            return [path, "-dc"] + ([str(backup_path)] if backup_path else [])
+    raise FileNotFoundError(f"{' or '.join(tools)} is required to read {fmt.compression} backups")
+
+
+def choose_restore_tool(
+    backup_path: Path,
+    jobs: int = 1,
+    fmt: Optional[BackupFormat] = None,
+    from_stdin: Optional[bool] = None,
+) -> Tuple[str, list[str]]:
+    """Pick pg_restore/psql and its flags. Compressed backups are read from stdin."""
+    fmt = fmt or detect_backup_format(backup_path)
+    if from_stdin is None:
+        from_stdin = fmt.compression is not None
+    source = "-" if from_stdin else str(backup_path)
+    if fmt.is_archive:
         tool = which("pg_restore") or "pg_restore"
-        return tool, ["-1"]
+        # Parallel restore cannot run inside a single transaction
+        flags = ["-1"] if jobs <= 1 else ["-j", str(jobs)]
+        return tool, flags + ([] if from_stdin else [source])
     tool = which("psql") or "psql"
-    return tool, ["-f", str(backup_path)]
+    return tool, ["-f", source]
 
 
-def validate_connection(
-    user: str,
-    host: str,
-    port: int,
-    db: str,
-    trace: bool = False,
+def list_toc(
+    backup_path: Path,
+    env: Optional[dict] = None,
+    fmt: Optional[BackupFormat] = None,
+) -> List[str]:
+    """Return the TOC entry lines of an archive (`pg_restore -l`), decompressing if needed.
+
+    The TOC is read natively (see `pgdump`) when possible; `pg_restore -l` is the fallback.
+    """
+    from .pgdump import read_archive
+
+    try:
+        return read_archive(backup_path, fmt).listing()
+    except (ValueError, OSError):
+        pass  # unknown layout or version: let pg_restore decide
+    fmt = fmt or detect_backup_format(backup_path)
+    tool = which("pg_restore") or "pg_restore"
+    if fmt.compression:
+        # the TOC sits at the start of the archive; pg_restore stops reading after it
+        unpack = subprocess.Popen(
+            decompress_command(fmt, backup_path), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        res = subprocess.run(
+            [tool, "-l"], env=env, stdin=unpack.stdout, capture_output=True, text=True
+        )
+        unpack.stdout.close()
+        unpack.kill()
+        unpack.wait()
+    else:
+        res = subprocess.run(
+            [tool, "-l", str(backup_path)], env=env, capture_output=True, text=True
+        )
+    if res.returncode != 0:
+        raise RuntimeError(res.stderr.strip() or f"pg_restore -l failed ({res.returncode})")
+    return [ln for ln in res.stdout.splitlines() if ln.strip() and not ln.startswith(";")]
+
+
+def toc_entry_matches(line: str, types: tuple[str, ...]) -> bool:
+    # "<id>; <tableoid> <oid> <TYPE...> <schema> <tag...> <owner>"; tags may contain spaces,
+    # so match the type by prefix instead of splitting the line into fields.
+    rest = " ".join(line.split(";", 1)[-1].split()[2:]) + " "
+    return any(rest.startswith(t + " ") for t in types)
+
+
+def auto_jobs(
+    backup_path: Path, env: Optional[dict] = None, types: Tuple[str, ...] = PARALLEL_TOC_TYPES
+) -> int:
+    """Size pg_restore workers from CPU count and the parallelizable TOC entries."""
+    cpus = os.cpu_count() or 1
+    try:
+        entries = list_toc(backup_path, env=env)
+    except Exception:
+        return 1
+    work = sum(1 for ln in entries if toc_entry_matches(ln, types))
+    return max(1, min(cpus, work))
+
+
+def resolve_jobs(
+    backup_path: Path,
+    jobs: Optional[str],
     env: Optional[dict] = None,
+    fmt: Optional[BackupFormat] = None,
+    types: Tuple[str, ...] = PARALLEL_TOC_TYPES,
+    option: str = "--jobs",
 ) -> int:
+    """Turn a --jobs value (None, "auto" or N) into a worker count for this backup.
+
+    `auto` sizes the pool from the CPU count and the TOC entries of `types`.
+    """
+    if jobs is None:
+        return 1
+    if jobs != "auto":
+        try:
+            n = int(jobs)
+        except ValueError:
+            raise ValueError(f"{option} expects a number or 'auto', got '{jobs}'") from None
+        if n < 1:
+            raise ValueError(f"{option} must be at least 1")
+    fmt = fmt or detect_backup_format(backup_path)
+    if not fmt.parallel_ok:
+        return 1
+    return auto_jobs(backup_path, env=env, types=types) if jobs == "auto" else n
+
+
+def session_options(settings: dict, env: Optional[dict] = None) -> dict:
+    """Copy of `env` whose PGOPTIONS sets `settings` on every libpq connection."""
+    env = dict(env if env is not None else os.environ)
+    # libpq splits PGOPTIONS on whitespace; a backslash keeps a space inside a value
+    opts = ["-c " + f"{k}={v}".replace(" ", "\\ ") for k, v in settings.items()]
+    if opts:
+        env["PGOPTIONS"] = " ".join(filter(None, [env.get("PGOPTIONS", "")] + opts))
+    return env
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def psql_args(db: "DbConfig", dbname: str = ADMIN_DB) -> List[str]:
     tool = which("psql") or "psql"
-    return run(
-        [tool, "-U", user, "-h", host, "-p", str(port), "-d", db, "-c", "SELECT 1;"],
+    conn = ["-U", db.user, "-h", db.host, "-p", str(db.port)]
+    return [tool, "-X", "-q", "-v", "ON_ERROR_STOP=1", *conn, "-d", dbname]
+
+
+def execute(
+    db: "DbConfig",
+    sql: str,
+    dbname: str = ADMIN_DB,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> None:
+    """Run one SQL statement through psql; raises RuntimeError on failure."""
+    args = psql_args(db, dbname) + ["-c", sql]
+    if trace:
+        print(f"$ {' '.join(args[:-2])} -c {sql!r}")
+    res = subprocess.run(
+        args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    if res.returncode != 0:
+        raise RuntimeError(res.stderr.strip() or f"psql failed ({res.returncode}): {sql}")
+
+
+def query(
+    db: "DbConfig",
+    sql: str,
+    dbname: str = ADMIN_DB,
+    env: Optional[dict] = None,
+) -> List[List[str]]:
+    """Run a query through psql and return its rows as lists of text fields."""
+    args = psql_args(db, dbname) + ["-At", "-F", "\t", "-c", sql]
+    res = subprocess.run(args, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if res.returncode != 0:
+        raise RuntimeError(res.stderr.strip() or f"psql failed ({res.returncode}): {sql}")
+    return [ln.split("\t") for ln in res.stdout.splitlines() if ln]
+
+
+def server_version_num(db: "DbConfig", env: Optional[dict] = None) -> int:
+    rows = query(db, "SHOW server_version_num;", env=env)
+    return int(rows[0][0]) if rows else 0
+
+
+def database_exists(db: "DbConfig", name: str, env: Optional[dict] = None) -> bool:
+    rows = query(db, f"SELECT 1 FROM pg_database WHERE datname = {quote_literal(name)};", env=env)
+    return bool(rows)
+
+
+def database_size(db: "DbConfig", name: str, env: Optional[dict] = None) -> int:
+    rows = query(db, f"SELECT pg_database_size({quote_literal(name)});", env=env)
+    return int(rows[0][0]) if rows else 0
+
+
+def terminate_sessions(
+    db: "DbConfig",
+    name: str,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> None:
+    """Disconnect every other session from `name` so it can be dropped or cloned."""
+    execute(
+        db,
+        "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+        f"WHERE datname = {quote_literal(name)} AND pid <> pg_backend_pid();",
         trace=trace,
         env=env,
     )
+
+
+def drop_database(
+    db: "DbConfig",
+    name: str,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> None:
+    execute(db, f"DROP DATABASE IF EXISTS {quote_ident(name)};", trace=trace, env=env)
+
+
+def create_database(
+    db: "DbConfig",
+    name: str,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> None:
+    execute(db, f"CREATE DATABASE {quote_ident(name)};", trace=trace, env=env)
+
+
+def clone_database(
+    db: "DbConfig",
+    name: str,
+    template: str,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> None:
+    """CREATE DATABASE name TEMPLATE template, copying files directly on Postgres 15+."""
+    sql = f"CREATE DATABASE {quote_ident(name)} TEMPLATE {quote_ident(template)}"
+    # WAL_LOG (the 15+ default) writes every block to WAL; FILE_COPY is faster for big clones
+    if server_version_num(db, env=env) >= 150000:
+        sql += " STRATEGY FILE_COPY"
+    execute(db, sql + ";", trace=trace, env=env)
+
+
+def _original_settings(db: "DbConfig", names: List[str], env: Optional[dict]) -> Dict[str, dict]:
+    """Current value of each setting and whether it came from ALTER SYSTEM."""
+    rows = query(
+        db,
+        "SELECT name, current_setting(name), coalesce(sourcefile, '') LIKE '%postgresql.auto.conf' "
+        f"FROM pg_settings WHERE name IN ({', '.join(quote_literal(n) for n in names)});",
+        env=env,
+    )
+    return {name: {"value": value, "altered": flag == "t"} for name, value, flag in rows}
+
+
+def _alter_system(
+    db: "DbConfig", settings: Dict[str, Optional[str]], trace: bool, env: Optional[dict]
+) -> None:
+    # ALTER SYSTEM cannot run inside a transaction block: one statement per psql call
+    for name, value in settings.items():
+        if value is None:
+            execute(db, f"ALTER SYSTEM RESET {name};", trace=trace, env=env)
+        else:
+            execute(db, f"ALTER SYSTEM SET {name} = {quote_literal(value)};", trace=trace, env=env)
+    execute(db, "SELECT pg_reload_conf();", trace=trace, env=env)
+
+
+def _alive(holder: str) -> bool:
+    try:
+        os.kill(int(holder.split(":", 1)[0]), 0)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+@contextmanager
+def server_settings(
+    db: "DbConfig",
+    settings: Dict[str, str],
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> Iterator[Dict[str, dict]]:
+    """Apply `settings` with ALTER SYSTEM for the `with` block, then put the originals back.
+
+    Yields {name: {"from": original, "to": value}}. Resets sharing a server (a batch, or
+    other devkit processes) share one application: the first records the original values,
+    the last one out restores them. Holders that died without reverting are dropped.
+    """
+    server = f"{db.host}:{db.port}"
+    holder = f"{os.getpid()}:{threading.get_ident()}"
+    with file_lock(FAST_RESTORE_LOCK):
+        state = read_json(FAST_RESTORE_STATE, {}) or {}
+        entry = state.setdefault(server, {"holders": [], "original": {}})
+        entry["holders"] = [h for h in entry["holders"] if _alive(h)]
+        new = [n for n in settings if n not in entry["original"]]
+        if new:
+            original = _original_settings(db, new, env)
+            entry["original"].update(original)
+            write_json(FAST_RESTORE_STATE, state)  # before changing anything on the server
+            try:
+                _alter_system(db, {n: settings[n] for n in new}, trace, env)
+            except Exception:
+                try:
+                    _alter_system(
+                        db,
+                        {n: o["value"] if o["altered"] else None for n, o in original.items()},
+                        trace,
+                        env,
+                    )
+                except Exception:
+                    pass  # e.g. no ALTER SYSTEM privilege: nothing was changed either
+                for n in original:
+                    entry["original"].pop(n)
+                if not entry["holders"] and not entry["original"]:
+                    state.pop(server)
+                write_json(FAST_RESTORE_STATE, state)
+                raise
+        entry["holders"].append(holder)
+        write_json(FAST_RESTORE_STATE, state)
+        changed = {
+            n: {"from": entry["original"][n]["value"], "to": settings[n]}
+            for n in settings
+            if n in entry["original"]
+        }
+    try:
+        yield changed
+    finally:
+        with file_lock(FAST_RESTORE_LOCK):
+            state = read_json(FAST_RESTORE_STATE, {}) or {}
+            entry = state.get(server, {"holders": [], "original": {}})
+            entry["holders"] = [h for h in entry["holders"] if h != holder and _alive(h)]
+            if not entry["holders"]:
+                _alter_system(
+                    db,
+                    {n: o["value"] if o["altered"] else None for n, o in entry["original"].items()},
+                    trace,
+                    env,
+                )
+                state.pop(server, None)
+            write_json(FAST_RESTORE_STATE, state)
+
+
+def tune_tables(
+    db: "DbConfig", dbname: str, trace: bool = False, env: Optional[dict] = None
+) -> Dict[str, List[str]]:
+    """Turn off autovacuum on the user tables of `dbname` and, where safe, make them unlogged.
+
+    Unlogged loads only pay off when `SET LOGGED` can skip WAL (wal_level=minimal), so
+    tables stay logged otherwise; partitions and published tables are never touched.
+    Tables whose dump already sets autovacuum options keep them. Returns the changed tables.
+    """
+    rows = query(
+        db,
+        "SELECT c.oid::regclass, c.relpersistence = 'p' AND NOT c.relispartition "
+        "AND current_setting('wal_level') = 'minimal' "
+        "AND NOT EXISTS (SELECT 1 FROM pg_publication_rel p WHERE p.prrelid = c.oid), "
+        "NOT coalesce(array_to_string(c.reloptions, ',') LIKE '%autovacuum%', false) "
+        "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relkind = 'r' AND n.nspname NOT IN ('pg_catalog', 'information_schema') "
+        "AND n.nspname NOT LIKE 'pg\\_%';",
+        dbname,
+        env=env,
+    )
+    tuned = {
+        "unlogged": [t for t, unlog, _ in rows if unlog == "t"],
+        "autovacuum_off": [t for t, _, av in rows if av == "t"],
+    }
+    stmts = [f"ALTER TABLE {t} SET UNLOGGED;" for t in tuned["unlogged"]]
+    stmts += [
+        f"ALTER TABLE {t} SET (autovacuum_enabled = false, toast.autovacuum_enabled = false);"
+        for t in tuned["autovacuum_off"]
+    ]
+    if stmts:
+        execute(db, "\n".join(stmts), dbname, trace=trace, env=env)
+    return tuned
+
+
+def untune_tables(
+    db: "DbConfig",
+    dbname: str,
+    tuned: Dict[str, List[str]],
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> None:
+    """Undo `tune_tables`."""
+    stmts = [f"ALTER TABLE {t} SET LOGGED;" for t in tuned["unlogged"]]
+    stmts += [
+        f"ALTER TABLE {t} RESET (autovacuum_enabled, toast.autovacuum_enabled);"
+        for t in tuned["autovacuum_off"]
+    ]
+    if stmts:
+        execute(db, "\n".join(stmts), dbname, trace=trace, env=env)
+
+
+def analyze_database(
+    db: "DbConfig",
+    dbname: str,
+    jobs: int = 1,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> None:
+    """Refresh planner statistics with `vacuumdb --analyze-only`, `jobs` tables at a time.
+
+    Without vacuumdb (a client install with psql only), a plain ANALYZE runs through psql.
+    """
+    tool = which("vacuumdb")
+    if tool is None:
+        execute(db, "ANALYZE;", dbname, trace=trace, env=env)
+        return
+    check(
+        [
+            tool,
+            "-U",
+            db.user,
+            "-h",
+            db.host,
+            "-p",
+            str(db.port),
+            "--analyze-only",
+            "-j",
+            str(max(1, jobs)),
+            "-d",
+            dbname,
+        ],
+        env=env,
+        trace=trace,
+        quiet=True,
+    )
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, List, Optional, Tuple
+
+from .shell import pipeline_status
+from .ux import human_bytes
+
+CHUNK = 1 << 20
+
+# A sink receives event dicts: {"event": "phase"|"progress", ...}
+Sink = Callable[[dict], None]
+
+_TABLE_STARTED = re.compile(r"^pg_restore: processing data for table ")
+_TABLE_FINISHED = re.compile(r"^pg_restore: finished item \d+ TABLE DATA ")
+_PG_RESTORE_NOISE = re.compile(r"^pg_restore: (?!error|warning)")
+
+
+def text_sink(stream=None, service: Optional[str] = None) -> Sink:
+    """Render progress events as a single status line on a terminal (stderr by default)."""
+    stream = stream or sys.stderr
+    tty = stream.isatty()
+    prefix = f"[{service}] " if service else ""
+
+    def write(ev: dict) -> None:
+        if ev.get("event") != "progress":
+            return
+        line = f"{prefix}restore  {human_bytes(ev['bytes'])}"
+        if ev.get("total_bytes"):
+            pct = 100 * ev["bytes"] / ev["total_bytes"]
+            line += f" / {human_bytes(ev['total_bytes'])} ({pct:.0f}%)"
+        line += f"  {ev['mb_per_s']:.1f} MB/s"
+        if ev.get("tables_total"):
+            line += f"  tables {ev['tables_done']}/{ev['tables_total']}"
+        if tty:
+            stream.write("\r\033[K" + line + ("\n" if ev.get("final") else ""))
+        else:
+            stream.write(line + "\n")
+        stream.flush()
+
+    return write
+
+
+def ndjson_sink(stream=None) -> Sink:
+    """Write every event as one JSON line (stdout by default); safe across threads."""
+    stream = stream or sys.stdout
+    lock = threading.Lock()
+
+    def write(ev: dict) -> None:
+        with lock:
+            stream.write(json.dumps(ev, ensure_ascii=False) + "\n")
+            stream.flush()
+
+    return write
+
+
+def fanout(*sinks: Optional[Sink]) -> Optional[Sink]:
+    active = [s for s in sinks if s]
+    if len(active) <= 1:
+        return active[0] if active else None
+
+    def write(ev: dict) -> None:
+        for sink in active:
+            sink(ev)
+
+    return write
+
+
+class RestoreProgress:
+    """Bytes/tables counters for one restore, reported to a sink at most every `interval` s."""
+
+    def __init__(
+        self,
+        sink: Optional[Sink],
+        total_bytes: Optional[int] = None,
+        tables_total: Optional[int] = None,
+        interval: float = 1.0,
+        fields: Optional[dict] = None,
+        phase: str = "restore",
+    ):
+        self.sink = sink
+        self.phase = phase
+        self.total_bytes = total_bytes
+        self.tables_total = tables_total
+        self.interval = interval
+        self.fields = fields or {}
+        self.bytes = 0
+        self.tables_started = 0
+        self.tables_finished = 0
+        self.t0 = time.perf_counter()
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def tables_done(self) -> int:
+        # parallel pg_restore reports finished items; serial only reports the table it starts
+        return self.tables_finished or max(0, self.tables_started - 1)
+
+    def add_bytes(self, n: int) -> None:
+        with self._lock:
+            self.bytes += n
+        self.tick()
+
+    def set_bytes(self, n: int) -> None:
+        with self._lock:
+            self.bytes = max(self.bytes, n)
+        self.tick()
+
+    def table_started(self) -> None:
+        with self._lock:
+            self.tables_started += 1
+        self.tick()
+
+    def table_finished(self) -> None:
+        with self._lock:
+            self.tables_finished += 1
+        self.tick()
+
+    def snapshot(self) -> dict:
+        elapsed = max(time.perf_counter() - self.t0, 1e-6)
+        return {
+            "bytes": self.bytes,
+            "total_bytes": self.total_bytes,
+            "mb_per_s": round(self.bytes / elapsed / 1e6, 2),
+            "tables_done": self.tables_done,
+            "tables_total": self.tables_total,
+            "elapsed_ms": int(elapsed * 1000),
+        }
+
+    def tick(self, force: bool = False, final: bool = False) -> None:
+        if not self.sink:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if not force and now - self._last < self.interval:
+                return
+            self._last = now
+        ev = {"event": "progress", **self.fields, "phase": self.phase, **self.snapshot()}
+        if final:
+            ev["final"] = True
+        self.sink(ev)
+
+    def finish(self) -> None:
+        with self._lock:
+            self.tables_finished = max(self.tables_finished, self.tables_started)
+        self.tick(force=True, final=True)
+
+
+def _proc_read_bytes(pid: int) -> Optional[int]:
+    """Bytes read by `pid` and its children (Linux /proc), for restores we cannot feed."""
+    total, stack, seen = 0, [pid], set()
+    while stack:
+        p = stack.pop()
+        if p in seen:
+            continue
+        seen.add(p)
+        try:
+            for line in Path(f"/proc/{p}/io").read_text().splitlines():
+                if line.startswith("rchar:"):
+                    total += int(line.split()[1])
+            for task in Path(f"/proc/{p}/task").iterdir():
+                stack.extend(int(c) for c in (task / "children").read_text().split())
+        except (OSError, ValueError):
+            if p == pid:
+                return None
+    return total
+
+
+def run_monitored(
+    cmds: List[List[str]],
+    progress: RestoreProgress,
+    source: Optional[Path] = None,
+    env: Optional[dict] = None,
+    trace: bool = False,
+    quiet: bool = False,
+) -> Tuple[int, List[str]]:
+    """Run `[< source] a | b ...` while feeding `progress`.
+
+    With `source`, the file is pumped into the first command's stdin and every byte is
+    counted; otherwise bytes come from /proc where available. The last command's stderr
+    is scanned for `pg_restore -v` table markers; verbose chatter is dropped and anything
+    else is passed through. Returns (exit code, last stderr lines).
+    """
+    if trace:
+        head = (
+            f"{shlex.join(cmds[0])} < {shlex.quote(str(source))}" if source else shlex.join(cmds[0])
+        )
+        print("$ " + " | ".join([head] + [shlex.join(c) for c in cmds[1:]]))
+    env = env or os.environ.copy()
+    procs: List[subprocess.Popen] = []
+    prev = subprocess.PIPE if source else None
+    for i, cmd in enumerate(cmds):
+        last = i == len(cmds) - 1
+        stdout = (subprocess.DEVNULL if quiet else None) if last else subprocess.PIPE
+        p = subprocess.Popen(
+            cmd, env=env, stdin=prev, stdout=stdout, stderr=subprocess.PIPE if last else None
+        )
+        if prev not in (None, subprocess.PIPE):
+            prev.close()
+        prev = p.stdout
+        procs.append(p)
+
+    tail: Deque[str] = deque(maxlen=20)
+
+    def pump() -> None:
+        sink = procs[0].stdin
+        try:
+            with open(source, "rb") as f:
+                while chunk := f.read(CHUNK):
+                    sink.write(chunk)
+                    progress.add_bytes(len(chunk))
+        except BrokenPipeError:
+            pass  # the reader exited; its exit code tells the story
+        finally:
+            try:
+                sink.close()
+            except BrokenPipeError:
+                pass
+
+    def scan_stderr() -> None:
+        for raw in procs[-1].stderr:
+            line = raw.decode(errors="replace").rstrip("\n")
+            if _TABLE_FINISHED.match(line):
+                progress.table_finished()
+            elif _TABLE_STARTED.match(line):
+                progress.table_started()
+            elif not _PG_RESTORE_NOISE.match(line):
+                tail.append(line)
+                sys.stderr.write(line + "\n")
+
+    threads = [threading.Thread(target=scan_stderr, daemon=True)]
+    if source:
+        threads.append(threading.Thread(target=pump, daemon=True))
+    for t in threads:
+        t.start()
+    while True:
+        try:
+            procs[-1].wait(timeout=0.2)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        if not source:
+            read = _proc_read_bytes(procs[0].pid)
+            if read is not None:
+                progress.set_bytes(read)
+        progress.tick()
+    for t in threads:
+        t.join()
+    rc = pipeline_status([p.wait() for p in procs])
+    progress.finish()
+    return rc, list(tail)
@@ -1,30 +1,182 @@
 from __future__ import annotations
-from pathlib import Path
+
+import hashlib
 import os
+import re
 import subprocess
-from typing import List
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+from urllib.parse import unquote, urlparse
+
 import yaml
 
+from .erb import ErbError, render
+from .store import CACHE_DIR, read_json, write_json
+
+DB_NAME_CACHE = CACHE_DIR / "db_names.json"
+
+# Files whose changes can alter what `rails runner` resolves as the database name
+DB_NAME_INPUTS = ["config/database.yml", "config/credentials*", "config/master.key", ".env*"]
+
 
 def rails_bin(app_path: Path) -> List[str]:
     bin_rails = app_path / "bin" / "rails"
     return [str(bin_rails)] if bin_rails.exists() else ["rails"]
 
 
-def infer_db_name(app_path: Path, env: str) -> str:
-    # Try 1: parse config/database.yml (may contain ERB; fallback to runner)
+# Variables that pick the database whatever database.yml says, and the ENV lookups the
+# fingerprint can follow: ENV["X"], ENV['X'], ENV.fetch("X" ...)
+DB_NAME_ENV = ("DATABASE_URL", "RAILS_ENV", "RACK_ENV", "RAILS_MASTER_KEY")
+_ENV_KEY = re.compile(r"""ENV(?:\[|\.fetch\(|\.fetch\s+)\s*(['"])([^'"]+)\1""")
+_ENV_ANY = re.compile(r"(?<![A-Za-z0-9_:])ENV(?![A-Za-z0-9_])")
+
+
+def db_name_fingerprint(
+    app_path: Path, environ: Optional[Mapping[str, str]] = None
+) -> Optional[str]:
+    """Hash of everything that feeds the runner's answer; None when that cannot be known.
+
+    Covers (path, mtime, size) of DB_NAME_INPUTS and the values in `environ` (default:
+    os.environ) of DB_NAME_ENV and of every ENV key database.yml reads. A database.yml
+    that reaches ENV any other way (ENV[name], ENV.to_h, ...) gets None: not cacheable.
+    """
+    environ = os.environ if environ is None else environ
+    keys = set(DB_NAME_ENV)
     db_yml = app_path / "config" / "database.yml"
     if db_yml.exists():
         try:
-            data = yaml.safe_load(db_yml.read_text())
-            if env in data and isinstance(data[env], dict) and "database" in data[env]:
-                return str(data[env]["database"])
-        except Exception:
-            pass
-    # Try 2: rails runner (supports ERB, credentials)
+            text = db_yml.read_text()
+        except (OSError, UnicodeDecodeError):
+            return None
+        keys.update(m.group(2) for m in _ENV_KEY.finditer(text))
+        if len(_ENV_ANY.findall(text)) != len(_ENV_KEY.findall(text)):
+            return None
+    h = hashlib.sha256()
+    for pattern in DB_NAME_INPUTS:
+        for p in sorted(app_path.glob(pattern)):
+            files = sorted(x for x in p.rglob("*") if x.is_file()) if p.is_dir() else [p]
+            for f in files:
+                st = f.stat()
+                h.update(f"{f.relative_to(app_path)}:{st.st_mtime_ns}:{st.st_size}\n".encode())
+    for k in sorted(keys):
+        h.update(f"{k}={environ.get(k)!r}\n".encode())
+    return h.hexdigest()
+
+
+# dotenv-rails load order, first file wins; variables already in the environment win over all
+# (`.env.local` is skipped in the test environment, as dotenv-rails does)
+_DOTENV_FILES = (".env.{env}.local", ".env.local", ".env.{env}", ".env")
+_DOTENV_LINE = re.compile(r"^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.]*)\s*[=:]\s*(.*?)\s*$")
+_DOTENV_QUOTED = re.compile(r"""^(['"])(.*)\1(?:\s+#.*)?$""")
+_DOTENV_VAR = re.compile(r"(\\?)\$(?:\{([A-Za-z0-9_]*)\}|([A-Za-z0-9_]+))")
+
+
+def _dotenv_value(raw: str, env: Mapping[str, str]) -> str:
+    m = _DOTENV_QUOTED.match(raw)
+    if m and m.group(1) == "'":
+        return m.group(2)  # single quotes: taken literally
+    quoted = m is not None
+    raw = m.group(2) if m else re.sub(r"\s+#.*$", "", raw)
+    if "$(" in raw:
+        raise ErbError("command substitution in .env files is not supported")
+    value = _DOTENV_VAR.sub(
+        lambda m: m.group(0)[1:] if m.group(1) else env.get(m.group(2) or m.group(3) or "", ""),
+        raw,
+    )
+    if quoted:
+        value = value.replace("\\n", "\n").replace('\\"', '"')
+    return value
+
+
+def app_environ(
+    app_path: Path, env: str, environ: Optional[Mapping[str, str]] = None
+) -> Dict[str, str]:
+    """`environ` plus what dotenv-rails would load from the app's .env files for `env`.
+
+    Raises ErbError for values it cannot evaluate (command substitution).
+    """
+    result = dict(os.environ if environ is None else environ)
+    for pattern in _DOTENV_FILES:
+        if env == "test" and pattern == ".env.local":
+            continue
+        path = app_path / pattern.format(env=env)
+        if not path.is_file():
+            continue
+        for line in path.read_text().splitlines():
+            m = _DOTENV_LINE.match(line)
+            if m and m.group(1) not in result:
+                result[m.group(1)] = _dotenv_value(m.group(2), result)
+    return result
+
+
+def _db_from_url(url: str) -> Optional[str]:
+    path = urlparse(url).path.lstrip("/")
+    return unquote(path) or None
+
+
+def _primary_config(section: object) -> Optional[dict]:
+    # Multi-database envs nest named configs ("primary", "animals", ...); Rails uses the first
+    if not isinstance(section, dict):
+        return None
+    if any(k in section for k in ("database", "url", "adapter")):
+        return section
+    if isinstance(section.get("primary"), dict):
+        return section["primary"]
+    nested = [v for v in section.values() if isinstance(v, dict)]
+    return nested[0] if nested else None
+
+
+def resolve_db_name(
+    app_path: Path,
+    env: str,
+    environ: Optional[Mapping[str, str]] = None,
+) -> Optional[str]:
+    """Resolve the database name from database.yml + DATABASE_URL without booting Rails.
+
+    ENV is `environ` (default: os.environ) plus the app's .env files, as dotenv-rails loads
+    them. Returns None when the config needs more than the supported ERB subset.
+    """
+    try:
+        environ = app_environ(app_path, env, environ)
+    except (ErbError, OSError, UnicodeDecodeError):
+        return None
+    db_yml = app_path / "config" / "database.yml"
+    cfg: dict = {}
+    if db_yml.exists():
+        try:
+            data = yaml.safe_load(render(db_yml.read_text(), environ)) or {}
+        except (ErbError, yaml.YAMLError):
+            return None
+        cfg = dict(_primary_config(data.get(env)) or {}) if isinstance(data, dict) else {}
+    # url components win over the other keys, and DATABASE_URL over both (as in Rails)
+    for url in (cfg.get("url"), environ.get("DATABASE_URL")):
+        if url:
+            cfg["database"] = _db_from_url(str(url)) or cfg.get("database")
+    name = cfg.get("database")
+    return str(name) if name else None
+
+
+def infer_db_name(app_path: Path, env: str, refresh: bool = False) -> str:
+    # Try 1: evaluate config/database.yml (simple ERB, anchors, url / DATABASE_URL)
+    name = resolve_db_name(app_path, env)
+    if name:
+        return name
+    # Try 2: a previous runner answer, while its input files are unchanged
+    key = f"{app_path.resolve()}::{env}"
+    envp = os.environ.copy()
+    envp["RAILS_ENV"] = env
+    fingerprint = db_name_fingerprint(app_path, envp)
+    cache = read_json(DB_NAME_CACHE, {}) or {}
+    hit = cache.get(key)
+    if not refresh and hit and fingerprint and hit.get("fingerprint") == fingerprint:
+        return hit["name"]
+    # Try 3: rails runner (supports ERB, credentials)
     cmd = rails_bin(app_path) + ["runner", "puts ActiveRecord::Base.connection_db_config.database"]
-    envp = os.environ.copy(); envp["RAILS_ENV"] = env
     res = subprocess.run(cmd, cwd=app_path, env=envp, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     if res.returncode == 0 and res.stdout.strip():
-        return res.stdout.strip()
+        name = res.stdout.strip()
+        if fingerprint:
+            cache[key] = {"name": name, "fingerprint": fingerprint}
+            write_json(DB_NAME_CACHE, cache)
+        return name
     raise RuntimeError("Could not infer database name")
@@ -0,0 +1,92 @@
+"""The command reference behind `meta reference` / `meta describe`, built once and cached.
+
+Building it walks the whole Typer/Click tree, yet it only changes with devkit itself: the
+first call stores it in ~/.devkit/cache/reference.json, keyed by the devkit version and
+the CLI sources, together with an index from command name to its node. The fast path
+serves both commands from that file without importing the CLI.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Optional
+
+from . import __version__
+from .iofmt import Exit, envelope
+from .store import CACHE_DIR, atomic_write, read_json
+
+REFERENCE_PATH = CACHE_DIR / "reference.json"
+REFERENCE_FORMAT = 1
+
+# The reference is derived from these; a checkout rebuilds it on edits without a version bump
+_SOURCES = ("cli.py", "introspect.py")
+_PACKAGE = Path(__file__).resolve().parent
+
+
+def _key() -> Optional[list]:
+    try:
+        stats = [(_PACKAGE / name).stat() for name in _SOURCES]
+    except OSError:
+        return None
+    return [REFERENCE_FORMAT, __version__] + [[st.st_mtime_ns, st.st_size] for st in stats]
+
+
+def cached() -> Optional[dict]:
+    """The stored {"key", "reference", "index"} if it was built by this devkit, else None."""
+    key = _key()
+    data = read_json(REFERENCE_PATH)
+    if key is None or not isinstance(data, dict) or data.get("key") != key:
+        return None
+    return data
+
+
+def build(app) -> dict:
+    """Walk the Typer `app` and store the result for later calls."""
+    from .introspect import typer_reference
+
+    ref = typer_reference(app)
+    data = {
+        "key": _key(),
+        "reference": ref,
+        "index": {c["name"]: i for i, c in enumerate(ref["commands"])},
+    }
+    try:
+        # key order is kept, so served and freshly built payloads are identical
+        atomic_write(REFERENCE_PATH, json.dumps(data, ensure_ascii=False), durable=False)
+    except (OSError, TypeError, ValueError):
+        pass  # the cache is only an optimization
+    return data
+
+
+def load(app=None) -> dict:
+    """The cached reference, building it (from `app`, or the CLI's) when missing or stale."""
+    data = cached()
+    if data is None:
+        if app is None:
+            from .cli import app
+        data = build(app)
+    return data
+
+
+def lookup(data: dict, command: str) -> Optional[dict]:
+    """The node of `command` ("db reset", "meta", ...), or None if there is no such command."""
+    i = data["index"].get(" ".join(command.split()))
+    return None if i is None else data["reference"]["commands"][i]
+
+
+def reference_payload(data: dict) -> dict:
+    return envelope("reference", "ok", Exit.OK, {"reference": data["reference"]})
+
+
+def describe_payload(data: dict, command: Optional[str]) -> dict:
+    """`meta describe` output: the whole reference, or only the node of `command`."""
+    if command is None:
+        return envelope(
+            "describe", "ok", Exit.OK, {"command": None, "reference": data["reference"]}
+        )
+    node = lookup(data, command)
+    if node is None:
+        errors = [{"code": "NOT_FOUND", "detail": f"command '{command}'"}]
+        return envelope("describe", "error", Exit.NOT_FOUND, errors=errors)
+    return envelope("describe", "ok", Exit.OK, {"command": node["name"], "node": node})
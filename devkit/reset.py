@@ -0,0 +1,680 @@
+from __future__ import annotations
+
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from . import catalog, dbcache
+from .config_model import CacheConfig, Service
+from .iofmt import Exit
+from .partial import PartialRestore, filter_toc
+from .postgres import (
+    FAST_RESTORE_NO_FSYNC,
+    FAST_RESTORE_SERVER,
+    POST_DATA_TOC_TYPES,
+    RESTORE_SESSION_DEFAULTS,
+    analyze_database,
+    choose_restore_tool,
+    create_database,
+    decompress_command,
+    detect_backup_format,
+    drop_database,
+    list_toc,
+    psql_args,
+    resolve_jobs,
+    server_settings,
+    session_options,
+    terminate_sessions,
+    tune_tables,
+    untune_tables,
+)
+from .progress import RestoreProgress, Sink, run_monitored
+from .rails import infer_db_name, rails_bin
+from .shell import check, run_pipeline
+from .validate import observed_rows, validate_restore
+
+
+class ResetError(Exception):
+    """A failed reset step, carrying the envelope error code and exit code."""
+
+    def __init__(self, code: str, detail: str, exit_code: int = Exit.EXTERNAL):
+        super().__init__(detail)
+        self.code = code
+        self.detail = detail
+        self.exit_code = exit_code
+
+    def as_error(self) -> dict:
+        return {"code": self.code, "detail": self.detail}
+
+
+@dataclass
+class ResetOptions:
+    backup: Optional[Path] = None
+    env: Optional[str] = None
+    db_name: Optional[str] = None
+    jobs: Optional[str] = None
+    index_jobs: Optional[str] = "auto"
+    cache: bool = True
+    fast_restore: bool = False
+    fsync: bool = True  # False: --no-fsync, with fast_restore only
+    via_rails: bool = False
+    refresh_db_name: bool = False
+    partial: Optional[PartialRestore] = None
+    trace: bool = False
+    quiet: bool = False
+
+
+@dataclass
+class ResetTarget:
+    service: Service
+    app_path: Path
+    backup_path: Path
+    env_name: str
+    db_name: str
+
+    @property
+    def server(self) -> Tuple[str, int]:
+        return (self.service.db.host, self.service.db.port)
+
+
+def prepare(s: Service, opts: ResetOptions) -> ResetTarget:
+    """Resolve backup, env and database name for one service (no side effects)."""
+    app_path = Path(s.app_path)
+    backup_path = Path(str(opts.backup or s.backup_path))
+    if not backup_path.exists():
+        raise ResetError("BACKUP_MISSING", str(backup_path), Exit.PRECONDITION)
+    if opts.partial:
+        try:
+            opts.partial.validate()
+        except ValueError as e:
+            raise ResetError("INVALID_ARGS", str(e), Exit.INVALID_ARGS) from e
+    env_name = opts.env or s.env
+    dbn = target_db_name(s, env_name, opts.db_name, refresh=opts.refresh_db_name)
+    return ResetTarget(s, app_path, backup_path, env_name, dbn)
+
+
+def target_db_name(
+    s: Service, env_name: str, db_name: Optional[str] = None, refresh: bool = False
+) -> str:
+    """--db-name, then `db.name`, then the name Rails would use for `env_name`."""
+    dbn = db_name or s.db.name or None
+    if dbn:
+        return dbn
+    try:
+        return infer_db_name(Path(s.app_path), env_name, refresh=refresh)
+    except Exception as e:
+        raise ResetError("DB_NAME_INFER", str(e), Exit.PRECONDITION) from e
+
+
+def _ms(t0: float) -> int:
+    return int((time.perf_counter() - t0) * 1000)
+
+
+@contextmanager
+def _phase(
+    steps: List[dict], name: str, events: Optional[Sink], fields: dict, **extra
+) -> Iterator[dict]:
+    """Time one step, append it to `steps` and report start/end to `events`."""
+    step = {"name": name, "status": "ok", **extra}
+
+    def report(status: str, **more) -> None:
+        if events:
+            events({"event": "phase", **fields, "phase": name, "status": status, **more})
+
+    report("start")
+    t0 = time.perf_counter()
+    try:
+        yield step
+    except Exception:
+        report("error", duration_ms=_ms(t0))
+        raise
+    step["duration_ms"] = _ms(t0)
+    steps.append(step)
+    report("ok", duration_ms=step["duration_ms"])
+
+
+def _backup_bytes(path: Path) -> int:
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size
+
+
+def _count_table_data(backup_path: Path, fmt, env: dict, known=None) -> Optional[int]:
+    if not fmt.is_archive:
+        return None
+    if known is not None and known.tables is not None:
+        return known.tables_with_data
+    try:
+        return sum(" TABLE DATA " in ln for ln in list_toc(backup_path, env=env, fmt=fmt))
+    except Exception:
+        return None  # progress just goes without a table count
+
+
+def _expected_tables(backup_path: Path, fmt, env: dict, known=None) -> Optional[List[dict]]:
+    if not fmt.is_archive:
+        return None
+    if known is not None and known.tables is not None:
+        return known.tables
+    try:
+        return catalog.archive_tables(backup_path, fmt, env)
+    except Exception:
+        return None  # validation falls back to a connectivity check
+
+
+def _partial_toc(backup_path: Path, fmt, spec: PartialRestore, env: dict) -> Tuple[str, dict]:
+    """Write the filtered `pg_restore -L` list to a temp file; returns (path, stats)."""
+    try:
+        kept, stats = filter_toc(list_toc(backup_path, env=env, fmt=fmt), spec)
+    except RuntimeError as e:
+        raise ResetError("RESTORE_FAILED", str(e)) from e
+    fd, path = tempfile.mkstemp(prefix="devkit-", suffix=".list")
+    with os.fdopen(fd, "w") as f:
+        f.write("\n".join(kept) + "\n")
+    return path, stats
+
+
+def _restore_sampled(
+    tool: str,
+    conn: List[str],
+    source: List[str],
+    decompress: Optional[List[str]],
+    toc_list: str,
+    psql: List[str],
+    pct: float,
+    env: dict,
+    trace: bool,
+    quiet: bool,
+) -> int:
+    """Three passes over the archive: pre-data, sampled COPY data through psql, post-data."""
+    head = [decompress] if decompress else []
+    env = dict(env)
+    # the sampling stage is `python -m devkit.partial`; make sure it imports this checkout
+    pkg_root = str(Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (pkg_root, env.get("PYTHONPATH")) if p)
+    passes = [
+        head + [[tool, *conn, "-1", "-L", toc_list, "--section=pre-data", *source]],
+        head
+        + [
+            [tool, "-L", toc_list, "--section=data", "-f", "-", *source],
+            [sys.executable, "-m", "devkit.partial", f"{pct:g}"],
+            psql + ["-1"],
+        ],
+        head + [[tool, *conn, "-1", "-L", toc_list, "--section=post-data", *source]],
+    ]
+    for cmds in passes:
+        rc = run_pipeline(cmds, env=env, trace=trace, quiet=quiet)
+        if rc != 0:
+            return rc
+    return 0
+
+
+def _restore_sections(
+    tool: str,
+    conn: List[str],
+    listing: List[str],
+    backup_path: Path,
+    njobs: int,
+    index_jobs: int,
+    progress: Optional[dict],
+    data_step: dict,
+    steps: List[dict],
+    events: Optional[Sink],
+    fields: dict,
+    env: dict,
+    trace: bool,
+    quiet: bool,
+    before_data: Optional[Callable[[], None]] = None,
+    after_data: Optional[Callable[[], None]] = None,
+) -> None:
+    """Restore a seekable archive in three timed passes: schema, table data with `njobs`
+    workers, then indexes and constraints with `index_jobs` workers.
+
+    With `progress` (RestoreProgress arguments), the data pass reports progress events.
+    `before_data`/`after_data` run inside the data step, around the load; once
+    `before_data` has run, `after_data` runs too, even if the load fails.
+    """
+    source = str(backup_path)
+
+    def workers(n: int) -> List[str]:
+        # parallel passes cannot run inside a single transaction
+        return ["-1"] if n <= 1 else ["-j", str(n)]
+
+    def run(section: str, args: List[str]) -> None:
+        rc = run_pipeline([args], env=env, trace=trace, quiet=quiet)
+        if rc != 0:
+            raise ResetError("RESTORE_FAILED", f"{section}: pg_restore exited with {rc}")
+
+    with _phase(steps, "pre-data", events, fields, jobs=1):
+        run("pre-data", [tool, *conn, *listing, "--section=pre-data", "-1", source])
+
+    with _phase(steps, "data", events, fields, **data_step) as step:
+        if before_data:
+            before_data()
+        loaded = False
+        try:
+            args = [tool, *conn, *listing, "--section=data", *workers(njobs)]
+            if progress is None:
+                run("data", args + [source])
+            else:
+                # serial restores read the file through DevKit, so every byte is counted
+                feed = njobs <= 1 and backup_path.is_file()
+                args += ["-v"] + ([] if feed else [source])
+                tracker = RestoreProgress(events, fields=fields, phase="data", **progress)
+                rc, tail = run_monitored(
+                    [args],
+                    tracker,
+                    source=backup_path if feed else None,
+                    env=env,
+                    trace=trace,
+                    quiet=quiet,
+                )
+                snap = tracker.snapshot()
+                step.update(
+                    {k: snap[k] for k in ("bytes", "mb_per_s", "tables_done", "tables_total")}
+                )
+                if rc != 0:
+                    raise ResetError(
+                        "RESTORE_FAILED", f"data: {tail[-1] if tail else 'pg_restore'}"
+                    )
+            loaded = True
+        finally:
+            # whatever before_data changed is undone even when the load fails; that
+            # failure, not a follow-on one from undoing it, is what gets reported
+            if after_data:
+                try:
+                    after_data()
+                except Exception:
+                    if loaded:
+                        raise
+
+    with _phase(steps, "post-data", events, fields, jobs=index_jobs):
+        run(
+            "post-data",
+            [tool, *conn, *listing, "--section=post-data", *workers(index_jobs), source],
+        )
+
+
+def _tune(fast: dict, s: Service, dbn: str, trace: bool, env: dict) -> None:
+    # best effort: a table that cannot be tuned just loads the normal way
+    try:
+        fast["tables"] = tune_tables(s.db, dbn, trace=trace, env=env)
+    except Exception as e:
+        fast["tables"] = {"unlogged": [], "autovacuum_off": [], "error": str(e)}
+
+
+def _untune(fast: dict, s: Service, dbn: str, trace: bool, env: dict) -> None:
+    # before post-data: foreign keys cannot point from logged to unlogged tables
+    try:
+        untune_tables(s.db, dbn, fast["tables"], trace=trace, env=env)
+    except Exception as e:
+        raise ResetError("RESTORE_FAILED", f"fast-restore: {e}") from e
+
+
+def execute(
+    target: ResetTarget,
+    opts: ResetOptions,
+    cache_cfg: CacheConfig,
+    envp: dict,
+    events: Optional[Sink] = None,
+) -> dict:
+    """Drop/create (or clone), restore, validate and cache one service's database.
+
+    Every step is timed into `steps`; with `events`, phase start/end and restore progress
+    ({"event": "phase"|"progress", ...}) are reported as they happen.
+    """
+    s, dbn, backup_path = target.service, target.db_name, target.backup_path
+    envp = dict(envp)
+    envp["RAILS_ENV"] = target.env_name
+    trace, quiet = opts.trace, opts.quiet
+    fields = {"service": s.name}
+
+    known = catalog.lookup(backup_path)  # scanned backups skip format sniffing and TOC reads
+    fmt = known.format if known else detect_backup_format(backup_path)
+    try:
+        njobs = resolve_jobs(backup_path, opts.jobs, env=envp, fmt=fmt)
+    except ValueError as e:
+        raise ResetError("INVALID_JOBS", str(e), Exit.INVALID_ARGS) from e
+    partial = opts.partial if opts.partial and opts.partial.active else None
+    sampled = partial is not None and partial.sample is not None
+    # seekable archives restore section by section, so indexes get their own workers
+    sectioned = fmt.parallel_ok and not sampled
+    try:
+        index_jobs = (
+            resolve_jobs(
+                backup_path,
+                opts.index_jobs,
+                env=envp,
+                fmt=fmt,
+                types=POST_DATA_TOC_TYPES,
+                option="--index-jobs",
+            )
+            if sectioned
+            else 1
+        )
+    except ValueError as e:
+        raise ResetError("INVALID_JOBS", str(e), Exit.INVALID_ARGS) from e
+    if partial and not fmt.is_archive:
+        raise ResetError(
+            "PARTIAL_UNSUPPORTED",
+            "selective restores need a custom, directory or tar archive (got plain SQL)",
+            Exit.INVALID_ARGS,
+        )
+    if sampled:
+        njobs = 1  # the data pass is a single SQL stream into psql
+    # with progress on, a serial restore reads the backup from stdin so every byte is counted
+    # (three-pass restores do this for their data pass only)
+    feed = events is not None and njobs == 1 and backup_path.is_file()
+    feed = feed and not (sampled or sectioned)
+    try:
+        decompress = None
+        if fmt.compression:
+            decompress = decompress_command(fmt, None if feed else backup_path)
+    except FileNotFoundError as e:
+        raise ResetError("DEP_MISSING", str(e), Exit.DEP_MISSING) from e
+
+    # templates hold full restores only, so selective restores neither use nor feed the cache
+    use_cache = opts.cache and cache_cfg.enabled and cache_cfg.max_templates > 0 and not partial
+    checksum = None
+    hit = None
+    if use_cache:
+        checksum = dbcache.backup_checksum(backup_path)
+        try:
+            hit = dbcache.lookup(s, checksum, env=envp)
+        except Exception:
+            hit = None  # cache lookup problems fall back to a full reset
+
+    steps: List[dict] = []
+    fast: Optional[dict] = None  # what --fast-restore changed
+    if hit:
+        # clone the cached template instead of drop/create/restore
+        with _phase(steps, "clone", events, fields, template=hit.template):
+            try:
+                dbcache.clone(hit, s.db, dbn, trace=trace, env=envp)
+            except Exception as e:
+                raise ResetError("CLONE_FAILED", str(e)) from e
+    else:
+        with ExitStack() as tuning:
+            if opts.fast_restore:
+                # server settings stay in place until the restore is done (or has failed)
+                wanted = {**FAST_RESTORE_SERVER, **({} if opts.fsync else FAST_RESTORE_NO_FSYNC)}
+                with _phase(steps, "tune", events, fields) as step:
+                    try:
+                        changed = tuning.enter_context(
+                            server_settings(s.db, wanted, trace=trace, env=envp)
+                        )
+                    except Exception as e:
+                        raise ResetError("FAST_RESTORE", str(e), Exit.PRECONDITION) from e
+                    fast = {"server": changed, "tables": None}
+                    step["settings"] = changed
+            # drop & create: plain SQL by default, Rails tasks (one app boot each) on request
+            method = "rails" if opts.via_rails else "sql"
+            rails_kw = {"cwd": target.app_path, "env": envp, "trace": trace, "quiet": quiet}
+            code = "RAILS_CMD" if opts.via_rails else "DB_CMD"
+            with _phase(steps, "drop", events, fields, method=method):
+                try:
+                    if opts.via_rails:
+                        check(rails_bin(target.app_path) + ["db:drop"], **rails_kw)
+                    else:
+                        terminate_sessions(s.db, dbn, trace=trace, env=envp)
+                        drop_database(s.db, dbn, trace=trace, env=envp)
+                except Exception as e:
+                    raise ResetError(code, str(e)) from e
+            with _phase(steps, "create", events, fields, method=method):
+                try:
+                    if opts.via_rails:
+                        check(rails_bin(target.app_path) + ["db:create"], **rails_kw)
+                    else:
+                        create_database(s.db, dbn, trace=trace, env=envp)
+                except Exception as e:
+                    raise ResetError(code, str(e)) from e
+
+            # restore; compressed backups stream through the decompressor into stdin
+            toc_list, partial_stats = None, {}
+            if partial:
+                toc_list, partial_stats = _partial_toc(backup_path, fmt, partial, envp)
+            tool, flags = choose_restore_tool(
+                backup_path, jobs=njobs, fmt=fmt, from_stdin=feed or None
+            )
+            conn = ["-U", s.db.user, "-h", s.db.host, "-p", str(s.db.port), "-d", dbn]
+            args = [tool] + conn + (["-L", toc_list] if toc_list else []) + flags
+            cmds = [decompress, args] if decompress else [args]
+            # session tuning applies to the restore connections only, not to validate/cache
+            settings = {**RESTORE_SESSION_DEFAULTS, **s.db.restore_settings}
+            renv = session_options(settings, envp)
+            extra = {"partial": {**partial.to_dict(), **partial_stats}} if partial else {}
+            info = dict(
+                tool=tool,
+                format=fmt.kind,
+                compression=fmt.compression,
+                jobs=njobs,
+                settings=settings,
+                **extra,
+            )
+            progress_kw = None
+            if events:
+                progress_kw = {
+                    "total_bytes": _backup_bytes(backup_path),
+                    "tables_total": (
+                        partial_stats["tables_with_data"]
+                        if partial
+                        else _count_table_data(backup_path, fmt, envp, known)
+                    ),
+                }
+            try:
+                if sectioned:
+                    hooks = {}
+                    if fast is not None:
+                        hooks = {
+                            "before_data": functools.partial(_tune, fast, s, dbn, trace, envp),
+                            "after_data": functools.partial(_untune, fast, s, dbn, trace, envp),
+                        }
+                    _restore_sections(
+                        tool,
+                        conn,
+                        ["-L", toc_list] if toc_list else [],
+                        backup_path,
+                        njobs,
+                        index_jobs,
+                        progress_kw,
+                        info,
+                        steps,
+                        events,
+                        fields,
+                        env=renv,
+                        trace=trace,
+                        quiet=quiet,
+                        **hooks,
+                    )
+                else:
+                    with _phase(steps, "restore", events, fields, **info) as step:
+                        if sampled:
+                            source = [] if fmt.compression else [str(backup_path)]
+                            rc = _restore_sampled(
+                                tool,
+                                conn,
+                                source,
+                                decompress,
+                                toc_list,
+                                psql_args(s.db, dbn),
+                                partial.sample,
+                                env=renv,
+                                trace=trace,
+                                quiet=quiet,
+                            )
+                            tail = []
+                        elif progress_kw is not None:
+                            if fmt.is_archive:
+                                args.append("-v")  # per-table markers on stderr
+                            progress = RestoreProgress(events, fields=fields, **progress_kw)
+                            rc, tail = run_monitored(
+                                cmds,
+                                progress,
+                                source=backup_path if feed else None,
+                                env=renv,
+                                trace=trace,
+                                quiet=quiet,
+                            )
+                            snap = progress.snapshot()
+                            step.update(
+                                {
+                                    k: snap[k]
+                                    for k in ("bytes", "mb_per_s", "tables_done", "tables_total")
+                                }
+                            )
+                        else:
+                            rc, tail = run_pipeline(cmds, env=renv, trace=trace, quiet=quiet), []
+                        if rc != 0:
+                            raise ResetError(
+                                "RESTORE_FAILED", tail[-1] if tail else "pg_restore/psql"
+                            )
+            finally:
+                if toc_list:
+                    os.unlink(toc_list)
+
+        if fast is not None:
+            analyze_jobs = max(njobs, os.cpu_count() or 1)
+            with _phase(steps, "analyze", events, fields, jobs=analyze_jobs):
+                try:
+                    analyze_database(s.db, dbn, analyze_jobs, trace=trace, env=envp)
+                except Exception as e:
+                    raise ResetError("ANALYZE_FAILED", str(e)) from e
+            fast["analyze_jobs"] = analyze_jobs
+
+    # every expected table exists and (for full restores) holds about as many rows as before
+    with _phase(steps, "validate", events, fields) as step:
+        expected = _expected_tables(backup_path, fmt, envp, known)
+        try:
+            checked = validate_restore(
+                s.db, dbn, expected, full=not partial, jobs=max(njobs, 4), env=envp
+            )
+        except RuntimeError as e:
+            raise ResetError("VALIDATE_FAILED", str(e)) from e
+        step.update(checked.summary())
+        if checked.problems:
+            shown = "; ".join(f"{t.label}: {t.problem}" for t in checked.problems[:5])
+            more = len(checked.problems) - 5
+            raise ResetError("VALIDATE_FAILED", shown + (f" (+{more} more)" if more > 0 else ""))
+        if not partial and known is not None and known.tables is not None:
+            catalog.record_rows(backup_path, observed_rows(checked))
+
+    # keep the fresh restore as a template for the next reset
+    if use_cache and not hit:
+        t0 = time.perf_counter()
+        try:
+            entry = dbcache.store(s, backup_path, checksum, dbn, trace=trace, env=envp)
+            evicted = dbcache.prune(cache_cfg, keep=entry.template, trace=trace, env=envp)
+            steps.append(
+                {
+                    "name": "cache",
+                    "status": "ok",
+                    "template": entry.template,
+                    "evicted": [e.template for e in evicted],
+                    "duration_ms": _ms(t0),
+                }
+            )
+        except Exception as e:
+            steps.append(
+                {"name": "cache", "status": "error", "detail": str(e), "duration_ms": _ms(t0)}
+            )
+        if events:
+            last = steps[-1]
+            events(
+                {
+                    "event": "phase",
+                    **fields,
+                    "phase": "cache",
+                    "status": last["status"],
+                    "duration_ms": last["duration_ms"],
+                }
+            )
+
+    return {
+        "service": s.name,
+        "app_path": s.app_path,
+        "backup": str(backup_path),
+        "env": target.env_name,
+        "db": {"name": dbn, "user": s.db.user, "host": s.db.host, "port": s.db.port},
+        "cloned_from": hit.template if hit else None,
+        "fast_restore": fast,
+        "steps": steps,
+        "duration_ms": sum(st.get("duration_ms", 0) for st in steps),
+    }
+
+
+def execute_many(
+    targets: List[ResetTarget],
+    opts: ResetOptions,
+    cache_cfg: CacheConfig,
+    envs: Dict[Tuple[str, int, str], dict],
+    concurrency: int = 4,
+    per_host: int = 2,
+    on_event: Optional[Callable[[str, ResetTarget, dict], None]] = None,
+    events: Optional[Sink] = None,
+) -> List[dict]:
+    """Reset several services on a bounded pool, at most `per_host` at a time per server.
+
+    `envs` maps (host, port, user) to the environment (e.g. PGPASSWORD) for that login.
+    Returns one result per target, in input order: {"service", "status", "duration_ms",
+    "data"|"errors"}.
+    """
+    # one queue per server, drained by up to `per_host` workers; a worker holds one of the
+    # `concurrency` slots only while it resets, so a busy server never starves idle ones
+    queues: Dict[Tuple[str, int], Deque[int]] = {}
+    for i, t in enumerate(targets):
+        queues.setdefault(t.server, deque()).append(i)
+    slots = threading.Semaphore(max(1, concurrency))
+    results: List[dict] = [{} for _ in targets]
+
+    def notify(kind: str, target: ResetTarget, info: dict) -> None:
+        if on_event:
+            on_event(kind, target, info)
+
+    def work(target: ResetTarget) -> dict:
+        db = target.service.db
+        envp = envs.get((db.host, db.port, db.user)) or os.environ.copy()
+        with slots:
+            notify("start", target, {})
+            t0 = time.perf_counter()
+            try:
+                data = execute(target, opts, cache_cfg, envp, events=events)
+                result = {"service": target.service.name, "status": "ok", "data": data}
+            except ResetError as e:
+                result = {
+                    "service": target.service.name,
+                    "status": "error",
+                    "exit_code": e.exit_code,
+                    "errors": [e.as_error()],
+                }
+            except Exception as e:
+                result = {
+                    "service": target.service.name,
+                    "status": "error",
+                    "exit_code": Exit.INTERNAL,
+                    "errors": [{"code": "INTERNAL", "detail": str(e)}],
+                }
+            result["duration_ms"] = _ms(t0)
+            notify("done", target, result)
+        return result
+
+    def drain(queue: Deque[int]) -> None:
+        while True:
+            try:
+                i = queue.popleft()
+            except IndexError:
+                return
+            results[i] = work(targets[i])
+
+    drainers = [q for q in queues.values() for _ in range(min(max(1, per_host), len(q)))]
+    with ThreadPoolExecutor(max_workers=max(1, len(drainers))) as pool:
+        for future in [pool.submit(drain, q) for q in drainers]:
+            future.result()
+    return results
@@ -1,28 +1,317 @@
 from __future__ import annotations
+
+import pickle
+import random
+import time
 from pathlib import Path
-import yaml
-from typing import Optional
-from .config_model import Config, Service
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .store import CACHE_DIR, DEVKIT_HOME, atomic_write, file_lock, read_json, write_json
+
+if TYPE_CHECKING:
+    from .config_model import Config, Service
+
+CONFIG_PATH = DEVKIT_HOME / "config.yml"
+
+# Optional sharded layout: every services.d/*.yml holds `services: [...]` for one team/area.
+# Services from config.yml and all shards are merged; names must be unique across them.
+SERVICES_DIR = DEVKIT_HOME / "services.d"
+# name -> shard file, refreshed per file when that file's stat changes
+INDEX_PATH = CACHE_DIR / "services_index.json"
+
+# Parsed + validated config, reused while config.yml, the shards and the models are unchanged.
+# Layout: pickle({"key", "data": plain dump}) followed by pickle(Config), so readers that
+# only need plain data (the fast path) never import pydantic.
+SNAPSHOT_PATH = CACHE_DIR / "config.pickle"
+SNAPSHOT_FORMAT = 4  # 4: db.restore_settings
+_MODEL_PATH = Path(__file__).with_name("config_model.py")
+
+# Serializes read-modify-write cycles across devkit processes (see `update_config`)
+LOCK_PATH = DEVKIT_HOME / ".config.lock"
+
+T = TypeVar("T")
+
+# Set in a resident process (`devkit daemon`): (snapshot key, Config or None if it failed to
+# load). The Config goes to the first load_config() while the files still match the key.
+_resident: Optional[Tuple[Optional[tuple], Optional[Config]]] = None
+
+
+class ConfigConflict(RuntimeError):
+    """A config file changed between load and save (e.g. edited by another process)."""
+
+
+def _yaml_load(text: str):
+    import yaml
+
+    # libyaml when available
+    return yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def _yaml_dump(data) -> str:
+    import yaml
+
+    return yaml.dump(data, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper), sort_keys=False)
+
+
+def shard_paths() -> List[Path]:
+    if not SERVICES_DIR.is_dir():
+        return []
+    return sorted(
+        p for p in SERVICES_DIR.iterdir() if p.suffix in (".yml", ".yaml") and p.is_file()
+    )
+
+
+def shard_path(name: str) -> Path:
+    return SERVICES_DIR / f"{name}.yml"
+
+
+def _read_shard(path: Path) -> list:
+    data = _yaml_load(path.read_text()) or {}
+    services = data.get("services") if isinstance(data, dict) else data
+    if not isinstance(services, list):
+        raise ValueError(f"{path}: expected 'services: [...]'")
+    return services
+
+
+def _stat_key(path: Path) -> list:
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+def _current_key(path: Path) -> Optional[list]:
+    try:
+        return _stat_key(path)
+    except FileNotFoundError:
+        return None
 
-CONFIG_PATH = Path.home() / ".devkit" / "config.yml"
+
+def _shard_index() -> Dict[str, Path]:
+    """Service name -> shard file; only shards whose stat changed are re-read."""
+    files: dict = (read_json(INDEX_PATH, {}) or {}).get("files", {})
+    current = {}
+    changed = False
+    for path in shard_paths():
+        try:
+            stat = _stat_key(path)
+        except OSError:
+            continue
+        entry = files.get(str(path))
+        if not entry or entry.get("stat") != stat:
+            try:
+                names = [
+                    str(s["name"]) for s in _read_shard(path) if isinstance(s, dict) and "name" in s
+                ]
+            except Exception:
+                names = []  # load_config reports broken shards
+            entry, changed = {"stat": stat, "names": names}, True
+        current[str(path)] = entry
+    if changed or current.keys() != files.keys():
+        try:
+            write_json(INDEX_PATH, {"files": current})
+        except OSError:
+            pass
+    index: Dict[str, Path] = {}
+    for path, entry in current.items():
+        for name in entry["names"]:
+            index.setdefault(name, Path(path))
+    return index
+
+
+def _snapshot_key() -> Optional[tuple]:
+    try:
+        st, model = CONFIG_PATH.stat(), _MODEL_PATH.stat()
+        shards = tuple((p.name, *_stat_key(p)) for p in shard_paths())
+    except OSError:
+        return None
+    return (
+        SNAPSHOT_FORMAT,
+        st.st_mtime_ns,
+        st.st_size,
+        st.st_ino,
+        st.st_dev,
+        model.st_mtime_ns,
+        model.st_size,
+        shards,
+    )
+
+
+def read_snapshot(with_model: bool = True) -> Optional[Tuple[dict, Optional[Config]]]:
+    """Return (plain data, Config or None) if the snapshot matches the config files, else None."""
+    key = _snapshot_key()
+    if key is None:
+        return None
+    try:
+        with open(SNAPSHOT_PATH, "rb") as f:
+            header = pickle.load(f)
+            if not isinstance(header, dict) or header.get("key") != key:
+                return None
+            cfg = pickle.load(f) if with_model else None
+        return header["data"], cfg
+    except Exception:
+        return None  # missing, truncated or from an incompatible version: parse instead
+
+
+def _write_snapshot(cfg: Config, key: Optional[tuple]) -> None:
+    if key is None:
+        return
+    try:
+        header = {"key": key, "data": cfg.model_dump(mode="python")}
+        blob = pickle.dumps(header, pickle.HIGHEST_PROTOCOL)
+        blob += pickle.dumps(cfg, pickle.HIGHEST_PROTOCOL)
+        atomic_write(SNAPSHOT_PATH, blob, durable=False)
+    except Exception:
+        pass  # the snapshot is only an optimization
 
 
 def load_config() -> Config:
+    global _resident
+    if _resident is not None:
+        key, cfg = _resident
+        _resident = None  # handed out once: callers may modify it
+        if cfg is not None and key == _snapshot_key():
+            return cfg
+    cached = read_snapshot()
+    if cached:
+        return cached[1]
+    from .config_model import Config  # pydantic is only paid for by commands that load config
+
     if not CONFIG_PATH.exists():
-        CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        CONFIG_PATH.write_text("version: 1\nservices: []\n")
-    data = yaml.safe_load(CONFIG_PATH.read_text()) or {"version": 1, "services": []}
-    return Config.model_validate(data)
+        atomic_write(CONFIG_PATH, "version: 1\nservices: []\n")
+    # stat before reading: if a file changes meanwhile, the snapshot is simply stale and
+    # save_config reports a conflict
+    key = _snapshot_key()
+    shards = shard_paths()
+    loaded = {str(p): _current_key(p) for p in [CONFIG_PATH] + shards}
+    data = _yaml_load(CONFIG_PATH.read_text()) or {"version": 1, "services": []}
+    sources: List[Optional[str]] = [None] * len(data.get("services") or [])
+    for path in shards:
+        shard = _read_shard(path)
+        data["services"] = list(data.get("services") or []) + shard
+        sources += [str(path)] * len(shard)
+    cfg = Config.model_validate(data)
+    for svc, source in zip(cfg.services, sources, strict=True):
+        svc._source = source
+    cfg._loaded = loaded
+    _write_snapshot(cfg, key)
+    return cfg
+
+
+def service_names() -> List[str]:
+    """Configured service names, read without validating anything (for shell completion)."""
+    cached = read_snapshot(with_model=False)
+    if cached:
+        return [s["name"] for s in cached[0]["services"]]
+    raw: list = []
+    try:
+        data = _yaml_load(CONFIG_PATH.read_text()) if CONFIG_PATH.exists() else None
+        if isinstance(data, dict) and isinstance(data.get("services"), list):
+            raw += data["services"]
+    except Exception:
+        pass  # broken config: load_config reports it
+    for path in shard_paths():
+        try:
+            raw += _read_shard(path)
+        except Exception:
+            continue
+    names = [str(s["name"]) for s in raw if isinstance(s, dict) and s.get("name") is not None]
+    return list(dict.fromkeys(names))
+
+
+def preload() -> bool:
+    """Load the config now and keep it for the next load_config(); False if it is invalid.
+
+    Meant for a long-lived process that forks per command: each child gets the parsed
+    config without touching the snapshot.
+    """
+    global _resident
+    key = _snapshot_key()
+    try:
+        cfg = load_config()
+    except Exception:
+        cfg = None
+    _resident = (key if key == _snapshot_key() else None, cfg)
+    return cfg is not None
+
+
+def preloaded() -> bool:
+    """Whether the config kept by preload() still matches the files (valid or not)."""
+    return _resident is not None and _resident[0] is not None and _resident[0] == _snapshot_key()
+
+
+def load_shard(path: Path) -> Config:
+    """A Config holding only the services of one services.d file (empty if it is missing)."""
+    from .config_model import Config
+
+    loaded = {str(path): _current_key(path)}
+    cfg = Config.model_validate({"services": _read_shard(path) if path.exists() else []})
+    for svc in cfg.services:
+        svc._source = str(path)
+    cfg._loaded = loaded
+    return cfg
+
+
+def open_service_file(name: str) -> Tuple[Config, Optional[Path]]:
+    """Load just the file that defines `name`, for an edit that rewrites only that file.
+
+    Returns (shard config, shard path) for services.d entries and (full config, None)
+    otherwise; pass the path back to `save_config`.
+    """
+    path = _shard_index().get(name)
+    if path is None:
+        return load_config(), None
+    return load_shard(path), path
+
+
+def _check_unchanged(cfg: Config, path: Path) -> None:
+    if cfg._loaded is None:
+        return  # not loaded from disk: nothing to compare against
+    if _current_key(path) != cfg._loaded.get(str(path)):
+        raise ConfigConflict(f"{path} changed since it was loaded")
+
+
+def save_config(cfg: Config, shard: Optional[Path] = None) -> None:
+    """Write config.yml (services loaded from it plus global settings) or a single shard.
+
+    Writes are atomic (temp file + fsync + rename). Raises ConfigConflict if the target
+    file changed since `cfg` was loaded; use `update_config` to retry automatically.
+    """
+    target = shard or CONFIG_PATH
+    _check_unchanged(cfg, target)
+    if shard is not None:
+        services = [s.model_dump(mode="python") for s in cfg.services]
+        atomic_write(shard, _yaml_dump({"services": services}))
+        for svc in cfg.services:
+            svc._source = str(shard)
+    else:
+        data = cfg.model_dump(mode="python")
+        pairs = zip(data["services"], cfg.services, strict=True)
+        data["services"] = [d for d, s in pairs if s._source is None]
+        atomic_write(CONFIG_PATH, _yaml_dump(data))
+    if cfg._loaded is not None:
+        cfg._loaded[str(target)] = _current_key(target)
+    if shard is not None:
+        _shard_index()  # refresh this shard's entry now rather than on the next lookup
+    else:
+        _write_snapshot(cfg, _snapshot_key())
+
 
+def update_config(change: Callable[[], T], attempts: int = 5) -> T:
+    """Run a load-modify-save `change` under the config lock, retrying on ConfigConflict.
 
-def save_config(cfg: Config) -> None:
-    CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    dumped = yaml.safe_dump(cfg.model_dump(mode="python"), sort_keys=False)
-    CONFIG_PATH.write_text(dumped)
+    The lock serializes devkit processes; the conflict check catches writers that do not
+    take it (editors, scripts). `change` must load the config itself so every attempt
+    starts from the current files.
+    """
+    for attempt in range(attempts):
+        try:
+            with file_lock(LOCK_PATH):
+                return change()
+        except ConfigConflict:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0.01, 0.05) * 2**attempt)
+    raise AssertionError("unreachable")
 
 
 def find_service(cfg: Config, name: str) -> Optional[Service]:
-    for s in cfg.services:
-        if s.name == name:
-            return s
-    return None
+    return cfg.service_map().get(name)
@@ -1,22 +1,275 @@
 from __future__ import annotations
-import subprocess, shlex, os
+
+import asyncio
+import os
+import shlex
+import signal
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Deque, List, Optional
+
+# What to do with a child's stdin/stdout/stderr
+INHERIT, DISCARD, CAPTURE = "inherit", "discard", "capture"
+
+CHUNK = 1 << 16
+MAX_LINE = 1 << 16  # longer lines are split: captured output stays bounded
+KILL_GRACE = 2.0  # seconds between SIGTERM and SIGKILL when stopping a command
+
+# on_line(command, "stdout" | "stderr", line) for every captured line, as it arrives
+LineSink = Callable[["Command", str, str], None]
+
+
+@dataclass
+class Command:
+    argv: List[str]
+    cwd: Optional[Path] = None
+    env: Optional[dict] = None  # None inherits the parent's environment as is
+    timeout: Optional[float] = None  # seconds; the command is stopped and marked timed_out
+    stdin: str = DISCARD  # INHERIT or DISCARD
+    stdout: str = CAPTURE
+    stderr: str = CAPTURE
+    keep: int = 200  # captured lines kept per stream (the last ones)
+
+
+@dataclass
+class Result:
+    command: Command
+    returncode: Optional[int]  # None: never started (its group was cancelled first)
+    stdout: List[str] = field(default_factory=list)
+    stderr: List[str] = field(default_factory=list)
+    wall_ms: int = 0
+    cpu_ms: int = 0  # user + system time, including children the command waited for
+    timed_out: bool = False
+    cancelled: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def _fd(mode: str):
+    return {INHERIT: None, DISCARD: subprocess.DEVNULL, CAPTURE: subprocess.PIPE}[mode]
+
+
+async def _pump(
+    pipe, name: str, cmd: Command, tail: Deque[str], on_line: Optional[LineSink]
+) -> None:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+
+    def emit(raw: bytes) -> None:
+        line = raw.decode(errors="replace").rstrip("\r")
+        tail.append(line)
+        if on_line:
+            on_line(cmd, name, line)
+
+    buf = b""
+    while chunk := await reader.read(CHUNK):
+        *lines, buf = (buf + chunk).split(b"\n")
+        for raw in lines:
+            emit(raw)
+        while len(buf) > MAX_LINE:
+            emit(buf[:MAX_LINE])
+            buf = buf[MAX_LINE:]
+    if buf:
+        emit(buf)
+
+
+async def _run(
+    cmd: Command,
+    on_line: Optional[LineSink],
+    abort: Optional[asyncio.Event],
+    reaper: Optional[ThreadPoolExecutor],
+) -> Result:
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    # without the terminal, a command gets its own process group so stopping it stops
+    # whatever it started too; interactive ones stay in the foreground group for Ctrl-C
+    own_group = cmd.stdin != INHERIT
+    p = subprocess.Popen(
+        cmd.argv,
+        cwd=cmd.cwd,
+        env=cmd.env,
+        stdin=_fd(cmd.stdin),
+        stdout=_fd(cmd.stdout),
+        stderr=_fd(cmd.stderr),
+        process_group=0 if own_group else None,
+    )
+    result = Result(cmd, None)
+    tails = {"stdout": deque(maxlen=cmd.keep), "stderr": deque(maxlen=cmd.keep)}
+    pumps = [
+        asyncio.ensure_future(_pump(getattr(p, name), name, cmd, tails[name], on_line))
+        for name in ("stdout", "stderr")
+        if getattr(cmd, name) == CAPTURE
+    ]
+    # wait4 instead of asyncio's child watcher: it also reports the child's CPU time
+    waiter = loop.run_in_executor(reaper, os.wait4, p.pid, 0)
+
+    def stop(sig: int) -> None:
+        # signal the pid directly: Popen.send_signal would poll, reaping it under wait4
+        try:
+            if own_group:
+                os.killpg(p.pid, sig)  # the group outlives its leader
+            elif not waiter.done():
+                os.kill(p.pid, sig)
+        except ProcessLookupError:
+            pass
 
+    try:
+        watch = [waiter]
+        if abort is not None:
+            watch.append(asyncio.ensure_future(abort.wait()))
+        done, _ = await asyncio.wait(
+            watch, timeout=cmd.timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        for w in watch[1:]:
+            w.cancel()
+        if waiter not in done:
+            result.cancelled = abort is not None and abort.is_set()
+            result.timed_out = not result.cancelled
+            stop(signal.SIGTERM)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), KILL_GRACE)
+            except asyncio.TimeoutError:
+                stop(signal.SIGKILL)
+        _, status, usage = await waiter
+    except asyncio.CancelledError:
+        stop(signal.SIGKILL)
+        _, status, usage = await asyncio.shield(waiter)
+        p.returncode = os.waitstatus_to_exitcode(status)
+        raise
+    p.returncode = result.returncode = os.waitstatus_to_exitcode(status)
+    result.wall_ms = int((time.perf_counter() - t0) * 1000)
+    if pumps:
+        # something the command started may still hold its pipes open: read what is
+        # already there, but do not wait for it to exit
+        _, late = await asyncio.wait(pumps, timeout=KILL_GRACE)
+        for t in late:
+            t.cancel()
+    result.stdout, result.stderr = list(tails["stdout"]), list(tails["stderr"])
+    result.cpu_ms = int((usage.ru_utime + usage.ru_stime) * 1000)
+    return result
 
-def run(cmd: List[str], cwd: Optional[Path]=None, env: Optional[dict]=None, trace: bool=False) -> int:
+
+async def run_async(cmd: Command, on_line: Optional[LineSink] = None) -> Result:
+    """Run one command without blocking the event loop."""
+    return await _run(cmd, on_line, None, None)
+
+
+async def run_group(
+    cmds: List[Command],
+    limit: int = 4,
+    fail_fast: bool = True,
+    on_line: Optional[LineSink] = None,
+) -> List[Result]:
+    """Run `cmds` with at most `limit` at a time; results come back in the same order.
+
+    With `fail_fast`, the first failure (non-zero exit or timeout) stops the group:
+    running commands get SIGTERM (SIGKILL after KILL_GRACE) and are marked cancelled,
+    commands not started yet never start.
+    """
+    limit = max(1, limit)
+    gate = asyncio.Semaphore(limit)
+    abort = asyncio.Event()
+
+    async def one(cmd: Command, reaper: ThreadPoolExecutor) -> Result:
+        async with gate:
+            if abort.is_set():
+                return Result(cmd, None, cancelled=True)
+            try:
+                result = await _run(cmd, on_line, abort if fail_fast else None, reaper)
+            except OSError as e:
+                result = Result(cmd, 127, stderr=[str(e)])  # like a shell: cannot execute
+        if fail_fast and not result.ok and not result.cancelled:
+            abort.set()
+        return result
+
+    # one reaper thread per running command: wait4 blocks
+    with ThreadPoolExecutor(max_workers=limit, thread_name_prefix="devkit-wait") as reaper:
+        return list(await asyncio.gather(*(one(c, reaper) for c in cmds)))
+
+
+def run_all(
+    cmds: List[Command],
+    limit: int = 4,
+    fail_fast: bool = True,
+    on_line: Optional[LineSink] = None,
+) -> List[Result]:
+    """Blocking `run_group` for synchronous callers (not from inside a running event loop)."""
+    return asyncio.run(run_group(cmds, limit=limit, fail_fast=fail_fast, on_line=on_line))
+
+
+def run_command(cmd: Command, on_line: Optional[LineSink] = None) -> Result:
+    """Blocking `run_async` for synchronous callers (not from inside a running event loop)."""
+    return asyncio.run(run_async(cmd, on_line))
+
+
+def run(
+    cmd: List[str],
+    cwd: Optional[Path] = None,
+    env: Optional[dict] = None,
+    trace: bool = False,
+    quiet: bool = False,
+) -> int:
     if trace:
         print(f"$ {shlex.join(cmd)}")
-    p = subprocess.run(cmd, cwd=cwd, env=env or os.environ.copy())
-    return p.returncode
+    # the terminal stays attached: prompts, colors and Ctrl-C work as with subprocess.run
+    out = DISCARD if quiet else INHERIT
+    command = Command(cmd, cwd=cwd, env=env, stdin=INHERIT, stdout=out, stderr=INHERIT)
+    return run_command(command).returncode
 
 
-def check(cmd: List[str], cwd: Optional[Path]=None, env: Optional[dict]=None, trace: bool=False):
-    rc = run(cmd, cwd=cwd, env=env, trace=trace)
+def check(
+    cmd: List[str],
+    cwd: Optional[Path] = None,
+    env: Optional[dict] = None,
+    trace: bool = False,
+    quiet: bool = False,
+):
+    rc = run(cmd, cwd=cwd, env=env, trace=trace, quiet=quiet)
     if rc != 0:
         raise RuntimeError(f"Command failed ({rc}): {shlex.join(cmd)}")
 
 
+def run_pipeline(
+    cmds: List[List[str]],
+    cwd: Optional[Path] = None,
+    env: Optional[dict] = None,
+    trace: bool = False,
+    quiet: bool = False,
+) -> int:
+    """Run `a | b | ...` without a shell; returns the rightmost non-zero exit code (pipefail).
+
+    A producer killed by SIGPIPE is not a failure: the reader stopped early on purpose
+    (e.g. pg_restore -L skipping the rest of the archive) or reports its own error.
+    """
+    if trace:
+        print("$ " + " | ".join(shlex.join(c) for c in cmds))
+    env = env or os.environ.copy()
+    procs: List[subprocess.Popen] = []
+    prev = None
+    for i, cmd in enumerate(cmds):
+        last = i == len(cmds) - 1
+        stdout = (subprocess.DEVNULL if quiet else None) if last else subprocess.PIPE
+        p = subprocess.Popen(cmd, cwd=cwd, env=env, stdin=prev, stdout=stdout)
+        if prev is not None:
+            prev.close()  # the next process owns the read end now
+        prev = p.stdout
+        procs.append(p)
+    return pipeline_status([p.wait() for p in procs])
+
+
+def pipeline_status(rcs: List[int]) -> int:
+    """Rightmost non-zero exit code of a pipeline, ignoring SIGPIPE in upstream stages."""
+    upstream = [rc for rc in rcs[:-1] if rc != -signal.SIGPIPE]
+    return next((rc for rc in reversed(upstream + rcs[-1:]) if rc != 0), 0)
+
+
 def which(bin_name: str) -> Optional[str]:
     from shutil import which as _which
     return _which(bin_name)
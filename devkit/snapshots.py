@@ -0,0 +1,310 @@
+"""Named snapshots of a service's live database (`db snapshot` / `db restore-snapshot`).
+
+A snapshot is a template database copy (`CREATE DATABASE ... TEMPLATE`) when the server
+allows it, or a parallel directory-format `pg_dump` under ~/.devkit/snapshots otherwise.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .config_model import DbConfig, Service, SnapshotConfig
+from .postgres import (
+    clone_database,
+    create_database,
+    database_exists,
+    database_size,
+    drop_database,
+    execute,
+    quote_ident,
+    terminate_sessions,
+)
+from .shell import check, which
+from .store import CACHE_DIR, DEVKIT_HOME, file_lock, read_json, write_json
+
+INDEX_PATH = CACHE_DIR / "snapshots.json"
+LOCK_PATH = CACHE_DIR / ".snapshots.lock"
+DUMP_DIR = DEVKIT_HOME / "snapshots"
+SNAPSHOT_PREFIX = "devkit_snap_"
+METHODS = ("auto", "template", "dump")
+
+
+@dataclass
+class SnapshotEntry:
+    service: str
+    tag: str
+    method: str  # template | dump
+    location: str  # template database name, or dump directory
+    source_db: str
+    user: str
+    host: str
+    port: int
+    bytes: int
+    created: float
+    last_used: float
+
+    @property
+    def db(self) -> DbConfig:
+        return DbConfig(user=self.user, host=self.host, port=self.port)
+
+    @property
+    def key(self) -> str:
+        return f"{self.service}:{self.tag}"
+
+
+def _load_index() -> dict:
+    idx = read_json(INDEX_PATH, {}) or {}
+    idx.setdefault("snapshots", {})
+    return idx
+
+
+def entries(service: Optional[str] = None) -> List[SnapshotEntry]:
+    items = [SnapshotEntry(**raw) for raw in _load_index()["snapshots"].values()]
+    return [e for e in items if service is None or e.service == service]
+
+
+def _record(entry: SnapshotEntry) -> None:
+    with file_lock(LOCK_PATH):
+        idx = _load_index()
+        idx["snapshots"][entry.key] = asdict(entry)
+        write_json(INDEX_PATH, idx)
+
+
+def _forget(key: str) -> None:
+    with file_lock(LOCK_PATH):
+        idx = _load_index()
+        if idx["snapshots"].pop(key, None) is not None:
+            write_json(INDEX_PATH, idx)
+
+
+def _slug(value: str, n: int) -> str:
+    return re.sub(r"[^a-z0-9_]", "_", value.lower())[:n]
+
+
+def snapshot_name(service: str, tag: str) -> str:
+    """Template database name; slugs are truncated, so a digest keeps names distinct."""
+    digest = hashlib.sha1(f"{service}\0{tag}".encode()).hexdigest()[:8]
+    return f"{SNAPSHOT_PREFIX}{_slug(service, 20)}_{_slug(tag, 16)}_{digest}"
+
+
+def dump_dir(service: str, tag: str) -> Path:
+    return DUMP_DIR / snapshot_name(service, tag)[len(SNAPSHOT_PREFIX) :]
+
+
+def _conn(db: DbConfig) -> List[str]:
+    return ["-U", db.user, "-h", db.host, "-p", str(db.port)]
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _drop_template(db: DbConfig, name: str, trace: bool, env: Optional[dict]) -> None:
+    if database_exists(db, name, env=env):
+        execute(
+            db, f"ALTER DATABASE {quote_ident(name)} WITH IS_TEMPLATE false;", trace=trace, env=env
+        )
+    drop_database(db, name, trace=trace, env=env)
+
+
+def _discard(entry: SnapshotEntry, trace: bool, env: Optional[dict]) -> None:
+    """Remove a snapshot's data (the index entry is handled by the caller)."""
+    if entry.method == "template":
+        _drop_template(entry.db, entry.location, trace, env)
+    else:
+        shutil.rmtree(entry.location, ignore_errors=True)
+
+
+def _by_template(
+    s: Service,
+    dbname: str,
+    name: str,
+    old: Optional[SnapshotEntry],
+    trace: bool,
+    env: Optional[dict],
+) -> Tuple[str, int]:
+    """Copy `dbname` into a template; returns (its database name, size).
+
+    The copy goes to `name`, or to `name` + "_b" when `old` (the snapshot being replaced)
+    holds `name`: a failed copy leaves `old` intact, and `old` is dropped only after.
+    """
+    here = ("template", name, s.db.host, s.db.port)
+    taken = old is not None and (old.method, old.location, old.host, old.port) == here
+    target = name + "_b" if taken else name
+    _drop_template(s.db, target, trace, env)  # left over from an interrupted snapshot
+    try:
+        terminate_sessions(s.db, dbname, trace=trace, env=env)
+        clone_database(s.db, target, dbname, trace=trace, env=env)
+        # like cache templates: refuse connections so nothing blocks a later restore
+        execute(
+            s.db,
+            f"ALTER DATABASE {quote_ident(target)} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false;",
+            trace=trace,
+            env=env,
+        )
+    except Exception:
+        try:
+            _drop_template(s.db, target, trace, env)
+        except Exception:
+            pass  # dropped by the next attempt
+        raise
+    return target, database_size(s.db, target, env=env)
+
+
+def _by_dump(
+    s: Service, dbname: str, out: Path, jobs: int, trace: bool, env: Optional[dict]
+) -> int:
+    tmp = out.with_name(out.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.parent.mkdir(parents=True, exist_ok=True)
+    tool = which("pg_dump") or "pg_dump"
+    try:
+        check(
+            [tool, *_conn(s.db), "-Fd", "-j", str(jobs), "-f", str(tmp), dbname],
+            env=env,
+            trace=trace,
+            quiet=True,
+        )
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    return _dir_bytes(out)
+
+
+def create(
+    s: Service,
+    dbname: str,
+    tag: str,
+    method: str = "auto",
+    jobs: int = 0,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> SnapshotEntry:
+    """Save `dbname` as snapshot `tag` of service `s`, replacing an older one with that tag.
+
+    `auto` copies the database as a template and falls back to a directory dump when the
+    copy fails (e.g. missing CREATEDB or sessions that reconnect immediately).
+    """
+    jobs = jobs or min(4, os.cpu_count() or 1)
+    old = lookup(s.name, tag)
+    errors = []
+    for how in ["template", "dump"] if method == "auto" else [method]:
+        try:
+            if how == "template":
+                location, size = _by_template(
+                    s, dbname, snapshot_name(s.name, tag), old, trace, env
+                )
+            else:
+                location = str(dump_dir(s.name, tag))
+                size = _by_dump(s, dbname, Path(location), jobs, trace, env)
+        except Exception as e:
+            errors.append(f"{how}: {e}")
+            continue
+        where = (how, location, s.db.host, s.db.port)
+        if old and (old.method, old.location, old.host, old.port) != where:
+            _discard(old, trace, env)  # only now that its replacement exists
+        now = time.time()
+        entry = SnapshotEntry(
+            service=s.name,
+            tag=tag,
+            method=how,
+            location=location,
+            source_db=dbname,
+            user=s.db.user,
+            host=s.db.host,
+            port=s.db.port,
+            bytes=size,
+            created=now,
+            last_used=now,
+        )
+        _record(entry)
+        return entry
+    raise RuntimeError("; ".join(errors))
+
+
+def lookup(service: str, tag: str, env: Optional[dict] = None) -> Optional[SnapshotEntry]:
+    """The snapshot `tag` of `service`; with `env`, only if its data still exists."""
+    raw = _load_index()["snapshots"].get(f"{service}:{tag}")
+    if not raw:
+        return None
+    entry = SnapshotEntry(**raw)
+    if env is not None:
+        gone = (
+            not database_exists(entry.db, entry.location, env=env)
+            if entry.method == "template"
+            else not Path(entry.location, "toc.dat").exists()
+        )
+        if gone:
+            _forget(entry.key)
+            return None
+    return entry
+
+
+def restore(
+    entry: SnapshotEntry,
+    db: DbConfig,
+    dbname: str,
+    jobs: int = 0,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> None:
+    """Replace `dbname` with the snapshot's contents; the snapshot itself is kept."""
+    terminate_sessions(db, dbname, trace=trace, env=env)
+    drop_database(db, dbname, trace=trace, env=env)
+    if entry.method == "template":
+        clone_database(db, dbname, entry.location, trace=trace, env=env)
+    else:
+        create_database(db, dbname, trace=trace, env=env)
+        tool = which("pg_restore") or "pg_restore"
+        jobs = jobs or min(4, os.cpu_count() or 1)
+        check(
+            [tool, *_conn(db), "-d", dbname, "-j", str(jobs), entry.location],
+            env=env,
+            trace=trace,
+            quiet=True,
+        )
+    entry.last_used = time.time()
+    _record(entry)
+
+
+def delete(entry: SnapshotEntry, trace: bool = False, env: Optional[dict] = None) -> None:
+    _discard(entry, trace, env)
+    _forget(entry.key)
+
+
+def prune(
+    budget: SnapshotConfig,
+    keep: Optional[str] = None,
+    trace: bool = False,
+    env: Optional[dict] = None,
+) -> List[SnapshotEntry]:
+    """Drop snapshots, least recently used first, until every service is within
+    `max_per_service` and all snapshots together within `max_bytes`."""
+    current = sorted(entries(), key=lambda e: e.last_used)
+    per_service: dict = {}
+    for e in current:
+        per_service[e.service] = per_service.get(e.service, 0) + 1
+    total = sum(e.bytes for e in current)
+    victims: List[SnapshotEntry] = []
+    for e in current:
+        if e.key == keep:
+            continue
+        over_count = per_service[e.service] > budget.max_per_service
+        over_bytes = budget.max_bytes is not None and total > budget.max_bytes
+        if not (over_count or over_bytes):
+            continue
+        victims.append(e)
+        per_service[e.service] -= 1
+        total -= e.bytes
+    for e in victims:
+        delete(e, trace, env)
+    return victims
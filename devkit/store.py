@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Union
+
+DEVKIT_HOME = Path.home() / ".devkit"
+CACHE_DIR = DEVKIT_HOME / "cache"
+
+
+def read_json(path: Path, default: Any = None) -> Any:
+    """Load a JSON state file, returning `default` when it is missing or unreadable."""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return default
+
+
+def atomic_write(path: Path, data: Union[str, bytes], durable: bool = True) -> None:
+    """Replace `path` via a temp file + rename so readers see the old or the new file, never
+    a partial one. With `durable`, data and rename are fsynced before returning."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if durable:
+        try:
+            fd = os.open(path.parent, os.O_RDONLY)
+        except OSError:
+            return  # e.g. directories cannot be opened on this platform
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def write_json(path: Path, data: Any) -> None:
+    """Write a JSON state file via a temp file + rename so readers never see partial data."""
+    atomic_write(path, json.dumps(data, indent=2, sort_keys=True) + "\n", durable=False)
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Exclusive advisory lock on `path` (created if needed), held for the `with` block.
+
+    Only cooperating processes (other devkit runs) are excluded; a no-op where flock is
+    unavailable.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from .iofmt import Exit
+
+# Plain-data help text, shared by the Typer app and the fast path (no heavy imports here)
+B = "\033[1m"
+R = "\033[0m"
+
+TOPICS: Dict[str, Tuple[str, List[str]]] = {
+    "environment": (
+        "Environment variables used by devkit",
+        [
+            "DEVKIT_SAFE=1  Enable safe mode; requires --yes for destructive actions",
+            "DEVKIT_NO_DAEMON=1  Run in this process even when 'devkit daemon' is running",
+            "PGPASSWORD     Password for Postgres tools (psql/pg_restore)",
+            "PATH          Must include rails, psql, pg_restore when needed",
+        ],
+    ),
+    "exit-codes": (
+        "Exit codes used by devkit",
+        [
+            "0   OK",
+            f"{Exit.INVALID_ARGS}   INVALID_ARGS",
+            f"{Exit.NOT_FOUND}   NOT_FOUND",
+            f"{Exit.DEP_MISSING}   DEP_MISSING",
+            f"{Exit.PRECONDITION}   PRECONDITION",
+            f"{Exit.EXTERNAL}   EXTERNAL",
+            f"{Exit.FORBIDDEN}   FORBIDDEN",
+            f"{Exit.INTERNAL}   INTERNAL",
+        ],
+    ),
+    "formatting": (
+        "Formatting options for JSON output",
+        [
+            "Use --format json to emit a stable envelope:",
+            "{command, status, exit_code, data, errors}",
+            "Combine with --no-interactive and --yes for deterministic runs.",
+        ],
+    ),
+    "reference": (
+        "A comprehensive reference of all commands",
+        [
+            "Generate docs/commands.md with 'make docs'.",
+            "Or inspect JSON: 'devkit meta reference --format json'",
+        ],
+    ),
+}
+
+
+def root_help() -> str:
+    return "\n".join(
+        [
+            "Work seamlessly with DevKit from the command line.\n",
+            f"{B}USAGE{R}",
+            "  devkit <command> <subcommand> [options]\n",
+            f"{B}CORE COMMANDS{R}",
+            "  service:      Manage services (Rails apps + backups)",
+            "  db:           Database operations",
+            "  backup:       Backup catalog (hashes, formats, tables)",
+            "  meta:         Introspection/metadata commands for agents\n",
+            f"{B}ADDITIONAL COMMANDS{R}",
+            "  completion:   Generate shell completion scripts",
+            "  daemon:       Keep devkit resident for fast repeated calls\n",
+            f"{B}HELP TOPICS{R}",
+            "  environment:  Environment variables used by devkit",
+            "  exit-codes:   Exit codes used by devkit",
+            "  formatting:   Formatting options for JSON output",
+            "  reference:    A comprehensive reference of all commands\n",
+            f"{B}FLAGS{R}",
+            "  --help      Show help for command",
+            "  --version   Show devkit version\n",
+            f"{B}EXAMPLES{R}",
+            "  devkit service list",
+            "  devkit service add --name myapp --app /path --backup /file.dump",
+            "  devkit db reset myapp --backup /file.dump\n",
+            f"{B}LEARN MORE{R}",
+            "  Use 'devkit <command> --help' for more information.",
+            "  Read the manual in docs/index.md\n",
+        ]
+    )
+
+
+def topic_help(topic: Optional[str]) -> Tuple[int, str, str]:
+    """Render `devkit help [TOPIC]`; returns (exit code, stdout text, stderr text)."""
+    if topic is None:
+        width = max(len(k) for k in TOPICS)
+        lines = [f"{B}HELP TOPICS{R}"]
+        for name, (desc, _) in TOPICS.items():
+            pad = " " * (width - len(name) + 2)
+            lines.append(f"  {name}:{pad}{desc}")
+        lines.append("\nUse 'devkit help <topic>' for more information about a topic.")
+        return 0, "\n".join(lines), ""
+    if topic not in TOPICS:
+        err = (
+            f"{B}ERROR:{R} unknown help topic: {topic}\n"
+            f"{B}TIP:{R} Run 'devkit help' to list available topics."
+        )
+        return 2, "", err
+    title, body = TOPICS[topic]
+    lines = [f"{B}{topic.upper()}{R}", f"  {title}\n"] + [f"  {ln}" for ln in body]
+    return 0, "\n".join(lines), ""
@@ -1,11 +1,25 @@
-from rich.console import Console
-from rich.prompt import Confirm
+from functools import lru_cache
 
-# Disable colors for a simpler look-and-feel
-console = Console(no_color=True)
+# rich is imported on first use so that plain-output commands start fast
+
+
+@lru_cache(maxsize=None)
+def _console():
+    from rich.console import Console
+
+    # Disable colors for a simpler look-and-feel
+    return Console(no_color=True)
+
+
+def __getattr__(name: str):
+    if name == "console":
+        return _console()
+    raise AttributeError(name)
 
 
 def confirm(prompt: str, default: bool = False) -> bool:
+    from rich.prompt import Confirm
+
     return Confirm.ask(prompt, default=default)
 
 
@@ -30,3 +44,12 @@ def table(headers, rows) -> str:
         line = "  ".join((r[i] if i < len(r) else "").ljust(widths[i]) for i in range(len(widths)))
         lines.append(line)
     return "\n".join(lines)
+
+
+def human_bytes(n: int) -> str:
+    size = float(n)
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size < 1024 or unit == "TB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{n} B"
@@ -0,0 +1,236 @@
+"""Check a restored database against what its backup says it should contain.
+
+One catalog query covers every expected table: does it exist, how many rows does Postgres
+estimate, does its heap have any pages. Only tables that look wrong are looked at again,
+in parallel, with exact (but bounded) queries. With psycopg installed the checks run
+in-process over a small connection pool; otherwise they go through one psql call each.
+"""
+
+from __future__ import annotations
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from .postgres import query, quote_literal
+
+if TYPE_CHECKING:
+    from .config_model import DbConfig
+
+# Archived data blocks up to this size may hold nothing but framing: such tables may be empty
+EMPTY_DATA_BYTES = 64
+# Estimated row counts within this fraction of the recorded count pass without a recount
+ROW_TOLERANCE = 0.1
+
+
+@dataclass
+class TableCheck:
+    schema: str
+    name: str
+    exists: bool = False
+    relation: Optional[str] = None  # regclass text, quoted as needed
+    relkind: str = ""
+    rows: Optional[int] = None  # estimate: reltuples, or live tuples before the first ANALYZE
+    estimated: bool = False  # rows came from reltuples (set by CREATE INDEX / ANALYZE)
+    heap_bytes: int = 0
+    problem: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.schema}.{self.name}"
+
+
+@dataclass
+class Validation:
+    driver: str  # psycopg | psql
+    tables: List[TableCheck] = field(default_factory=list)
+    rechecked: int = 0
+
+    @property
+    def problems(self) -> List[TableCheck]:
+        return [t for t in self.tables if t.problem]
+
+    def summary(self) -> dict:
+        return {
+            "driver": self.driver,
+            "tables": len(self.tables),
+            "rechecked": self.rechecked,
+            "problems": [{"table": t.label, "detail": t.problem} for t in self.problems],
+        }
+
+
+class _Pool:
+    """psycopg connections to one database, opened on demand and reused.
+
+    Callers bound concurrency, so the pool grows to at most that many connections.
+    """
+
+    def __init__(self, psycopg, params: dict) -> None:
+        self._psycopg, self._params = psycopg, params
+        self._idle: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._all: list = []
+
+    @contextmanager
+    def connection(self) -> Iterator[object]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._psycopg.connect(**self._params, autocommit=True)
+            self._all.append(conn)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def rows(self, sql: str) -> List[tuple]:
+        with self.connection() as conn:
+            return [tuple("" if v is None else str(v) for v in r) for r in conn.execute(sql)]
+
+    def close(self) -> None:
+        # validation must not leave sessions behind: the database may be cloned next
+        for conn in self._all:
+            conn.close()
+
+
+def _psycopg():
+    try:
+        import psycopg
+    except ImportError:
+        return None
+    return psycopg
+
+
+def _array(values: List[str]) -> str:
+    return "ARRAY[" + ", ".join(quote_literal(v) for v in values) + "]::text[]"
+
+
+def _overview_sql(tables: List[Tuple[str, str]]) -> str:
+    return (
+        "SELECT e.schema, e.name, c.oid::regclass, c.relkind, "
+        "CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint "
+        "ELSE pg_stat_get_live_tuples(c.oid) END, c.reltuples >= 0, pg_relation_size(c.oid) "
+        f"FROM unnest({_array([s for s, _ in tables])}, {_array([n for _, n in tables])}) "
+        "AS e(schema, name) "
+        "LEFT JOIN pg_class c "
+        "ON c.oid = to_regclass(quote_ident(e.schema) || '.' || quote_ident(e.name));"
+    )
+
+
+def _expected_rows(t: dict) -> Optional[int]:
+    return t.get("rows") if t.get("data") else None
+
+
+def _suspect(check: TableCheck, expected: dict, full: bool) -> Optional[str]:
+    """Which recount `check` needs ("empty" | "rows"), or None when it looks right."""
+    if not full or not expected.get("data") or check.relkind != "r":
+        return None
+    if check.heap_bytes == 0 and (expected.get("data_bytes") or 0) > EMPTY_DATA_BYTES:
+        return "empty"
+    want = _expected_rows(expected)
+    if want is not None and abs((check.rows or 0) - want) > max(10, want * ROW_TOLERANCE):
+        return "rows"
+    return None
+
+
+def _recount_sql(check: TableCheck, kind: str) -> str:
+    if kind == "empty":
+        return f"SELECT EXISTS (SELECT 1 FROM {check.relation})::int;"
+    return f"SELECT count(*) FROM {check.relation};"
+
+
+def validate_restore(
+    db: "DbConfig",
+    dbname: str,
+    expected: Optional[List[dict]],
+    full: bool = True,
+    jobs: int = 4,
+    env: Optional[dict] = None,
+) -> Validation:
+    """Check that `dbname` holds the `expected` tables (catalog/TOC table dicts).
+
+    Every table must exist. With `full` (not a partial restore), tables whose archived
+    data is clearly non-empty must have rows, and tables with a recorded row count must
+    be within ROW_TOLERANCE of it. Connection failures raise RuntimeError.
+    """
+    expected = [t for t in expected or [] if t.get("name")]
+    by_key = {(t["schema"], t["name"]): t for t in expected}
+    psycopg = _psycopg()
+    pool = None
+    if psycopg is not None:
+        params = {
+            "host": db.host,
+            "port": db.port,
+            "user": db.user,
+            "dbname": dbname,
+            "application_name": "devkit validate",
+            "connect_timeout": 10,
+        }
+        if env and env.get("PGPASSWORD"):
+            params["password"] = env["PGPASSWORD"]
+        pool = _Pool(psycopg, params)
+
+    def rows(sql: str) -> List[tuple]:
+        if pool is None:
+            return [tuple(r) for r in query(db, sql, dbname, env=env)]
+        try:
+            return pool.rows(sql)
+        except psycopg.Error as e:
+            raise RuntimeError(str(e).strip()) from e
+
+    result = Validation(driver="psql" if pool is None else "psycopg")
+    try:
+        # the overview doubles as the connectivity check when there is nothing to expect
+        for schema, name, rel, kind, est, from_stats, size in rows(_overview_sql(list(by_key))):
+            check = TableCheck(schema, name)
+            if rel:
+                check.exists, check.relation, check.relkind = True, rel, kind
+                check.rows = int(est) if est not in ("", None) else None
+                check.estimated = from_stats in ("t", "True")
+                check.heap_bytes = int(size or 0)
+            else:
+                check.problem = "missing"
+            result.tables.append(check)
+
+        suspects = []
+        for check in result.tables:
+            if check.exists:
+                kind = _suspect(check, by_key[(check.schema, check.name)], full)
+                if kind:
+                    suspects.append((check, kind))
+        if suspects:
+            result.rechecked = len(suspects)
+            if pool is None:
+                # one psql call for all of them
+                sql = " UNION ALL ".join(
+                    f"SELECT {i}, ({_recount_sql(c, k).rstrip(';')})"
+                    for i, (c, k) in enumerate(suspects)
+                )
+                counts = {int(i): int(n) for i, n in rows(sql + ";")}
+            else:
+                with ThreadPoolExecutor(max_workers=min(jobs, len(suspects))) as ex:
+                    found = ex.map(lambda ck: int(rows(_recount_sql(*ck))[0][0]), suspects)
+                    counts = dict(enumerate(found))
+            for i, (check, kind) in enumerate(suspects):
+                n = counts[i]
+                want = _expected_rows(by_key[(check.schema, check.name)])
+                if kind == "empty" and n == 0:
+                    check.problem = "no rows, but the backup has data for it"
+                elif kind == "rows":
+                    check.rows, check.estimated = n, False
+                    if abs(n - want) > max(10, want * ROW_TOLERANCE):
+                        check.problem = f"{n} rows, expected about {want}"
+    finally:
+        if pool is not None:
+            pool.close()
+    return result
+
+
+def observed_rows(validation: Validation) -> Dict[Tuple[str, str], int]:
+    """Row counts worth recording in the catalog: estimates Postgres computed itself."""
+    return {
+        (t.schema, t.name): t.rows
+        for t in validation.tables
+        if t.exists and not t.problem and t.rows is not None and t.estimated
+    }
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Startup budget for the hottest devkit invocations.
+
+For each case this runs `python -X importtime -m devkit ...` a few times and reports the
+best wall time and the import time spent on modules the bare interpreter does not load.
+It fails (exit 1) when a case goes over its import budget or imports a module it must not.
+
+It also times `bin/devkit help` against `python -m devkit help` (with a warm launcher
+cache) and fails when the wrapper adds more than its budget.
+
+    python scripts/bench_startup.py [--runs N] [--budget-ms MS] [--wrapper-budget-ms MS] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules the fast path exists to avoid
+HEAVY = ("typer", "click", "rich", "pydantic")
+
+CASES = [
+    {"name": "help", "argv": ["help"], "forbid": HEAVY},
+    {"name": "service list", "argv": ["service", "list"], "forbid": HEAVY},
+    {
+        "name": "service list (json)",
+        "argv": ["--format", "json", "service", "list"],
+        "forbid": HEAVY,
+    },
+]
+
+
+def _imports(stderr: str) -> dict:
+    """Top-level module -> cumulative import time (us) from -X importtime output."""
+    out = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith("   ") or not cumulative.strip().isdigit():
+            continue  # nested import, or the header line
+        out[name.strip()] = out.get(name.strip(), 0) + int(cumulative)
+    return out
+
+
+def _run(argv: list) -> tuple:
+    env = dict(os.environ, PYTHONPATH=str(ROOT), DEVKIT_NO_DAEMON="1")  # measure this process
+    t0 = time.perf_counter()
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime"] + argv, env=env, capture_output=True, text=True
+    )
+    return time.perf_counter() - t0, p
+
+
+def _best(cmd: list, env: dict, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, env=env, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _wrapper(runs: int) -> dict:
+    """Best wall time of the bin/devkit wrapper vs. the interpreter it execs, same command."""
+    with tempfile.TemporaryDirectory() as home:
+        # the wrapper must find this interpreter as python3; a fresh HOME gives it a fresh cache
+        bindir = Path(home, "bin")
+        bindir.mkdir()
+        (bindir / "python3").symlink_to(sys.executable)
+        env = dict(
+            os.environ,
+            HOME=home,
+            PATH=f"{bindir}{os.pathsep}{os.environ.get('PATH', '')}",
+            DEVKIT_NO_DAEMON="1",
+        )
+        env.pop("DEVKIT_PYTHON", None)
+        wrapper = [str(ROOT / "bin" / "devkit"), "help"]
+        subprocess.run(wrapper, env=env, capture_output=True, check=True)  # resolve + cache
+        direct = _best(
+            [sys.executable, "-m", "devkit", "help"], dict(env, PYTHONPATH=str(ROOT)), runs
+        )
+        wrapped = _best(wrapper, env, runs)
+    return {
+        "direct_ms": round(direct * 1000, 1),
+        "wrapper_ms": round(wrapped * 1000, 1),
+        "overhead_ms": round((wrapped - direct) * 1000, 1),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=40.0, help="import budget per case")
+    ap.add_argument(
+        "--wrapper-budget-ms", type=float, default=25.0, help="bin/devkit overhead budget"
+    )
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args()
+
+    _, bare = _run(["-c", "pass"])
+    baseline = set(_imports(bare.stderr))
+
+    results, failed = [], False
+    for case in CASES:
+        walls, imports = [], {}
+        for _ in range(args.runs):
+            wall, p = _run(["-m", "devkit"] + case["argv"])
+            if p.returncode != 0:
+                print(f"{case['name']}: exit {p.returncode}\n{p.stderr[-2000:]}", file=sys.stderr)
+                return 1
+            walls.append(wall)
+            imports = {k: v for k, v in _imports(p.stderr).items() if k not in baseline}
+        loaded = set()
+        for line in p.stderr.splitlines():
+            if "|" in line:
+                loaded.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+        heavy = sorted(m for m in case["forbid"] if m in loaded)
+        import_ms = sum(imports.values()) / 1000
+        ok = import_ms <= args.budget_ms and not heavy
+        failed |= not ok
+        results.append(
+            {
+                "name": case["name"],
+                "wall_ms": round(min(walls) * 1000, 1),
+                "import_ms": round(import_ms, 1),
+                "budget_ms": args.budget_ms,
+                "heavy_imports": heavy,
+                "ok": ok,
+            }
+        )
+
+    wrapper = _wrapper(args.runs)
+    wrapper["budget_ms"] = args.wrapper_budget_ms
+    wrapper["ok"] = wrapper["overhead_ms"] <= args.wrapper_budget_ms
+    failed |= not wrapper["ok"]
+
+    if args.json:
+        print(json.dumps({"results": results, "wrapper": wrapper, "ok": not failed}, indent=2))
+    else:
+        for r in results:
+            status = "ok" if r["ok"] else "OVER BUDGET"
+            extra = f"  imports {', '.join(r['heavy_imports'])}" if r["heavy_imports"] else ""
+            print(
+                f"{r['name']:<22} wall {r['wall_ms']:>7.1f} ms  "
+                f"imports {r['import_ms']:>6.1f}/{r['budget_ms']:.0f} ms  {status}{extra}"
+            )
+        print(
+            f"{'bin/devkit help':<22} wall {wrapper['wrapper_ms']:>7.1f} ms  "
+            f"overhead {wrapper['overhead_ms']:>5.1f}/{wrapper['budget_ms']:.0f} ms "
+            f"vs python -m devkit  {'ok' if wrapper['ok'] else 'OVER BUDGET'}"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())